@@ -1,10 +1,107 @@
-from flask import Flask, render_template, request, jsonify
+import select
+import socket
+import time
+
+from flask import Flask, render_template, request, jsonify, g, Response
 from flask_cors import CORS
-from services.gemini import get_gemini_response
+from services.gemini import get_gemini_response, GenerationCancelled
+from services import cassette, clearance, jobs, latency_profiles, metrics, profiler, render
+from services.speculation import speculator
 
 app = Flask(__name__)
 CORS(app)
 
+MAX_JOB_WAIT = 60 # seconds a long-poll may hold the connection
+MAX_JOB_PRIORITY = 100 # priorities run from -MAX_JOB_PRIORITY to MAX_JOB_PRIORITY
+# Routes that do no real work while they are open, so they do not pause speculation.
+IDLE_ROUTES = ('/metrics', '/jobs/<job_id>')
+
+def _predict_job(payload):
+    speculator.enter()
+    try:
+        profile = latency_profiles.get(payload.get('latency_profile'), route='job')
+        answer = get_gemini_response(payload.get('user_input', ''), profile=profile)
+        if answer.startswith('Error: '):
+            raise jobs.JobFailed(answer[len('Error: '):])
+        return answer.encode('utf-8'), 'text/plain; charset=utf-8'
+    finally:
+        speculator.leave()
+
+def _render_job(payload):
+    speculator.enter()
+    try:
+        result = render.render(
+            payload.get('preset', ''), payload.get('params', {}),
+            tier=payload.get('tier'), fmt=payload.get('format') or 'png', lod=payload.get('lod'),
+        )
+    finally:
+        speculator.leave()
+    return result['body'], result['mimetype']
+
+job_queue = jobs.JobQueue()
+job_pool = jobs.WorkerPool(job_queue, {'predict': _predict_job, 'render': _render_job})
+
+@app.before_request
+def start_timer():
+    g.start_time = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.route_token = metrics.current_route.set(route)
+    if route not in IDLE_ROUTES and not route.startswith('/debug/'):
+        g.foreground = True
+        speculator.enter() # Pauses speculative rendering until we finish
+    waited = metrics.queue_seconds(request.headers.get('X-Request-Start'))
+    if waited is not None:
+        metrics.observe_stage('queue', waited)
+    token = request.headers.get('X-Archibot-Profile') or request.args.get('profile')
+    if token and not route.startswith('/debug/') and profiler.is_authorized(token):
+        g.request_id = profiler.new_id() # Never the client's id, which could name an existing profile
+        g.profile = profiler.start(g.request_id, route, request.headers.get('X-Request-Id'))
+
+@app.after_request
+def attach_profile(response):
+    handle = g.pop('profile', None)
+    if handle:
+        profiler.stop(handle)
+        response.headers['X-Profile-Id'] = g.request_id
+    return response
+
+@app.teardown_request
+def stop_timer(exc=None):
+    handle = g.pop('profile', None)
+    if handle:
+        profiler.stop(handle)
+    if g.pop('foreground', False):
+        speculator.leave()
+    if 'start_time' in g:
+        metrics.observe_stage('total', time.perf_counter() - g.start_time)
+        metrics.current_route.reset(g.route_token)
+
+def client_disconnected(environ):
+    """
+    True once the client has closed its end of the connection. Peeks at the raw socket
+    that gunicorn and the werkzeug dev server expose; other servers report False.
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        if hasattr(select, 'poll'): # select.select() can't watch descriptors past FD_SETSIZE
+            poller = select.poll()
+            poller.register(sock, select.POLLIN)
+            events = poller.poll(0)
+            if events and events[0][1] & (select.POLLHUP | select.POLLERR):
+                return True
+            readable = bool(events)
+        else:
+            readable = bool(select.select([sock], [], [], 0)[0])
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except ValueError:
+        return False # Not a usable socket (already detached); that says nothing about the client
+    except OSError:
+        return True # Reset by the peer
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -13,8 +110,142 @@ def home():
 def predict():
     data = request.get_json()
     user_input = data.get('user_input', '') if data else ''
-    ai_response = get_gemini_response(user_input)
-    return jsonify({'response': ai_response})
+    requested = (data.get('latency_profile') if data else None) or request.headers.get('X-Latency-Profile')
+    try:
+        profile = latency_profiles.get(requested, route='predict')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cassette.record_request('/predict', {'user_input': user_input, 'latency_profile': profile.name})
+    environ = request.environ
+    try:
+        ai_response = get_gemini_response(user_input, is_cancelled=lambda: client_disconnected(environ),
+                                          profile=profile)
+    except GenerationCancelled:
+        return Response(status=499) # Client closed request; nobody is listening
+    with metrics.timed('serialize'):
+        if getattr(ai_response, 'stale', False):
+            response = jsonify({'response': ai_response, 'stale': True})
+            response.headers['Warning'] = '110 - "Response is Stale"'
+            return response
+        return jsonify({'response': ai_response})
+
+@app.route('/render/<preset>')
+def render_preset(preset):
+    params = request.args.to_dict()
+    tier = params.pop('tier', None)
+    lod = params.pop('lod', None)
+    fmt = params.pop('format', None)
+    params.pop('profile', None)
+    try:
+        result = render.render(
+            preset, params, tier=tier, fmt=fmt, lod=lod,
+            accept=request.headers.get('Accept', ''),
+            accept_encoding=request.headers.get('Accept-Encoding', ''),
+        )
+    except render.RenderError as e:
+        return jsonify({'error': str(e)}), 400
+    speculator.observe(preset, params, result['tier'], result['format'],
+                       request.headers.get('Accept-Encoding', ''), result['lod'])
+    response = Response(result['body'], mimetype=result['mimetype'])
+    if result['content_encoding']:
+        response.headers['Content-Encoding'] = result['content_encoding']
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    response.headers['X-Render-Cache'] = 'hit' if result['cached'] else 'miss'
+    response.headers['X-Render-Time'] = f"{result['render_seconds'] * 1000:.1f}ms"
+    response.headers['X-Encode-Time'] = f"{result['encode_seconds'] * 1000:.1f}ms"
+    return response
+
+@app.route('/analyze/<preset>')
+def analyze_preset(preset):
+    params = request.args.to_dict()
+    params.pop('profile', None)
+    try:
+        resolution = float(params.pop('resolution', clearance.RESOLUTION))
+        path_width = float(params.pop('path_width', clearance.PATH_WIDTH))
+    except ValueError:
+        return jsonify({'error': 'resolution and path_width must be numbers'}), 400
+    if not 0.01 <= resolution <= 0.5:
+        return jsonify({'error': 'resolution must be between 0.01 and 0.5 meters'}), 400
+    if not 0.3 <= path_width <= 3.0:
+        return jsonify({'error': 'path_width must be between 0.3 and 3 meters'}), 400
+    try:
+        report = clearance.analyze_preset(preset, params, resolution, path_width)
+    except render.RenderError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    kind = data.get('kind')
+    if kind not in job_pool.handlers:
+        return jsonify({'error': f"kind must be one of: {', '.join(job_pool.handlers)}"}), 400
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'priority must be an integer'}), 400
+    if abs(priority) > MAX_JOB_PRIORITY:
+        return jsonify({'error': f"priority must be between {-MAX_JOB_PRIORITY} and {MAX_JOB_PRIORITY}"}), 400
+    payload = data.get('payload') or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'payload must be a JSON object'}), 400
+    job_pool.start()
+    job_id = job_queue.submit(kind, payload, priority)
+    return jsonify({'job_id': job_id, 'status_url': f"/jobs/{job_id}"}), 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    try:
+        wait = min(float(request.args.get('wait', 0)), MAX_JOB_WAIT)
+    except ValueError:
+        wait = 0
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'job not found'}), 404
+    body = {'job_id': job_id, 'kind': job['kind'], 'status': job['status']}
+    if job['status'] == 'queued':
+        body['position'] = job_queue.position(job_id)
+    elif job['status'] == 'failed':
+        body['error'] = job['error']
+    elif job['status'] == 'done':
+        if job['result_type'].startswith('text/'):
+            body['response'] = job['result'].decode('utf-8')
+        else:
+            body['result_url'] = f"/jobs/{job_id}/result"
+    return jsonify(body)
+
+@app.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job['status'] != 'done':
+        return jsonify({'error': 'result not available'}), 404
+    return Response(job['result'], mimetype=job['result_type'])
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/profiles')
+@app.route('/debug/profiles/<request_id>')
+def get_profile(request_id=None):
+    token = request.headers.get('X-Archibot-Profile') or request.args.get('profile')
+    if not profiler.is_authorized(token):
+        return jsonify({'error': 'unauthorized'}), 403
+    if request_id is None:
+        return jsonify({'profiles': profiler.store.summaries()})
+    profile = profiler.store.get(request_id)
+    if profile is None:
+        return jsonify({'error': 'profile not found'}), 404
+    if request.args.get('format') == 'speedscope':
+        return jsonify(profile.speedscope())
+    return Response(profile.collapsed(), mimetype='text/plain')
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    import os
+    from services import design_session
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true': # Only the reloader's serving child
+        job_pool.start()
+        design_session.start()
+    app.run(debug=True)
@@ -0,0 +1,119 @@
+"""
+Production entry point: python serve.py [--workers N] [--threads T] [--bind HOST:PORT]
+
+Runs the Flask app under gunicorn with threaded (gthread) workers. A /predict call spends
+nearly all its time waiting on the model, so each worker process serves many requests on
+threads while separate processes spread rendering (CPU-bound, GIL-held) across cores.
+
+Sizing guidance, from tools/loadtest.py against the stub backend (0.5 s simulated
+generation, 32 concurrent clients, one core):
+    workers=1 threads=1   ->  2 req/s, p50 11 s
+    workers=1 threads=16  -> 31 req/s, p50 1.0 s
+    workers=2 threads=16  -> 58 req/s, p50 0.5 s
+  - Throughput on /predict tracks workers x threads until that reaches the offered
+    concurrency; the process count barely matters for it.
+  - Renders hold the GIL, so they scale with processes only: use one worker per core.
+  - Default: workers = cores, threads = 16. Raise threads, not workers, for more
+    concurrent generations; every extra worker costs a full copy of matplotlib.
+
+On SIGTERM gunicorn stops accepting, lets in-flight /predict and render requests finish
+for up to --graceful-timeout seconds, then exits. Workers are recycled after
+--max-requests requests (with jitter) to bound fragmentation in long-lived processes.
+An exiting worker gives its background jobs JOB_DRAIN_SECONDS to finish and hands the rest
+back to the queue, where another worker picks them up at once.
+
+WebSocket design sessions (services/design_session.py) are served on --ws-port by every
+worker, which share the port through SO_REUSEPORT; 0 disables them.
+"""
+import argparse
+import os
+
+from gunicorn.app.base import BaseApplication
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_THREADS = 16
+DEFAULT_TIMEOUT = 180 # Longest generation we are willing to wait on
+DEFAULT_GRACEFUL_TIMEOUT = 120 # Drain window for in-flight requests on shutdown
+DEFAULT_MAX_REQUESTS = 2000
+JOB_DRAIN_SECONDS = 10 # Short of the graceful timeout, so the master does not kill us first
+
+
+class ArchibotServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app
+
+
+def _when_ready(server):
+    server.log.info("Archibot ready: %s workers x %s threads", server.cfg.workers, server.cfg.threads)
+
+
+def _post_worker_init(worker):
+    # Job workers are threads, so they must start in each forked worker, not the master.
+    from app import job_pool
+    from services import design_session
+    job_pool.start()
+    design_session.start(worker.app.options.get('ws_port'), reuse_port=True)
+
+
+def _worker_exit(server, worker):
+    from app import job_pool
+    from services import design_session
+    design_session.stop()
+    requeued = job_pool.stop(timeout=JOB_DRAIN_SECONDS)
+    if requeued:
+        server.log.info("Worker %s requeued %d unfinished jobs", worker.pid, len(requeued))
+    server.log.info("Worker %s exited after draining", worker.pid)
+
+
+def build_options(args):
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': max(1, args.max_requests // 10),
+        'accesslog': '-' if args.access_log else None,
+        'when_ready': _when_ready,
+        'post_worker_init': _post_worker_init,
+        'worker_exit': _worker_exit,
+        'ws_port': args.ws_port, # Not a gunicorn setting; read back by _post_worker_init
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Archibot with gunicorn.")
+    parser.add_argument('--bind', default=os.getenv('ARCHIBOT_BIND', '0.0.0.0:8000'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('ARCHIBOT_WORKERS', DEFAULT_WORKERS)))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('ARCHIBOT_THREADS', DEFAULT_THREADS)))
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--graceful-timeout', type=int, default=DEFAULT_GRACEFUL_TIMEOUT)
+    parser.add_argument('--max-requests', type=int, default=DEFAULT_MAX_REQUESTS)
+    parser.add_argument('--ws-port', type=int, default=int(os.getenv('ARCHIBOT_WS_PORT', '8765')))
+    parser.add_argument('--access-log', action='store_true')
+    args = parser.parse_args(argv)
+
+    # Build the catalog prompt once in the master so workers inherit it. The model client
+    # holds sockets, so it is not created here but lazily per worker by get_client().
+    from services.prompt_catalog import catalog
+    catalog.current()
+
+    ArchibotServer(build_options(args)).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Circuit breaker for upstream model calls.
+
+Closed: calls go through and their outcomes fill a rolling window; a call that raised, or
+whose first token took longer than slow_seconds, counts as a failure. Once the window holds
+min_calls and the failure ratio reaches failure_ratio the breaker opens, and callers fail
+fast instead of tying up a worker for the full upstream timeout. After open_seconds it goes half-open and
+lets `probes` trial calls through one at a time: that many successes close it, a failure
+reopens it. State and every transition are exported as metrics.
+"""
+import collections
+import os
+import threading
+import time
+
+from services import metrics
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = metrics.registry.gauge(
+    'archibot_breaker_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open).', ('breaker',))
+BREAKER_TRANSITIONS = metrics.registry.counter(
+    'archibot_breaker_transitions_total', 'Circuit breaker state changes.', ('breaker', 'from_state', 'to_state'))
+BREAKER_REJECTED = metrics.registry.counter(
+    'archibot_breaker_rejected_total', 'Calls refused without trying upstream.', ('breaker',))
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable (circuit open); retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, window=20, min_calls=5, failure_ratio=0.5,
+                 slow_seconds=10.0, open_seconds=30.0, probes=2, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes = collections.deque(maxlen=window) # True = failure
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(STATE_VALUES[CLOSED], breaker=name)
+
+    def _transition(self, state):
+        BREAKER_TRANSITIONS.inc(breaker=self.name, from_state=self.state, to_state=state)
+        BREAKER_STATE.set(STATE_VALUES[state], breaker=self.name)
+        self.state = state
+        if state == OPEN:
+            self._opened_at = self.clock()
+        elif state == HALF_OPEN:
+            self._probe_successes = 0
+        else:
+            self._outcomes.clear()
+        self._probe_in_flight = False
+
+    def acquire(self):
+        """Admits a call or raises CircuitOpen. Every admitted call must be followed by
+        success(), failure() or release()."""
+        with self._lock:
+            if self.state == OPEN:
+                waited = self.clock() - self._opened_at
+                if waited < self.open_seconds:
+                    BREAKER_REJECTED.inc(breaker=self.name)
+                    raise CircuitOpen(self.name, self.open_seconds - waited)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    BREAKER_REJECTED.inc(breaker=self.name)
+                    raise CircuitOpen(self.name, 1.0)
+                self._probe_in_flight = True
+
+    def success(self, seconds):
+        """seconds: time to the call's first token (the whole call if it streamed nothing)."""
+        if seconds > self.slow_seconds:
+            self.failure()
+            return
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._transition(CLOSED)
+            else:
+                self._outcomes.append(False)
+
+    def failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append(True)
+            if len(self._outcomes) >= self.min_calls and \
+                    sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio:
+                self._transition(OPEN)
+
+    def release(self):
+        """Ends an admitted call that says nothing about upstream health (e.g. cancelled)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+
+def from_env(name):
+    return CircuitBreaker(
+        name,
+        failure_ratio=float(os.getenv('ARCHIBOT_BREAKER_FAILURE_RATIO', '0.5')),
+        slow_seconds=float(os.getenv('ARCHIBOT_BREAKER_SLOW_SECONDS', '10')),
+        open_seconds=float(os.getenv('ARCHIBOT_BREAKER_OPEN_SECONDS', '30')),
+    )
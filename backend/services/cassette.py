@@ -0,0 +1,245 @@
+"""
+Record/replay of upstream model calls for deterministic offline benchmarks.
+
+ARCHIBOT_CASSETTE_MODE=record wraps the real (or stub) client and stores every streamed
+generation -- chunk texts, their arrival offsets and usage metadata -- in an SQLite cassette,
+along with the arrival trace of incoming requests. ARCHIBOT_CASSETTE_MODE=replay serves those
+generations without touching the network, sleeping the recorded offsets scaled by
+ARCHIBOT_REPLAY_SPEED (2.0 = twice as fast, 0 = no delay). tools/replay_trace.py re-sends the
+recorded request trace against a running server.
+
+Calls are keyed by model, contents and generation settings. The catalog grounding
+(cached_content handle or inline system_instruction) is left out of the key, since handle
+names differ between runs. Each call also records a key of its contents alone: services.router
+picks models from live latencies, so on replay gemini pins each prompt to the model it was
+recorded with (recorded_model) instead of letting a different routing order miss the cassette.
+"""
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+from services.stubs import StubCaches
+
+MODE = os.getenv('ARCHIBOT_CASSETTE_MODE', 'off')
+CASSETTE_PATH = os.getenv('ARCHIBOT_CASSETTE', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cassette.sqlite3'))
+REPLAY_SPEED = float(os.getenv('ARCHIBOT_REPLAY_SPEED', '1.0'))
+
+UNKEYED_CONFIG = ('cached_content', 'system_instruction', 'http_options')
+USAGE_FIELDS = ('prompt_token_count', 'candidates_token_count', 'thoughts_token_count',
+                'cached_content_token_count', 'total_token_count')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    data BLOB NOT NULL,
+    prompt_key TEXT,
+    PRIMARY KEY (key, seq)
+);
+CREATE TABLE IF NOT EXISTS trace (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    offset REAL NOT NULL, -- seconds into the trace; only in cassettes from before arrived_at
+    route TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    arrived_at REAL -- wall clock, comparable across server processes
+);
+"""
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def _config_dict(config):
+    if config is None:
+        return {}
+    if hasattr(config, 'model_dump'):
+        data = config.model_dump(exclude_none=True, mode='json')
+    else:
+        data = {k: v for k, v in vars(config).items() if v is not None}
+    return {k: v for k, v in data.items() if k not in UNKEYED_CONFIG}
+
+
+def call_key(model, contents, config):
+    raw = json.dumps([model, contents, _config_dict(config)], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def prompt_key(contents):
+    return hashlib.sha256(json.dumps(contents, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _usage_dict(usage):
+    if usage is None:
+        return None
+    return {f: getattr(usage, f, None) for f in USAGE_FIELDS if getattr(usage, f, None) is not None}
+
+
+class CassetteStore:
+    def __init__(self, path=CASSETTE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._replay_seq = {} # key -> itertools.count, so repeats cycle through recordings
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        if 'prompt_key' not in {row[1] for row in conn.execute('PRAGMA table_info(calls)')}:
+            conn.execute('ALTER TABLE calls ADD COLUMN prompt_key TEXT') # Cassettes from before pinning
+        if 'arrived_at' not in {row[1] for row in conn.execute('PRAGMA table_info(trace)')}:
+            conn.execute('ALTER TABLE trace ADD COLUMN arrived_at REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS calls_prompt ON calls (prompt_key)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def save(self, key, model, chunks, usage, duration, contents_key=None):
+        data = zlib.compress(json.dumps({'chunks': chunks, 'usage': usage}).encode('utf-8'), 6)
+        conn = self._connect()
+        with self._lock:
+            seq = conn.execute('SELECT COALESCE(MAX(seq), -1) + 1 FROM calls WHERE key = ?', (key,)).fetchone()[0]
+            conn.execute('INSERT INTO calls (key, seq, model, recorded_at, duration, data, prompt_key) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (key, seq, model, time.time(), duration, data, contents_key))
+
+    def recorded_model(self, contents_key):
+        """The model of the first recording of these contents, or None."""
+        row = self._connect().execute(
+            'SELECT model FROM calls WHERE prompt_key = ? ORDER BY recorded_at LIMIT 1', (contents_key,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, key):
+        conn = self._connect()
+        count = conn.execute('SELECT COUNT(*) FROM calls WHERE key = ?', (key,)).fetchone()[0]
+        if not count:
+            raise CassetteMiss(f"No recording for call {key[:12]}")
+        with self._lock:
+            counter = self._replay_seq.setdefault(key, itertools.count())
+            seq = next(counter) % count
+        row = conn.execute('SELECT data FROM calls WHERE key = ? ORDER BY seq LIMIT 1 OFFSET ?', (key, seq)).fetchone()
+        return json.loads(zlib.decompress(row[0]))
+
+    def record_request(self, route, payload):
+        # Wall-clock time, since every server process records into the same trace.
+        self._connect().execute('INSERT INTO trace (offset, route, payload, arrived_at) VALUES (0, ?, ?, ?)',
+                                (route, json.dumps(payload), time.time()))
+
+    def trace(self):
+        """Yields (offset_seconds, route, payload) in arrival order, offsets from the first arrival."""
+        conn = self._connect()
+        first = conn.execute('SELECT MIN(arrived_at) FROM trace').fetchone()[0]
+        rows = conn.execute('SELECT offset, arrived_at, route, payload FROM trace ORDER BY arrived_at, id')
+        for offset, arrived_at, route, payload in rows:
+            yield (arrived_at - first if arrived_at is not None else offset), route, json.loads(payload)
+
+
+class _RecordingModels:
+    def __init__(self, inner, store):
+        self.inner = inner
+        self.store = store
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        key = call_key(model, contents, config)
+        start = time.perf_counter()
+        chunks = []
+        usage = None
+        for chunk in self.inner.generate_content_stream(model=model, contents=contents, config=config):
+            chunks.append([round(time.perf_counter() - start, 4), chunk.text or ''])
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+            yield chunk
+        self.store.save(key, model, chunks, _usage_dict(usage), time.perf_counter() - start,
+                        prompt_key(contents))
+
+    def generate_content(self, *, model, contents, config=None):
+        key = call_key(model, contents, config)
+        start = time.perf_counter()
+        response = self.inner.generate_content(model=model, contents=contents, config=config)
+        duration = time.perf_counter() - start
+        self.store.save(key, model, [[round(duration, 4), response.text or '']],
+                        _usage_dict(getattr(response, 'usage_metadata', None)), duration, prompt_key(contents))
+        return response
+
+
+class _ReplayModels:
+    def __init__(self, store, speed):
+        self.store = store
+        self.speed = speed
+
+    def _chunks(self, model, contents, config):
+        recording = self.store.load(call_key(model, contents, config))
+        usage = SimpleNamespace(**recording['usage']) if recording['usage'] else None
+        return recording['chunks'], usage
+
+    def _sleep_until(self, start, offset):
+        if self.speed > 0:
+            delay = start + offset / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        chunks, usage = self._chunks(model, contents, config)
+        start = time.perf_counter()
+        for n, (offset, text) in enumerate(chunks):
+            self._sleep_until(start, offset)
+            yield SimpleNamespace(text=text, usage_metadata=usage if n == len(chunks) - 1 else None)
+
+    def generate_content(self, *, model, contents, config=None):
+        chunks, usage = self._chunks(model, contents, config)
+        self._sleep_until(time.perf_counter(), chunks[-1][0] if chunks else 0)
+        return SimpleNamespace(text=''.join(text for _, text in chunks), usage_metadata=usage)
+
+
+class CassetteClient:
+    """Client wrapper: mode 'record' tees `inner`'s generations to the store, 'replay' serves them."""
+
+    def __init__(self, inner, store, mode, speed=REPLAY_SPEED):
+        self.mode = mode
+        if mode == 'record':
+            self.models = _RecordingModels(inner.models, store)
+            self.caches = inner.caches
+        elif mode == 'replay':
+            self.models = _ReplayModels(store, speed)
+            self.caches = StubCaches() # Cache handles are local bookkeeping in replay
+        else:
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CassetteStore()
+        return _store
+
+def wrap(client):
+    """Applies ARCHIBOT_CASSETTE_MODE to a freshly created client."""
+    if MODE in ('record', 'replay'):
+        return CassetteClient(client, get_store(), MODE)
+    return client
+
+def recorded_model(contents):
+    """In replay mode, the model `contents` was recorded with (to pin routing to); else None."""
+    if MODE != 'replay':
+        return None
+    return get_store().recorded_model(prompt_key(contents))
+
+def record_request(route, payload):
+    if MODE == 'record':
+        get_store().record_request(route, payload)
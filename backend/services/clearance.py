@@ -0,0 +1,333 @@
+"""
+Clearance and circulation analysis of a preset layout on an occupancy grid.
+
+The room floor is rasterized at RESOLUTION meters per cell; every placed fixture's footprint
+(except floor coverings) marks cells occupied, and the walls surround the grid. On that grid:
+
+- an exact Euclidean distance transform gives each free cell's clearance to the nearest
+  obstacle (separable: a nearest-obstacle scan along rows, then the lower envelope of
+  parabolas down columns, in memory linear in the grid);
+- a walker of PATH_WIDTH fits wherever clearance is at least half of it; flooding that region
+  from the doors gives where one can walk, and growing it by half the path width gives the
+  reachable floor area;
+- door swings, the working space in front of fixtures, and the approach to each fixture are
+  checked against it, and failures are reported as violations.
+
+Everything is NumPy over whole rows or arrays, so a room takes a few milliseconds and the
+check can run on every generated layout or across parameter sweeps (tools/sweep_clearance.py).
+Grids are capped at MAX_CELLS; a bigger room needs a coarser resolution.
+"""
+import time
+
+import numpy as np
+
+from services import render
+from services.figure_pool import pool
+
+RESOLUTION = 0.05 # meters per cell
+PATH_WIDTH = 0.9 # meters
+MAX_CELLS = 250_000 # e.g. 25 x 25 m at RESOLUTION; about 100 ms and 20 MB
+
+WALL_TOLERANCE = 0.2 # meters a fixture may reach into the walls (headboards are drawn into them)
+
+WALKABLE = {'area_rug'} # Floor coverings; one walks over them
+# Depth of clear floor needed in front of a fixture, in meters. The front is the side facing
+# away from the wall the fixture is closest to.
+FRONT_CLEARANCE = {
+    'toilet': 0.6,
+    'vanity_sink': 0.6,
+    'shower': 0.6,
+    'bathtub': 0.6,
+    'counter': 1.0,
+    'refrigerator': 1.0,
+    'stove': 1.0,
+    'dishwasher': 0.9,
+    'wardrobe': 0.9,
+}
+# Fixtures that must be reachable along a PATH_WIDTH path from a door.
+REACH_TARGETS = set(FRONT_CLEARANCE) | {'bed', 'sofa', 'dining_table', 'bookshelf'}
+
+
+def _lower_envelope(f):
+    """
+    min over m of (i - m)^2 + f[m] down every column of `f` at once: the lower envelope of
+    parabolas of Felzenszwalb and Huttenlocher, in O(rows x columns) time and memory. Loops run
+    over rows; each step is a NumPy operation across all columns. Infinite entries are skipped.
+    """
+    rows, width = f.shape
+    columns = np.arange(width)
+    apex = np.zeros((rows, width), dtype=np.intp) # Row of each envelope parabola, per column
+    bound = np.full((rows + 1, width), np.inf) # Where each parabola takes over from the last
+    top = np.full(width, -1, dtype=np.intp) # Index of the last envelope parabola; -1 when none
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for q in range(rows):
+            fq = f[q]
+            finite = np.isfinite(fq)
+            while True:
+                k = np.maximum(top, 0)
+                v = apex[k, columns]
+                cross = (fq + q * q - f[v, columns] - v * v) / (2.0 * (q - v))
+                hidden = finite & (top >= 0) & (cross <= bound[k, columns])
+                if not hidden.any():
+                    break
+                top = top - hidden
+            top = top + finite
+            k = top[finite]
+            at = columns[finite]
+            apex[k, at] = q
+            bound[k, at] = np.where(k > 0, cross[finite], -np.inf)
+            bound[k + 1, at] = np.inf
+
+        out = np.full((rows, width), np.inf)
+        has = top >= 0
+        k = np.zeros(width, dtype=np.intp)
+        for q in range(rows):
+            while True:
+                ahead = has & (bound[k + 1, columns] < q)
+                if not ahead.any():
+                    break
+                k = k + ahead
+            v = apex[k, columns]
+            out[q] = np.where(has, (q - v) ** 2 + f[v, columns], np.inf)
+    return out
+
+
+def distance_transform(obstacles):
+    """Euclidean distance, in cells, from every cell to the nearest True cell of `obstacles`."""
+    if obstacles.shape[0] > obstacles.shape[1]: # Loop over the shorter side
+        return distance_transform(obstacles.T).T
+    width = obstacles.shape[1]
+    columns = np.arange(width)
+    # Pass 1: distance along each row to the nearest obstacle in that row.
+    left = np.where(obstacles, columns, -np.inf)
+    left = np.maximum.accumulate(left, axis=1)
+    right = np.where(obstacles, columns, np.inf)
+    right = np.minimum.accumulate(right[:, ::-1], axis=1)[:, ::-1]
+    row_distance = np.minimum(columns - left, right - columns)
+    # Pass 2: for each cell, the best row to drop down (or up) to: min over m of (i-m)^2 + g[m]^2.
+    return np.sqrt(_lower_envelope(row_distance ** 2))
+
+
+def _run_minimum(labels, mask):
+    """Replaces each label with the minimum over its horizontal run of `mask` cells."""
+    flat_mask = mask.ravel()
+    starts = np.empty(flat_mask.size, dtype=bool)
+    starts[0] = True
+    starts[1:] = flat_mask[1:] != flat_mask[:-1]
+    starts[::mask.shape[1]] = True # Runs never continue onto the next row
+    starts = np.flatnonzero(starts)
+    minima = np.minimum.reduceat(labels.ravel(), starts)
+    return np.repeat(minima, np.diff(np.append(starts, flat_mask.size))).reshape(labels.shape)
+
+
+def label_regions(mask):
+    """
+    4-connected region labels of `mask` (cells outside it get mask.size). Alternating row and
+    column run-minimum sweeps settle in a handful of passes: one per turn a path makes.
+    """
+    outside = mask.size
+    labels = np.where(mask, np.arange(outside).reshape(mask.shape), outside)
+    while True:
+        swept = _run_minimum(labels, mask)
+        swept = _run_minimum(swept.T, mask.T).T
+        if np.array_equal(swept, labels):
+            return labels
+        labels = swept
+
+
+def flood(seeds, passable):
+    """Cells of `passable` 4-connected to `seeds` (seeds themselves are always included)."""
+    region = passable | seeds
+    labels = label_regions(region)
+    return region & np.isin(labels, labels[seeds])
+
+
+def largest_region(mask):
+    """The largest 4-connected region of `mask`."""
+    if not mask.any():
+        return mask
+    labels = label_regions(mask)
+    return labels == np.argmax(np.bincount(labels[mask]))
+
+
+class Grid:
+    """Cell-center coordinates of a room's floor."""
+
+    def __init__(self, room, resolution):
+        self.x0, self.y0, self.width, self.height = room
+        self.resolution = resolution
+        if not all(np.isfinite(v) for v in room) or self.width <= 0 or self.height <= 0:
+            raise render.RenderError(f"Room dimensions must be positive numbers, got {self.width} x {self.height}")
+        if not (np.isfinite(resolution) and resolution > 0):
+            raise render.RenderError(f"Resolution must be a positive number, got {resolution}")
+        columns = max(1, int(round(self.width / resolution)))
+        rows = max(1, int(round(self.height / resolution)))
+        if rows * columns > MAX_CELLS:
+            raise render.RenderError(
+                f"A {self.width:g} x {self.height:g} m room at {resolution:g} m is {rows * columns} cells; "
+                f"the limit is {MAX_CELLS}. Use a coarser resolution.")
+        self.xs = self.x0 + (np.arange(columns) + 0.5) * resolution
+        self.ys = self.y0 + (np.arange(rows) + 0.5) * resolution
+        self.shape = (rows, columns)
+
+    def boxes(self, bounds):
+        """Boolean (N, rows, columns) masks of the cells whose centers fall inside each box."""
+        b = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        inside_x = (self.xs[None, :] >= b[:, 0:1]) & (self.xs[None, :] < b[:, 2:3])
+        inside_y = (self.ys[None, :] >= b[:, 1:2]) & (self.ys[None, :] < b[:, 3:4])
+        return inside_y[:, :, None] & inside_x[:, None, :]
+
+    def box_distance(self, box):
+        """Distance in meters from every cell center to the box (0 inside it)."""
+        x0, y0, x1, y1 = box
+        dx = np.maximum(np.maximum(x0 - self.xs, 0.0), self.xs - x1)
+        dy = np.maximum(np.maximum(y0 - self.ys, 0.0), self.ys - y1)
+        return np.hypot(dy[:, None], dx[None, :])
+
+    def sector(self, center, radius, theta1):
+        """Cells within a quarter circle starting at angle theta1 (degrees, counter-clockwise)."""
+        dx = self.xs[None, :] - center[0]
+        dy = self.ys[:, None] - center[1]
+        angle = (np.degrees(np.arctan2(dy, dx)) - theta1) % 360
+        return (np.hypot(dx, dy) <= radius) & (angle <= 90)
+
+
+def _front_zone(room, box, depth):
+    """
+    (side, zone box) for the strip of `depth` in front of a fixture. Its back is against the
+    nearest wall; in a corner, the wall it runs along.
+    """
+    rx, ry, rw, rh = room
+    x0, y0, x1, y1 = box
+    gaps = {'left': x0 - rx, 'right': rx + rw - x1, 'bottom': y0 - ry, 'top': ry + rh - y1}
+    lengths = {'left': y1 - y0, 'right': y1 - y0, 'bottom': x1 - x0, 'top': x1 - x0}
+    nearest = min(gaps.values())
+    back = max((side for side in gaps if gaps[side] <= nearest + 0.15), key=lengths.get)
+    zones = {
+        'left': ('right', (x1, y0, x1 + depth, y1)),
+        'right': ('left', (x0 - depth, y0, x0, y1)),
+        'bottom': ('top', (x0, y1, x1, y1 + depth)),
+        'top': ('bottom', (x0, y0 - depth, x1, y0)),
+    }
+    return zones[back]
+
+
+def _overlaps(a, b, margin=0.0):
+    return a[0] < b[2] + margin and b[0] < a[2] + margin and a[1] < b[3] + margin and b[1] < a[3] + margin
+
+
+def _contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _runs(bounds, margin=0.02):
+    """Group index per fixture; touching fixtures (a counter run and what sits in it) share one."""
+    group = list(range(len(bounds)))
+    def root(n):
+        while group[n] != n:
+            group[n] = group[group[n]]
+            n = group[n]
+        return n
+    for a in range(len(bounds)):
+        for b in range(a + 1, len(bounds)):
+            if _overlaps(bounds[a], bounds[b], margin):
+                group[root(a)] = root(b)
+    return [root(n) for n in range(len(bounds))]
+
+
+def analyze(scene, resolution=RESOLUTION, path_width=PATH_WIDTH):
+    """Runs every check on a Scene (see presets/symbols.py) and returns a JSON-able report."""
+    start = time.perf_counter()
+    grid = Grid(scene.room, resolution)
+    rx, ry, rw, rh = scene.room
+    instances = [i for i in scene.instances if i.symbol.name not in WALKABLE]
+    bounds = [i.bounds() for i in instances]
+    masks = grid.boxes(bounds) if instances else np.zeros((0,) + grid.shape, dtype=bool)
+    occupied = masks.any(axis=0)
+
+    # Walls are a ring of obstacle cells around the floor.
+    padded = np.pad(occupied, 1, constant_values=True)
+    clearance = (distance_transform(padded)[1:-1, 1:-1] - 0.5) * resolution
+    clearance[occupied] = 0.0
+    radius = path_width / 2
+    walkable = clearance >= radius
+
+    violations = []
+
+    # Door swings must be clear, and walkers enter through the doors.
+    seeds = np.zeros(grid.shape, dtype=bool)
+    for door in scene.doors:
+        swing = grid.sector(door.hinge, door.leaf, door.theta1)
+        for n in np.flatnonzero(masks[:, swing].any(axis=1)):
+            violations.append({'check': 'door_swing', 'instance': instances[n].id,
+                               'detail': f"blocks the {door.leaf:.2f} m door swing"})
+        x0, y0, x1, y1 = door.opening()
+        mid = ((x0 + x1) / 2, (y0 + y1) / 2)
+        seeds |= (grid.box_distance((*mid, *mid)) <= door.leaf) & ~occupied
+    if seeds.any():
+        entry = 'door'
+        centers = flood(seeds, walkable)
+    else:
+        entry = 'open_floor' # The preset draws no door: walk the largest open region
+        centers = largest_region(walkable)
+
+    # Floor a walker's body can cover from any reachable center.
+    body = distance_transform(centers) * resolution <= radius if centers.any() else centers
+    reachable = body & ~occupied
+
+    runs = _runs(bounds)
+    for n, instance in enumerate(instances):
+        name = instance.symbol.name
+        box = bounds[n]
+        if box[0] < rx - WALL_TOLERANCE or box[1] < ry - WALL_TOLERANCE or \
+                box[2] > rx + rw + WALL_TOLERANCE or box[3] > ry + rh + WALL_TOLERANCE:
+            violations.append({'check': 'outside_room', 'instance': instance.id,
+                               'detail': "extends past the walls"})
+        for m in range(n + 1, len(instances)):
+            other = bounds[m]
+            if _overlaps(box, other, -resolution) and not (_contains(box, other) or _contains(other, box)):
+                violations.append({'check': 'collision', 'instance': instance.id,
+                                   'detail': f"overlaps {instances[m].id}"})
+        if name in FRONT_CLEARANCE:
+            depth = FRONT_CLEARANCE[name]
+            side, zone = _front_zone(scene.room, box, depth)
+            blockers = [instances[m].id for m in range(len(instances))
+                        if runs[m] != runs[n] and _overlaps(bounds[m], zone)]
+            if zone[0] < rx - 1e-9 or zone[1] < ry - 1e-9 or zone[2] > rx + rw + 1e-9 or zone[3] > ry + rh + 1e-9:
+                blockers.append('wall')
+            if blockers:
+                violations.append({'check': 'front_clearance', 'instance': instance.id,
+                                   'detail': f"needs {depth:.2f} m clear on its {side} side; blocked by {', '.join(blockers)}"})
+        if name in REACH_TARGETS:
+            if not (centers & (grid.box_distance(box) <= radius + resolution)).any():
+                violations.append({'check': 'unreachable', 'instance': instance.id,
+                                   'detail': f"no {path_width:.2f} m path from the entry"})
+
+    cell_area = resolution ** 2
+    free = ~occupied
+    return {
+        'room_area': round(rw * rh, 3),
+        'free_area': round(float(free.sum()) * cell_area, 3),
+        'reachable_area': round(float(reachable.sum()) * cell_area, 3),
+        'reachable_fraction': round(float(reachable.sum()) / max(1, int(free.sum())), 3),
+        'max_clearance': round(float(clearance.max()), 3),
+        'entry': entry,
+        'violations': violations,
+        'grid': list(grid.shape),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def scene_for(preset, raw_params):
+    """Builds a preset's scene without drawing it."""
+    params = render.preset_params(preset, raw_params) # Validates sizes and choices
+    fig = pool.acquire()
+    try:
+        render.render_figure(preset, params, fig)
+        return fig.axes[0].archibot_scene
+    finally:
+        pool.release(fig)
+
+
+def analyze_preset(preset, raw_params, resolution=RESOLUTION, path_width=PATH_WIDTH):
+    return analyze(scene_for(preset, raw_params), resolution, path_width)
@@ -0,0 +1,383 @@
+"""
+WebSocket design sessions: parameter changes in, plan diffs and streamed model text out.
+
+One session holds a preset and its parameters. Every change rebuilds the scene (no drawing)
+and pushes only what moved: instances are matched by their stable ids ("counter-1"), and
+each message carries the added, changed and removed ones plus any symbol definitions the
+client has not seen yet. Symbols are unit-space paths sent once per session; an instance is
+just a symbol key and the box it is scaled onto. The room's shell (walls, their colors, doors
+and windows) is sent whole whenever it changes. Each update also carries the clearance
+analysis of the new layout.
+
+Client -> server (JSON text frames):
+    {"type": "open", "preset": "bedroom", "params": {...}}   start over with a preset
+    {"type": "set", "params": {"bed_type": "king"}}          merge changes; null resets one
+    {"type": "ask", "prompt": "...", "profile": "fast"}      stream a model answer; profile
+                                                             (services.latency_profiles) optional.
+                                                             Supersedes an answer in progress.
+    {"type": "cancel"}                                       stop the answer in progress
+
+Server -> client:
+    {"type": "hello", "presets": [...]}
+    {"type": "diff", "version": n, "reset": bool, "preset", "params", "room", "shell", "symbols",
+     "added", "changed", "removed", "analysis", "seconds"}
+        shell: {"room": [x, y, w, h], "walls": {"thickness", "color", "floor"},
+                "doors": [{"x", "y", "leaf", "wall_thickness", "orientation", "hinge", "theta1"}],
+                "windows": [{"x", "y", "length", "thickness", "orientation", "color"}]}
+    {"type": "text", "ask": n, "delta": "..."} ... {"type": "text_done", "ask": n, "stale", "error"}
+    {"type": "error", "error": "..."}
+
+Bursts of "set" messages are coalesced, so a dragged slider costs one rebuild per batch.
+Served on ARCHIBOT_WS_PORT by the websockets threaded server, next to the HTTP app.
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import weakref
+
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import serve
+
+from services import clearance, latency_profiles, metrics, render
+from services.gemini import GenerationCancelled, get_gemini_response
+from services.speculation import speculator
+
+WS_PORT = int(os.getenv('ARCHIBOT_WS_PORT', '8765'))
+MAX_MESSAGE = 64 * 1024
+DECIMALS = 4
+
+SESSIONS = metrics.registry.gauge('archibot_ws_sessions', 'Open WebSocket design sessions.')
+MESSAGES = metrics.registry.counter('archibot_ws_messages_total', 'WebSocket messages received, by type.', ('type',))
+DIFF_BYTES = metrics.registry.histogram(
+    'archibot_ws_diff_bytes',
+    'Size of scene diffs pushed to sessions.',
+    buckets=(256, 512, 1_000, 2_000, 5_000, 10_000, 20_000, 50_000),
+)
+
+_symbol_wire = weakref.WeakKeyDictionary() # Symbol -> (key, definition)
+
+
+def _round(value):
+    if isinstance(value, float):
+        return round(value, DECIMALS)
+    if isinstance(value, (list, tuple)):
+        return [_round(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _round(v) for k, v in value.items()}
+    return value
+
+
+def symbol_wire(symbol):
+    """(key, definition) of a symbol; the key is a content hash, so equal symbols share it."""
+    cached = _symbol_wire.get(symbol)
+    if cached is None:
+        definition = {
+            'name': symbol.name,
+            'parts': [{
+                'role': part.role,
+                'fill': part.fill,
+                'detail': part.detail,
+                'style': _round(part.style),
+                'vertices': _round(part.path.vertices.tolist()),
+                'codes': None if part.path.codes is None else part.path.codes.tolist(),
+            } for part in symbol.parts],
+            'label_at': _round(symbol.label_at),
+            'label_style': _round(symbol.label_style),
+        }
+        raw = json.dumps(definition, sort_keys=True, separators=(',', ':'))
+        key = f"{symbol.name}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:10]}"
+        cached = _symbol_wire[symbol] = (key, definition)
+    return cached
+
+
+def shell_wire(scene):
+    return _round({
+        'room': list(scene.room),
+        'walls': scene.walls,
+        'doors': [{slot: getattr(door, slot) for slot in door.__slots__} for door in scene.doors],
+        'windows': scene.windows,
+    })
+
+
+def instance_wire(instance):
+    return {
+        'id': instance.id,
+        'symbol': symbol_wire(instance.symbol)[0],
+        'box': _round([instance.x, instance.y, instance.width, instance.height]),
+        'style': _round(instance.style),
+        'label': instance.label,
+    }
+
+
+class Session:
+    def __init__(self, connection):
+        self.connection = connection
+        self.preset = None
+        self.params = {}
+        self.version = 0
+        self._instances = {} # id -> wire dict last sent
+        self._room = None
+        self._shell = None
+        self._symbols_sent = set()
+        self._send_lock = threading.Lock()
+        self._ask_lock = threading.Lock()
+        self._ask_seq = 0
+        self._next_ask = None # (seq, prompt, profile) waiting for the answer in progress to stop
+        self._asking = False
+        self._closed = False
+
+    def send(self, message):
+        data = json.dumps(message, separators=(',', ':'))
+        with self._send_lock:
+            self.connection.send(data)
+        return len(data)
+
+    # --- Scene updates ---
+
+    def update(self, reset=False):
+        start = time.perf_counter()
+        speculator.enter()
+        try:
+            scene = clearance.scene_for(self.preset, self.params)
+            report = clearance.analyze(scene)
+        finally:
+            speculator.leave()
+        if reset:
+            self._instances, self._room, self._shell = {}, None, None
+
+        current = {i.id: i for i in scene.instances}
+        wires = {i: instance_wire(instance) for i, instance in current.items()}
+        added = [w for i, w in wires.items() if i not in self._instances]
+        changed = [w for i, w in wires.items() if i in self._instances and self._instances[i] != w]
+        removed = [i for i in self._instances if i not in wires]
+        symbols = {}
+        for w in added + changed:
+            if w['symbol'] not in self._symbols_sent:
+                key, definition = symbol_wire(current[w['id']].symbol)
+                symbols[key] = definition
+                self._symbols_sent.add(key)
+        room = _round(list(scene.room))
+        shell = shell_wire(scene)
+
+        self.version += 1
+        message = {
+            'type': 'diff',
+            'version': self.version,
+            'reset': reset,
+            'preset': self.preset,
+            'params': self.params,
+            'added': added,
+            'changed': changed,
+            'removed': removed,
+            'analysis': {k: report[k] for k in ('reachable_area', 'free_area', 'violations')},
+            'seconds': round(time.perf_counter() - start, 4),
+        }
+        if room != self._room:
+            message['room'] = room
+        if shell != self._shell:
+            message['shell'] = shell
+        if symbols:
+            message['symbols'] = symbols
+        DIFF_BYTES.observe(self.send(message))
+        self._instances, self._room, self._shell = wires, room, shell
+
+    def open(self, preset, params):
+        if preset not in render.PRESETS:
+            raise render.RenderError(f"Unknown preset '{preset}'. Choose from: {', '.join(render.PRESETS)}")
+        self.preset = preset
+        self.params = {k: v for k, v in (params or {}).items() if v is not None}
+        self.update(reset=True)
+
+    def set(self, changes):
+        if self.preset is None:
+            raise render.RenderError("Send an 'open' message first")
+        params = dict(self.params)
+        for name, value in changes.items():
+            if value is None:
+                params.pop(name, None)
+            else:
+                params[name] = value
+        render.preset_params(self.preset, params) # Validates before we commit to it
+        self.params = params
+        self.update()
+
+    # --- Model answers ---
+
+    def ask(self, prompt, profile=None):
+        if profile is not None and not isinstance(profile, str):
+            raise render.RenderError("'profile' must be a string")
+        try:
+            profile = latency_profiles.get(profile, route='session')
+        except ValueError as e:
+            raise render.RenderError(str(e))
+        with self._ask_lock:
+            self._ask_seq += 1 # Cancels the answer in progress, if any
+            self._next_ask = (self._ask_seq, prompt, profile)
+            if self._asking:
+                return # Its thread picks this one up once the cancelled answer stops
+            self._asking = True
+        threading.Thread(target=self._ask_loop, name='ws-ask', daemon=True).start()
+
+    def cancel(self):
+        with self._ask_lock:
+            self._ask_seq += 1
+            self._next_ask = None
+
+    def _ask_loop(self):
+        """One thread per session answers asks in turn; only the latest waiting one is kept."""
+        while True:
+            with self._ask_lock:
+                if self._next_ask is None or self._closed:
+                    self._asking = False
+                    return
+                seq, prompt, profile = self._next_ask
+                self._next_ask = None
+            try:
+                self._answer(seq, prompt, profile)
+            except Exception:
+                with self._ask_lock:
+                    self._asking = False
+                raise
+
+    def _answer(self, seq, prompt, profile):
+        streamed = []
+        def on_text(delta):
+            streamed.append(delta)
+            try:
+                self.send({'type': 'text', 'ask': seq, 'delta': delta})
+            except ConnectionClosed:
+                # The client left: a cancellation, not a model failure, so the router
+                # releases the model instead of counting it against its breaker.
+                self._closed = True
+                raise GenerationCancelled()
+        speculator.enter()
+        try:
+            answer = get_gemini_response(prompt, is_cancelled=lambda: self._closed or seq != self._ask_seq,
+                                         on_text=on_text, profile=profile)
+        except GenerationCancelled:
+            return
+        except ConnectionClosed:
+            return
+        finally:
+            speculator.leave()
+        error = answer[len('Error: '):] if answer.startswith('Error: ') else None
+        try:
+            if not streamed and error is None:
+                self.send({'type': 'text', 'ask': seq, 'delta': str(answer)}) # Stale answers arrive whole
+            self.send({'type': 'text_done', 'ask': seq, 'stale': getattr(answer, 'stale', False), 'error': error})
+        except ConnectionClosed:
+            pass
+
+    # --- Connection loop ---
+
+    def _receive(self, timeout=None):
+        raw = self.connection.recv(timeout=timeout)
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            message = None
+        return message if isinstance(message, dict) else {'type': 'invalid'}
+
+    def _coalesce(self, message):
+        """Merges queued 'set' messages into `message`; returns it and the first other message."""
+        if not isinstance(message.get('params') or {}, dict):
+            return message, None # handle() reports it
+        changes = dict(message.get('params') or {})
+        while True:
+            try:
+                following = self._receive(timeout=0)
+            except TimeoutError:
+                return {'type': 'set', 'params': changes}, None
+            if following.get('type') != 'set' or not isinstance(following.get('params') or {}, dict):
+                return {'type': 'set', 'params': changes}, following
+            MESSAGES.inc(type='set')
+            changes.update(following.get('params') or {})
+
+    @staticmethod
+    def _params(message):
+        params = message.get('params')
+        if params is None:
+            return {}
+        if not isinstance(params, dict):
+            raise render.RenderError("'params' must be an object")
+        return params
+
+    def handle(self, message):
+        kind = message.get('type')
+        if kind == 'open':
+            if not isinstance(message.get('preset'), str):
+                raise render.RenderError("'preset' must be a string")
+            self.open(message['preset'], self._params(message))
+        elif kind == 'set':
+            self.set(self._params(message))
+        elif kind == 'ask':
+            if not isinstance(message.get('prompt'), str):
+                raise render.RenderError("'prompt' must be a string")
+            self.ask(message['prompt'], message.get('profile'))
+        elif kind == 'cancel':
+            self.cancel()
+        else:
+            raise render.RenderError(f"Unknown message type '{kind}'")
+
+    def run(self):
+        self.send({'type': 'hello', 'presets': list(render.PRESETS)})
+        pending = None
+        try:
+            while True:
+                message = pending or self._receive()
+                pending = None
+                MESSAGES.inc(type=str(message.get('type')))
+                if message.get('type') == 'set':
+                    message, pending = self._coalesce(message)
+                try:
+                    self.handle(message)
+                except render.RenderError as e:
+                    self.send({'type': 'error', 'error': str(e)})
+                except (TypeError, ValueError, KeyError) as e:
+                    # A malformed value the checks above let through; the session survives it.
+                    self.send({'type': 'error', 'error': f"Invalid message: {e}"})
+        except ConnectionClosed:
+            pass
+        finally:
+            self._closed = True
+
+
+def _handler(connection):
+    SESSIONS.inc()
+    try:
+        Session(connection).run()
+    finally:
+        SESSIONS.inc(-1)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def start(port=WS_PORT, host='0.0.0.0', reuse_port=False):
+    """
+    Serves sessions on a background thread. reuse_port lets every gunicorn worker bind the
+    same port and have the kernel spread connections across them.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port and hasattr(socket, 'SO_REUSEPORT'):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+        sock.listen(128)
+        _server = serve(_handler, sock=sock, max_size=MAX_MESSAGE)
+        threading.Thread(target=_server.serve_forever, name='ws-server', daemon=True).start()
+        return _server
+
+def stop():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server = None
@@ -0,0 +1,87 @@
+"""
+Pool of reusable Agg figures for rendering presets without pyplot.
+
+Figures are cleared and handed back out instead of being rebuilt per request, and nothing is
+registered with pyplot's global figure manager, so nothing leaks between renders. Every few
+releases the process RSS is checked; above ARCHIBOT_RSS_CEILING_MB the idle figures are
+dropped and a collection is forced, so a burst that grew the pool does not pin memory.
+"""
+import gc
+import os
+import threading
+
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from services import metrics
+
+POOL_SIZE = int(os.getenv('ARCHIBOT_FIGURE_POOL', '4'))
+RSS_CEILING_MB = float(os.getenv('ARCHIBOT_RSS_CEILING_MB', '512'))
+RSS_CHECK_EVERY = 50 # releases between RSS checks
+
+POOL_IDLE = metrics.registry.gauge('archibot_figure_pool_idle', 'Idle figures in the render pool.')
+POOL_SHRINKS = metrics.registry.counter('archibot_figure_pool_shrinks_total', 'Times the RSS ceiling emptied the pool.')
+PROCESS_RSS = metrics.registry.gauge('archibot_process_rss_bytes', 'Resident set size at the last pool check.')
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """Current resident set size in bytes, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class FigurePool:
+    def __init__(self, size=POOL_SIZE, rss_ceiling_mb=RSS_CEILING_MB):
+        self.size = size
+        self.rss_ceiling = rss_ceiling_mb * 1024 * 1024
+        self._idle = []
+        self._lock = threading.Lock()
+        self._releases = 0
+        self.created = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                fig = self._idle.pop()
+                POOL_IDLE.set(len(self._idle))
+                return fig
+            self.created += 1
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        return fig
+
+    def release(self, fig):
+        fig.clear() # Drops axes, artists and the preset's scene
+        fig.set_dpi(rcParams['figure.dpi']) # draw_raster changes it per tier
+        with self._lock:
+            self._releases += 1
+            check = self._releases % RSS_CHECK_EVERY == 0
+            if len(self._idle) < self.size:
+                self._idle.append(fig)
+            POOL_IDLE.set(len(self._idle))
+        if check:
+            self.check_memory()
+
+    def check_memory(self):
+        rss = current_rss()
+        if rss is None:
+            return
+        PROCESS_RSS.set(rss)
+        if rss > self.rss_ceiling:
+            self.shrink()
+
+    def shrink(self):
+        with self._lock:
+            self._idle.clear()
+            POOL_IDLE.set(0)
+        POOL_SHRINKS.inc()
+        gc.collect()
+
+
+pool = FigurePool()
@@ -1,19 +1,237 @@
 from google import genai
+import collections
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
-load_dotenv()  
+from services import breaker, cassette, latency_profiles, metrics
+from services.prompt_catalog import catalog
+from services.router import classify, router
+from services.shared_cache import shared
+from services.stubs import StubClient
 
-def get_gemini_response(prompt: str) -> str:
-   
-    client = genai.Client()
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+load_dotenv()
+
+# Models come from services.router, which picks one per prompt by tier and live latency.
+# Seconds a fresh answer is shared across workers (0 = always ask the model), and how long
+# other workers wait on a generation of the same prompt before asking themselves.
+ANSWER_TTL = int(os.getenv('ARCHIBOT_ANSWER_TTL', '3600'))
+ANSWER_LEASE = 120
+
+CANCELLED_GENERATIONS = metrics.registry.counter(
+    'archibot_cancelled_generations_total',
+    'Generations abandoned because the client went away.',
+    ('stage',),
+)
+TOKENS_SAVED = metrics.registry.counter(
+    'archibot_cancelled_output_tokens_saved_total',
+    'Estimated output tokens not generated thanks to cancellation.',
+)
+STALE_ANSWERS = metrics.registry.counter(
+    'archibot_stale_answers_total',
+    'Answers served from the last good response while the model backend was unavailable.',
+)
+
+_client = None
+
+class GenerationCancelled(Exception):
+    """Raised when is_cancelled() reports the caller no longer wants the answer."""
+
+class _OutputTokenAverage:
+    """Running mean of output tokens per completed generation, to estimate what a cancel saved."""
+
+    def __init__(self, initial=400.0, weight=0.05):
+        self.value = initial
+        self.weight = weight
+        self._lock = threading.Lock()
+
+    def update(self, tokens):
+        with self._lock:
+            self.value += self.weight * (tokens - self.value)
+
+_output_tokens = _OutputTokenAverage()
+
+class Answer(str):
+    """
+    A model answer; stale is True when it was replayed from an earlier response. tier is the
+    routing tier, profile the latency profile, and model the model that generated it (None
+    when it came from a cache).
+    """
+    stale = False
+    tier = None
+    profile = None
+    model = None
+
+class _RecentAnswers:
+    """Last good answer per prompt, kept to fall back on while the breaker is open."""
+
+    def __init__(self, max_entries=int(os.getenv('ARCHIBOT_STALE_ANSWERS', '1024'))):
+        self.max_entries = max_entries
+        self._answers = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, prompt, answer):
+        with self._lock:
+            self._answers[prompt] = answer
+            self._answers.move_to_end(prompt)
+            if len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+
+    def get(self, prompt):
+        with self._lock:
+            return self._answers.get(prompt)
+
+_recent_answers = _RecentAnswers()
+
+def get_client():
+    """
+    Returns the shared model client; ARCHIBOT_BACKEND=stub selects the local stub and
+    ARCHIBOT_CASSETTE_MODE=record/replay wraps it for recording or offline replay.
+    """
+    global _client
+    if _client is None:
+        if cassette.MODE == 'replay':
+            _client = cassette.wrap(None)
+        elif os.getenv('ARCHIBOT_BACKEND') == 'stub':
+            _client = cassette.wrap(StubClient())
+        else:
+            _client = cassette.wrap(genai.Client())
+    return _client
+
+def _is_missing_cache(error):
+    return getattr(error, 'code', None) == 404 or 'CachedContent' in str(error)
+
+def _cancel(stage, tokens_so_far=0):
+    CANCELLED_GENERATIONS.inc(stage=stage)
+    TOKENS_SAVED.inc(max(0, round(_output_tokens.value - tokens_so_far)))
+    raise GenerationCancelled()
+
+def _generate(client, model, prompt, is_cancelled, on_text=None, profile=None):
+    """
+    Streams one generation, checking is_cancelled() between chunks and passing each to on_text.
+    Returns the text and the seconds to its first chunk (None if no text came back).
+    """
+    profile = profile or latency_profiles.get()
+    parts = []
+    usage = None
+    finish_reason = None
+    ttft = None
+    parse_seconds = 0.0
+    with metrics.timed('upstream', model):
+        sent = time.perf_counter()
+        stream = client.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=catalog.generate_config(client, model, profile)
         )
-        return response.text
+        try:
+            for chunk in stream:
+                start = time.perf_counter()
+                if ttft is None and chunk.text:
+                    ttft = start - sent
+                parts.append(chunk.text or '')
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                candidates = getattr(chunk, 'candidates', None)
+                if candidates:
+                    finish_reason = getattr(candidates[0], 'finish_reason', None) or finish_reason
+                parse_seconds += time.perf_counter() - start
+                if is_cancelled is not None and is_cancelled():
+                    _cancel('mid_stream', len(''.join(parts)) // 4)
+                if on_text is not None and chunk.text:
+                    on_text(chunk.text)
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close() # Drops the upstream connection if we stopped early
+    metrics.observe_stage('parse', parse_seconds, model)
+    latency_profiles.record(profile, model, ttft, time.perf_counter() - sent, usage, finish_reason)
+    output_tokens = getattr(usage, 'candidates_token_count', None)
+    if output_tokens:
+        _output_tokens.update(output_tokens)
+    return ''.join(parts), ttft
+
+def _stale_or_error(prompt, error):
+    previous = _recent_answers.get(prompt)
+    if previous is None:
+        return f"Error: {str(error)}"
+    STALE_ANSWERS.inc()
+    answer = Answer(previous)
+    answer.stale = True
+    return answer
+
+def _cached_answer(data, tier, profile):
+    answer = Answer(data.decode('utf-8'))
+    answer.tier, answer.profile = tier, profile.name
+    return answer
+
+def _shareable(answer):
+    """Fresh answers go to the shared cache; errors and stale replays do not."""
+    if isinstance(answer, Answer) and not answer.stale:
+        return answer.encode('utf-8')
+    return None
+
+def get_gemini_response(prompt: str, is_cancelled=None, on_text=None, tier=None, profile=None) -> str:
+    """
+    Returns the model's answer, or an "Error: ..." string.
+    tier picks the routing tier (services.router); by default the prompt is classified.
+    profile is a latency profile or its name (services.latency_profiles); by default
+    ARCHIBOT_LATENCY_PROFILE. An unknown name raises ValueError.
+    is_cancelled, if given, is polled before the call and between streamed chunks;
+    when it returns True the upstream stream is closed and GenerationCancelled is raised.
+    on_text, if given, receives each streamed piece of the answer as it arrives; it may raise
+    GenerationCancelled when nobody is left to receive them.
+    A prompt answered within ANSWER_TTL by any worker is served from the shared cache (in one
+    on_text piece), and concurrent askers of the same prompt share one generation.
+    While every model of the tier is unavailable (circuit open), or the call fails, a prompt
+    answered before gets that earlier answer back with .stale set instead of an error.
+    """
+    def check():
+        if is_cancelled is not None and is_cancelled():
+            _cancel('before_upstream')
+    if not isinstance(profile, latency_profiles.Profile):
+        profile = latency_profiles.get(profile)
+    check()
+    tier = tier or classify(prompt)
+    ttl = ANSWER_TTL if cassette.MODE == 'off' else 0 # Recording and replay must reach the client
+    answer, hit = shared.fill(
+        'answer', f"{tier}\n{profile.name}\n{catalog.current()[1]}\n{prompt}",
+        lambda: _ask(prompt, tier, profile, is_cancelled, on_text), _shareable,
+        lambda data: _cached_answer(data, tier, profile),
+        ttl=ttl, lease=ANSWER_LEASE, wait_check=check,
+    )
+    if hit:
+        _recent_answers.put(prompt, str(answer))
+        if on_text is not None:
+            on_text(str(answer))
+    return answer
+
+def _ask(prompt, tier, profile, is_cancelled, on_text):
+    try:
+        model = router.acquire(tier, cassette.recorded_model(prompt))
+    except breaker.CircuitOpen as e:
+        return _stale_or_error(prompt, e)
+    client = get_client()
+    start = time.perf_counter()
+    try:
+        try:
+            text, ttft = _generate(client, model, prompt, is_cancelled, on_text, profile)
+        except Exception as e:
+            if not _is_missing_cache(e):
+                raise
+            # The server dropped our cached catalog early; recreate it once.
+            catalog.invalidate(model)
+            text, ttft = _generate(client, model, prompt, is_cancelled, on_text, profile)
+    except GenerationCancelled:
+        router.release(model)
+        raise
     except Exception as e:
-        return f"Error: {str(e)}"
-    
-#print(get_gemini_response("Hello, world!") ) # Example usage for testing
\ No newline at end of file
+        router.failure(model)
+        return _stale_or_error(prompt, e)
+    router.success(model, tier, time.perf_counter() - start, ttft)
+    _recent_answers.put(prompt, text)
+    answer = Answer(text)
+    answer.tier, answer.profile, answer.model = tier, profile.name, model
+    return answer
+
+#print(get_gemini_response("Hello, world!") ) # Example usage for testing
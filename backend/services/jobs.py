@@ -0,0 +1,280 @@
+"""
+Durable local job queue for long generations and renders.
+
+Jobs live in a SQLite database (WAL mode) shared by every server process on the host.
+Workers claim the highest-priority queued job under a lease, which the pool renews while
+the job runs; if a worker dies mid-job the lease runs out and another worker picks the job
+up again, up to MAX_ATTEMPTS. A pool that is stopped (gunicorn recycling or shutting down a
+worker) waits a moment for its jobs, then hands the unfinished ones back to the queue at
+once. Finished results are kept for RESULT_TTL seconds and then swept.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+DB_PATH = os.getenv('ARCHIBOT_JOBS_DB', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archibot_jobs.sqlite3'))
+WORKERS = int(os.getenv('ARCHIBOT_JOB_WORKERS', '4'))
+LEASE_SECONDS = 60 # A job whose lease is not renewed for this long is assumed abandoned
+RENEW_INTERVAL = LEASE_SECONDS / 3
+MAX_ATTEMPTS = 3
+RESULT_TTL = int(os.getenv('ARCHIBOT_JOB_RESULT_TTL', '3600'))
+POLL_INTERVAL = 0.2 # Cross-process wakeup granularity
+SWEEP_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result BLOB,
+    result_type TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    lease_until REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created);
+CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at);
+"""
+
+TERMINAL = ('done', 'failed')
+
+
+class JobFailed(Exception):
+    """Raised by a handler whose work finished but produced an error, not a result."""
+
+
+class JobQueue:
+    def __init__(self, path=DB_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        self._changed = threading.Condition()
+        # Connections are opened per thread on first use, so none is inherited across fork.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def submit(self, kind, payload, priority=0):
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            'INSERT INTO jobs (id, kind, payload, priority, created) VALUES (?, ?, ?, ?, ?)',
+            (job_id, kind, json.dumps(payload), int(priority), self.clock()),
+        )
+        self._notify()
+        return job_id
+
+    def claim(self):
+        """Leases the next runnable job, or returns None. Safe across threads and processes."""
+        now = self.clock()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                """SELECT id FROM jobs
+                   WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?))
+                   ORDER BY priority DESC, created LIMIT 1""",
+                (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            job = conn.execute(
+                """UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                   started = ?, lease_until = ? WHERE id = ? RETURNING *""",
+                (now, now + LEASE_SECONDS, row['id']),
+            ).fetchone()
+            if job['attempts'] > MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished = ?, expires_at = ? WHERE id = ?",
+                    ('Gave up after repeated worker failures', now, now + RESULT_TTL, job['id']),
+                )
+                conn.execute('COMMIT')
+                self._notify()
+                return None
+            conn.execute('COMMIT')
+            return dict(job)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def complete(self, job_id, result, result_type):
+        now = self.clock()
+        self._connect().execute(
+            """UPDATE jobs SET status = 'done', result = ?, result_type = ?, finished = ?,
+               lease_until = NULL, expires_at = ? WHERE id = ?""",
+            (result, result_type, now, now + RESULT_TTL, job_id),
+        )
+        self._notify()
+
+    def fail(self, job_id, error):
+        now = self.clock()
+        self._connect().execute(
+            """UPDATE jobs SET status = 'failed', error = ?, finished = ?, lease_until = NULL,
+               expires_at = ? WHERE id = ?""",
+            (error, now, now + RESULT_TTL, job_id),
+        )
+        self._notify()
+
+    def renew(self, job_ids):
+        """Extends the leases of running jobs this process is still working on."""
+        if not job_ids:
+            return
+        marks = ', '.join('?' * len(job_ids))
+        self._connect().execute(
+            f"UPDATE jobs SET lease_until = ? WHERE status = 'running' AND id IN ({marks})",
+            (self.clock() + LEASE_SECONDS, *job_ids),
+        )
+
+    def release(self, job_id):
+        """Puts a running job back in the queue, without counting the interrupted attempt."""
+        self._connect().execute(
+            """UPDATE jobs SET status = 'queued', attempts = MAX(0, attempts - 1), started = NULL,
+               lease_until = NULL WHERE id = ? AND status = 'running'""",
+            (job_id,),
+        )
+        self._notify()
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def wait(self, job_id, timeout):
+        """Long-polls until the job finishes or `timeout` seconds pass; returns the job row."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in TERMINAL or remaining <= 0:
+                return job
+            with self._changed:
+                # Same-process completions wake us at once; other processes within POLL_INTERVAL.
+                self._changed.wait(min(POLL_INTERVAL, remaining))
+
+    def position(self, job_id):
+        """Number of queued jobs that will run before this one."""
+        job = self.get(job_id)
+        if job is None or job['status'] != 'queued':
+            return 0
+        return self._connect().execute(
+            """SELECT COUNT(*) FROM jobs WHERE status = 'queued'
+               AND (priority > ? OR (priority = ? AND created < ?))""",
+            (job['priority'], job['priority'], job['created']),
+        ).fetchone()[0]
+
+    def sweep(self):
+        """Deletes finished jobs whose results have expired."""
+        cursor = self._connect().execute(
+            'DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?', (self.clock(),),
+        )
+        return cursor.rowcount
+
+
+class WorkerPool:
+    """Threads that run jobs through `handlers`: kind -> fn(payload) -> (bytes, result_type)."""
+
+    def __init__(self, queue, handlers, size=WORKERS):
+        self.queue = queue
+        self.handlers = handlers
+        self.size = size
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._running = {} # thread name -> job id
+        self._released = set() # job ids handed back by stop(); their late results are dropped
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.size):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            threading.Thread(target=self._renew, name='job-lease', daemon=True).start()
+
+    def stop(self, timeout=None):
+        """
+        Stops claiming jobs and waits up to `timeout` seconds (forever if None) for the ones
+        running; any still unfinished go back to the queue for another worker. Returns their ids.
+        """
+        self._stop.set()
+        with self.queue._changed:
+            self.queue._changed.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            unfinished = list(self._running.values())
+            self._released.update(unfinished)
+        for job_id in unfinished:
+            self.queue.release(job_id)
+        return unfinished
+
+    def _renew(self):
+        while not self._stop.wait(RENEW_INTERVAL):
+            with self._lock:
+                running = list(self._running.values())
+            try:
+                self.queue.renew(running)
+            except sqlite3.Error:
+                pass # Retried on the next interval, well within the lease
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep > SWEEP_INTERVAL:
+            self._last_sweep = now
+            self.queue.sweep()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._maybe_sweep()
+            job = self.queue.claim()
+            if job is None:
+                with self.queue._changed:
+                    self.queue._changed.wait(POLL_INTERVAL)
+                continue
+            handler = self.handlers.get(job['kind'])
+            if handler is None:
+                self.queue.fail(job['id'], f"Unknown job kind '{job['kind']}'")
+                continue
+            name = threading.current_thread().name
+            with self._lock:
+                self._running[name] = job['id']
+            try:
+                result, result_type = handler(json.loads(job['payload']))
+            except Exception as e:
+                outcome = (self.queue.fail, job['id'], str(e))
+            else:
+                outcome = (self.queue.complete, job['id'], result, result_type)
+            with self._lock:
+                del self._running[name]
+                if job['id'] in self._released:
+                    continue # Another worker owns it now
+            outcome[0](*outcome[1:])
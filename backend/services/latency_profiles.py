@@ -0,0 +1,119 @@
+"""
+Named latency profiles: how long a generation may think and how much it may say.
+
+    fast       no thinking, short answers, low temperature
+    balanced   a small thinking budget and medium-length answers
+    thorough   dynamic thinking (the model decides), long answers
+
+Each profile maps to a thinking budget, max output tokens and temperature, sent with every
+generation in the GenerateContentConfig. Budgets are clamped to what each model accepts
+(gemini-2.5-pro cannot turn thinking off). A request can name its profile (the
+"latency_profile" field of /predict, or the X-Latency-Profile header); otherwise its route
+decides (ARCHIBOT_ROUTE_PROFILES, e.g. "predict=balanced;job=thorough;session=fast").
+
+Time to first token, generation time and token usage -- prompt, output, thinking, cached --
+are recorded per profile, so the trade of quality for latency is visible in /metrics.
+"""
+import os
+
+from google.genai import types
+
+from services import metrics
+
+DYNAMIC = -1 # thinking_budget that lets the model decide
+
+DEFAULT_ROUTE_PROFILES = 'predict=balanced;job=thorough;session=fast'
+DEFAULT_PROFILE = os.getenv('ARCHIBOT_LATENCY_PROFILE', 'balanced')
+
+# Model -> (smallest non-zero budget, largest budget, whether 0 turns thinking off)
+THINKING_LIMITS = {
+    'gemini-2.5-pro': (128, 32768, False),
+    'gemini-2.5-flash': (1, 24576, True),
+    'gemini-2.5-flash-lite': (512, 24576, True),
+}
+
+TTFT = metrics.registry.histogram(
+    'archibot_ttft_seconds', 'Time from sending a generation to its first text, by latency profile.', ('profile', 'model'))
+GENERATION_SECONDS = metrics.registry.histogram(
+    'archibot_generation_seconds', 'Full generation time, by latency profile.', ('profile', 'model'))
+TOKENS = metrics.registry.counter(
+    'archibot_generation_tokens_total', 'Tokens reported in usage metadata, by latency profile and kind.', ('profile', 'kind'))
+TRUNCATED = metrics.registry.counter(
+    'archibot_truncated_answers_total', 'Answers cut off at the profile\'s max output tokens.', ('profile',))
+
+USAGE_KINDS = {
+    'prompt': 'prompt_token_count',
+    'output': 'candidates_token_count',
+    'thinking': 'thoughts_token_count',
+    'cached': 'cached_content_token_count',
+}
+
+
+class Profile:
+    __slots__ = ('name', 'thinking_budget', 'max_output_tokens', 'temperature')
+
+    def __init__(self, name, thinking_budget, max_output_tokens, temperature):
+        self.name = name
+        self.thinking_budget = thinking_budget
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+
+    def budget_for(self, model):
+        budget = self.thinking_budget
+        limits = THINKING_LIMITS.get(model)
+        if limits is None or budget == DYNAMIC:
+            return budget
+        minimum, maximum, can_disable = limits
+        if budget == 0 and can_disable:
+            return 0
+        return min(max(budget, minimum), maximum)
+
+    def config(self, model):
+        """GenerateContentConfig fields for a generation on `model`."""
+        return {
+            'thinking_config': types.ThinkingConfig(thinking_budget=self.budget_for(model)),
+            'max_output_tokens': self.max_output_tokens,
+            'temperature': self.temperature,
+        }
+
+
+PROFILES = {
+    'fast': Profile('fast', thinking_budget=0, max_output_tokens=512, temperature=0.4),
+    'balanced': Profile('balanced', thinking_budget=1024, max_output_tokens=2048, temperature=0.7),
+    'thorough': Profile('thorough', thinking_budget=DYNAMIC, max_output_tokens=8192, temperature=1.0),
+}
+
+
+def _route_profiles(spec):
+    table = {}
+    for item in spec.split(';'):
+        route, _, name = item.partition('=')
+        if route.strip():
+            table[route.strip()] = name.strip()
+    return table
+
+ROUTE_PROFILES = _route_profiles(os.getenv('ARCHIBOT_ROUTE_PROFILES', DEFAULT_ROUTE_PROFILES))
+
+
+def get(name=None, route=None):
+    """
+    The profile called `name`, else the route's default, else ARCHIBOT_LATENCY_PROFILE.
+    Raises ValueError for an unknown name.
+    """
+    name = name or ROUTE_PROFILES.get(route) or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown latency profile '{name}'. Choose from: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def record(profile, model, ttft, seconds, usage, finish_reason=None):
+    """Records one finished generation; ttft is None when no text arrived."""
+    if ttft is not None:
+        TTFT.observe(ttft, profile=profile.name, model=model)
+    GENERATION_SECONDS.observe(seconds, profile=profile.name, model=model)
+    for kind, field in USAGE_KINDS.items():
+        count = getattr(usage, field, None)
+        if count:
+            TOKENS.inc(count, profile=profile.name, kind=kind)
+    if str(finish_reason).endswith('MAX_TOKENS'):
+        TRUNCATED.inc(profile=profile.name)
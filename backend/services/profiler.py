@@ -0,0 +1,185 @@
+"""
+Opt-in sampling profiler for single requests.
+
+A request carrying the profiling token (X-Archibot-Profile header or ?profile= query param)
+gets a sampler thread that snapshots the serving thread's stack every few milliseconds.
+Nothing runs for requests that do not ask for it. Finished profiles are kept in a bounded
+ring buffer and served as collapsed stacks (flamegraph.pl / speedscope input) or speedscope JSON.
+
+Profile ids are generated by the server (a client's X-Request-Id is kept as client_id only,
+so it cannot overwrite another profile). Every profile is also written to services.shared_cache
+for PROFILE_TTL, so /debug/profiles/<id> finds it whichever worker serves the lookup. The
+listing shows the serving worker's buffer only; each entry names the pid that recorded it.
+"""
+import collections
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from services.shared_cache import shared
+
+PROFILE_TOKEN = os.getenv('ARCHIBOT_PROFILE_TOKEN', '')
+SAMPLE_INTERVAL = float(os.getenv('ARCHIBOT_PROFILE_INTERVAL', '0.002')) # seconds
+MAX_PROFILES = int(os.getenv('ARCHIBOT_PROFILE_BUFFER', '32'))
+MAX_DEPTH = 128
+PROFILE_TTL = 3600 # seconds a profile stays retrievable from any worker
+
+
+def is_authorized(token):
+    """Profiling is disabled unless ARCHIBOT_PROFILE_TOKEN is set and matches."""
+    return bool(PROFILE_TOKEN) and bool(token) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profile:
+    def __init__(self, request_id, route, client_id=None):
+        self.request_id = request_id
+        self.route = route
+        self.client_id = client_id
+        self.pid = os.getpid()
+        self.started = time.time()
+        self.duration = 0.0
+        self.samples = 0
+        self.stacks = collections.Counter() # tuple of frame labels, root first -> sample count
+
+    def summary(self):
+        return {'request_id': self.request_id, 'client_id': self.client_id, 'route': self.route,
+                'pid': self.pid, 'started': self.started, 'duration': self.duration, 'samples': self.samples}
+
+    def encode(self):
+        data = self.summary()
+        data['stacks'] = [[list(stack), count] for stack, count in self.stacks.items()]
+        return json.dumps(data).encode('utf-8')
+
+    @classmethod
+    def decode(cls, raw):
+        data = json.loads(raw)
+        profile = cls(data['request_id'], data['route'], data['client_id'])
+        profile.pid, profile.started = data['pid'], data['started']
+        profile.duration, profile.samples = data['duration'], data['samples']
+        profile.stacks = collections.Counter({tuple(stack): count for stack, count in data['stacks']})
+        return profile
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format, one 'a;b;c count' line per stack."""
+        return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+    def speedscope(self):
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks.items():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({'name': label})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(count * SAMPLE_INTERVAL)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': f"{self.route} {self.request_id}",
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.duration,
+                'samples': samples,
+                'weights': weights,
+            }],
+            'name': self.request_id,
+            'exporter': 'archibot',
+        }
+
+
+class Sampler(threading.Thread):
+    """Samples one thread's Python stack until stopped."""
+
+    def __init__(self, profile, target_thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name=f"profiler-{profile.request_id}", daemon=True)
+        self.profile = profile
+        self.target = target_thread_id
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.profile.stacks[tuple(stack)] += 1
+            self.profile.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileStore:
+    """Ring buffer of this worker's finished profiles, backed by the shared cache for lookups."""
+
+    def __init__(self, maxlen=MAX_PROFILES, shared_cache=shared):
+        self.maxlen = maxlen
+        self.shared = shared_cache
+        self._profiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            if profile.request_id in self._profiles:
+                raise KeyError(f"Profile {profile.request_id} already exists")
+            self._profiles[profile.request_id] = profile
+            while len(self._profiles) > self.maxlen:
+                self._profiles.popitem(last=False)
+        self.shared.put('profile', profile.request_id, profile.encode(), PROFILE_TTL)
+
+    def get(self, request_id):
+        with self._lock:
+            profile = self._profiles.get(request_id)
+        if profile is None:
+            raw = self.shared.get('profile', request_id)
+            profile = Profile.decode(raw) if raw is not None else None
+        return profile
+
+    def summaries(self):
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles.values())]
+
+
+store = ProfileStore()
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+def start(request_id, route, client_id=None):
+    """Starts sampling the calling thread; returns a handle for stop()."""
+    profile = Profile(request_id, route, client_id)
+    sampler = Sampler(profile, threading.get_ident())
+    sampler.start()
+    return sampler, time.perf_counter()
+
+
+def stop(handle):
+    sampler, started = handle
+    sampler.stop()
+    sampler.profile.duration = time.perf_counter() - started
+    store.add(sampler.profile)
+    return sampler.profile
@@ -0,0 +1,203 @@
+import ast
+import hashlib
+import os
+import threading
+import time
+
+from google.genai import types
+
+PRESETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'presets')
+
+PRESET_FILES = {
+    'Kitchen': 'kitchen_preset.py',
+    'Bedroom': 'bedroom_preset.py',
+    'Bathroom': 'bathroom_preset.py',
+    'Living room': 'living_room_preset.py',
+}
+
+CACHE_TTL_SECONDS = int(os.getenv('ARCHIBOT_CATALOG_CACHE_TTL', '3600'))
+CACHE_REFRESH_MARGIN = 60 # Recreate the handle this many seconds before it expires
+CACHE_RETRY_AFTER = 300 # Back off this long after the backend refuses to cache
+TOO_SMALL = ('too small', 'min_total_token_count') # A refusal that holds until the catalog changes
+
+PREAMBLE = """You are Archibot, an assistant for residential floor-plan design.
+Ground every dimensional answer in the preset catalog below. All lengths are in meters.
+When a question falls outside the catalog, say which values you are assuming."""
+
+
+def _literal(node, env):
+    """Evaluates a constant expression, resolving names already seen in the same file."""
+    if isinstance(node, ast.Name):
+        return env.get(node.id)
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return None
+
+
+def collect_preset_values(path):
+    """
+    Reads fixture dimensions, clearances, colors and generator defaults from a preset file.
+    The file is parsed, not imported, so no figure is drawn.
+    Returns (constants, defaults) as ordered dicts of name -> value.
+    """
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    constants = {}
+    defaults = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if not (name.isupper() or isinstance(node.value, ast.Dict)):
+                continue
+            value = _literal(node.value, constants)
+            if value is not None:
+                constants[name] = value
+        elif isinstance(node, ast.FunctionDef) and node.name.startswith('generate_'):
+            args = node.args.args[len(node.args.args) - len(node.args.defaults):]
+            for arg, default in zip(args, node.args.defaults):
+                value = _literal(default, constants)
+                if value is not None:
+                    defaults[arg.arg] = value
+    return constants, defaults
+
+
+def _format_value(value):
+    if isinstance(value, dict):
+        return ', '.join(f"{k}={_format_value(v)}" for k, v in value.items())
+    if isinstance(value, tuple):
+        return 'x'.join(_format_value(v) for v in value)
+    return str(value)
+
+
+def build_system_instruction(presets_dir=PRESETS_DIR):
+    """Assembles the catalog system instruction from the preset modules."""
+    sections = [PREAMBLE]
+    for room, filename in PRESET_FILES.items():
+        constants, defaults = collect_preset_values(os.path.join(presets_dir, filename))
+        colors = {k: v for k, v in constants.items() if 'COLOR' in k}
+        tables = {k: v for k, v in constants.items() if isinstance(v, dict)}
+        dims = {k: v for k, v in constants.items() if k not in colors and k not in tables}
+        style = {k: v for k, v in defaults.items() if isinstance(v, str)}
+        params = {k: v for k, v in defaults.items() if k not in style}
+
+        lines = [f"## {room} preset ({filename})"]
+        if params:
+            lines.append("Default parameters: " + _format_value(params))
+        if style:
+            lines.append("Default options: " + _format_value(style))
+        if dims:
+            lines.append("Dimensions and clearances: " + _format_value(dims))
+        for name, table in tables.items():
+            lines.append(f"{name} (width x length): " + _format_value(table))
+        if colors:
+            lines.append("Color palette: " + _format_value(colors))
+        sections.append('\n'.join(lines))
+    return '\n\n'.join(sections)
+
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CatalogPrompt:
+    """
+    Holds the catalog system instruction and a server-side cached-content handle for it.
+    The instruction is rebuilt only when a preset file changes; the handle is reused until
+    the fingerprint changes or the cache is about to expire. One caller per model creates the
+    handle, outside the lock; the others send the instruction inline meanwhile.
+    """
+
+    def __init__(self, presets_dir=PRESETS_DIR, ttl_seconds=CACHE_TTL_SECONDS, clock=time.time):
+        self.presets_dir = presets_dir
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self.text = None
+        self.fingerprint = None
+        self._handles = {} # model -> (fingerprint, cache name, expires_at)
+        self._refused = {} # model -> (fingerprint, retry_at); retry_at None for good
+        self._creating = set() # models with a create in flight
+
+    def _preset_mtimes(self):
+        return tuple(os.stat(os.path.join(self.presets_dir, f)).st_mtime_ns for f in PRESET_FILES.values())
+
+    def current(self):
+        """Returns (text, fingerprint), rebuilding only if a preset file changed."""
+        mtimes = self._preset_mtimes()
+        if mtimes != self._mtimes:
+            with self._lock:
+                if mtimes != self._mtimes:
+                    self.text = build_system_instruction(self.presets_dir)
+                    self.fingerprint = fingerprint(self.text)
+                    self._mtimes = mtimes
+        return self.text, self.fingerprint
+
+    def cache_handle(self, client, model):
+        """
+        Returns the cached-content name for the current catalog, creating it on the server if needed.
+        Returns None when the backend will not cache it (e.g. below its minimum token count);
+        callers then send the instruction inline.
+        """
+        text, fp = self.current()
+        now = self.clock()
+        with self._lock:
+            handle = self._handles.get(model)
+            if handle and handle[0] == fp and now < handle[2] - CACHE_REFRESH_MARGIN:
+                return handle[1]
+            refused = self._refused.get(model)
+            if refused and refused[0] == fp and (refused[1] is None or now < refused[1]):
+                return None
+            if model in self._creating:
+                # Someone else is creating it; a handle inside its refresh margin still works.
+                return handle[1] if handle and handle[0] == fp and now < handle[2] else None
+            self._creating.add(model)
+
+        try:
+            cache = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=text,
+                    display_name=f"archibot-catalog-{fp[:12]}",
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+        except Exception as e:
+            permanent = any(marker in str(e) for marker in TOO_SMALL)
+            with self._lock:
+                self._refused[model] = (fp, None if permanent else now + CACHE_RETRY_AFTER)
+                self._creating.discard(model)
+            return None
+
+        with self._lock:
+            self._handles[model] = (fp, cache.name, now + self.ttl_seconds)
+            self._refused.pop(model, None)
+            self._creating.discard(model)
+        if handle and handle[0] != fp:
+            try:
+                client.caches.delete(name=handle[1])
+            except Exception:
+                pass # It will expire on its own
+        return cache.name
+
+    def invalidate(self, model):
+        """Drops the handle for `model`, e.g. after the server reports it expired."""
+        with self._lock:
+            self._handles.pop(model, None)
+
+    def generate_config(self, client, model, profile=None):
+        """
+        Returns a GenerateContentConfig grounded in the catalog, preferring the cached handle,
+        with the thinking budget and output limits of `profile` (services.latency_profiles).
+        """
+        settings = profile.config(model) if profile is not None else {}
+        name = self.cache_handle(client, model)
+        if name:
+            return types.GenerateContentConfig(cached_content=name, **settings)
+        text, _ = self.current()
+        return types.GenerateContentConfig(system_instruction=text, **settings)
+
+
+catalog = CatalogPrompt()
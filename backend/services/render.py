@@ -0,0 +1,363 @@
+"""
+Renders preset floor plans and encodes them compactly.
+
+The plans use about a dozen flat colors, so raster output is snapped to an exact palette
+built from the figure's own artists (plus a few anti-aliasing blends toward the floor color)
+and written as an optimized palette PNG, or lossless WebP when the client accepts it.
+SVG is compressed with brotli when available and accepted, otherwise gzip. Encoded results
+are kept in services.render_cache, which services.speculation also fills ahead of requests,
+and behind it in services.shared_cache, so a plan one worker has drawn is served by all.
+
+Each DPI tier draws at a matching level of detail (see presets/symbols.py): thumbnails skip
+fixture details, hatching and labels, previews keep the labels, screen and print draw
+everything. Asking for a level of detail without a tier picks the tier that matches it.
+"""
+import gzip
+import importlib
+import inspect
+import io
+import math
+import os
+import sys
+import time
+
+from matplotlib.colors import is_color_like, to_rgba, to_rgba_array
+from PIL import Image
+
+from services import metrics
+from services.figure_pool import pool
+from services.render_cache import Entry, cache
+from services.shared_cache import shared
+from services.prompt_catalog import PRESETS_DIR
+
+try:
+    import brotli
+except ImportError: # Optional; SVG falls back to gzip
+    brotli = None
+
+if PRESETS_DIR not in sys.path:
+    sys.path.insert(0, PRESETS_DIR)
+
+PRESETS = {
+    'kitchen': ('kitchen_preset', 'generate_kitchen_preset'),
+    'bedroom': ('bedroom_preset', 'generate_bedroom_preset'),
+    'bathroom': ('bathroom_preset', 'generate_bathroom_preset'),
+    'living_room': ('living_room_preset', 'generate_living_room_preset'),
+}
+
+# Parameters that take one of a few values, the room dimensions in meters, and the allowed
+# range of every other size, per preset. Requests outside them are refused (RenderError).
+CHOICES = {
+    'bedroom': {'bed_type': ('twin', 'full', 'queen', 'king')},
+    'bathroom': {'fixture_layout': ('shower', 'bathtub')},
+}
+ROOM_DIMENSIONS = {
+    'kitchen': ('kitchen_width', 'kitchen_height'),
+    'bedroom': ('room_width', 'room_height'),
+    'bathroom': ('bathroom_width', 'bathroom_height'),
+    'living_room': ('room_width', 'room_height'),
+}
+ROOM_RANGE = (1.5, 20.0) # meters; smaller rooms cannot hold the fixtures
+RANGES = {
+    'bedroom': {
+        'wall_thickness': (0.05, 0.5),
+        'door_width': (0.6, 1.5),
+        'window_width': (0.3, 4.0),
+        'nightstand_size': (0.2, 1.0),
+        'wardrobe_width': (0.5, 4.0),
+        'wardrobe_depth': (0.3, 1.0),
+    },
+}
+
+DPI_TIERS = {
+    'thumbnail': 30,
+    'preview': 60,
+    'screen': 96,
+    'print': 300,
+}
+TIER_LOD = {
+    'thumbnail': 'low',
+    'preview': 'medium',
+    'screen': 'full',
+    'print': 'full',
+}
+LOD_TIERS = {
+    'low': 'thumbnail',
+    'medium': 'preview',
+    'full': 'screen',
+}
+
+FORMATS = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+RENDER_TTL = int(os.getenv('ARCHIBOT_RENDER_TTL', '86400')) # seconds in the shared cache; 0 = local only
+RENDER_LEASE = 30 # seconds other workers wait on a render in progress before redoing it
+
+ANTIALIAS_BLENDS = (0.25, 0.5, 0.75) # Shades between each color and the floor, for smooth edges
+MAX_PALETTE = 256
+
+RENDER_BYTES = metrics.registry.histogram(
+    'archibot_render_bytes',
+    'Encoded size of rendered plans.',
+    ('preset', 'format', 'tier'),
+    buckets=(2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000, 500_000, 1_000_000, 2_000_000),
+)
+
+
+class RenderError(ValueError):
+    pass
+
+
+class RenderCancelled(Exception):
+    """Raised between render stages when the caller's is_cancelled() turns true."""
+
+
+def _generator(preset):
+    if preset not in PRESETS:
+        raise RenderError(f"Unknown preset '{preset}'. Choose from: {', '.join(PRESETS)}")
+    module_name, func_name = PRESETS[preset]
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def param_range(preset, name):
+    """(low, high) allowed for a numeric parameter, or None when only positivity is checked."""
+    if name in ROOM_DIMENSIONS.get(preset, ()):
+        return ROOM_RANGE
+    return RANGES.get(preset, {}).get(name)
+
+
+def preset_params(preset, raw):
+    """
+    Keeps only the generator's keyword arguments, coerced to the type of their defaults.
+    Raises RenderError for non-finite or out-of-range sizes, unknown choices and colors.
+    """
+    signature = inspect.signature(_generator(preset))
+    choices = CHOICES.get(preset, {})
+    params = {}
+    for name, value in raw.items():
+        parameter = signature.parameters.get(name)
+        if parameter is None or parameter.default is inspect.Parameter.empty or parameter.default is None:
+            continue
+        default = parameter.default
+        try:
+            value = type(default)(value) if not isinstance(default, str) else str(value)
+        except (TypeError, ValueError):
+            raise RenderError(f"Invalid value for {name}: {value!r}")
+        if isinstance(value, (int, float)):
+            bounds = param_range(preset, name)
+            if not math.isfinite(value):
+                raise RenderError(f"{name} must be a finite number, got {value}")
+            if bounds is None and value <= 0:
+                raise RenderError(f"{name} must be a positive number, got {value:g}")
+            if bounds is not None and not bounds[0] <= value <= bounds[1]:
+                raise RenderError(f"{name} must be between {bounds[0]:g} and {bounds[1]:g}, got {value:g}")
+        elif name in choices and value not in choices[name]:
+            raise RenderError(f"Invalid {name} '{value}'. Choose from: {', '.join(choices[name])}")
+        elif name.endswith('_color') and not is_color_like(value):
+            raise RenderError(f"Invalid color for {name}: {value!r}")
+        params[name] = value
+    return params
+
+
+def resolved_params(preset, params):
+    """Every generator parameter with defaults filled in, as a hashable tuple."""
+    signature = inspect.signature(_generator(preset))
+    resolved = {name: p.default for name, p in signature.parameters.items()
+                if p.default is not inspect.Parameter.empty and p.default is not None}
+    resolved.update(params)
+    return tuple(sorted(resolved.items()))
+
+
+def render_figure(preset, params, fig=None, lod=None):
+    return _generator(preset)(**params, fig=fig, lod=lod)
+
+
+def _rgb255(rgba, background=(1.0, 1.0, 1.0)):
+    r, g, b, a = rgba
+    return tuple(int(round((c * a + bg * (1 - a)) * 255)) for c, bg in zip((r, g, b), background))
+
+
+def figure_palette(fig):
+    """Exact RGB colors used by the figure's artists, plus anti-aliasing blends toward white."""
+    colors = {(255, 255, 255), (0, 0, 0), _rgb255(to_rgba(fig.get_facecolor()))}
+    for artist in fig.findobj():
+        for getter in ('get_facecolor', 'get_edgecolor', 'get_color'):
+            method = getattr(artist, getter, None)
+            if method is None:
+                continue
+            try:
+                value = to_rgba_array(method())
+            except (TypeError, ValueError):
+                continue
+            alpha = artist.get_alpha()
+            for rgba in value:
+                if alpha is not None:
+                    rgba = (*rgba[:3], rgba[3] * alpha)
+                if rgba[3] > 0:
+                    colors.add(_rgb255(rgba))
+    base = sorted(colors)
+    palette = list(base)
+    for color in base:
+        for t in ANTIALIAS_BLENDS:
+            palette.append(tuple(int(round(c + (255 - c) * t)) for c in color))
+    return list(dict.fromkeys(palette))[:MAX_PALETTE]
+
+
+def quantize(rgb_image, palette):
+    """Maps every pixel to its nearest palette color (no dithering)."""
+    palette_image = Image.new('P', (1, 1))
+    flat = [c for color in palette for c in color]
+    palette_image.putpalette(flat + flat[:3] * (MAX_PALETTE - len(palette)))
+    return rgb_image.quantize(palette=palette_image, dither=Image.Dither.NONE)
+
+
+def _png_bits(palette_size):
+    for bits in (1, 2, 4):
+        if palette_size <= 2 ** bits:
+            return bits
+    return 8
+
+
+def draw_raster(fig, dpi):
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+
+
+def encode_raster(fig, fmt):
+    """Encodes an already drawn figure."""
+    rgb = Image.frombuffer('RGBA', fig.canvas.get_width_height(), fig.canvas.buffer_rgba()).convert('RGB')
+    palette = figure_palette(fig)
+    indexed = quantize(rgb, palette)
+    buf = io.BytesIO()
+    if fmt == 'webp':
+        indexed.convert('RGB').save(buf, 'WEBP', lossless=True, method=4)
+    else:
+        indexed.save(buf, 'PNG', optimize=True, bits=_png_bits(len(palette)))
+    return buf.getvalue()
+
+
+def svg_encoding(accept_encoding):
+    if brotli is not None and 'br' in accept_encoding:
+        return 'br'
+    if 'gzip' in accept_encoding:
+        return 'gzip'
+    return None
+
+
+def encode_svg(fig, content_encoding=None):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='svg')
+    raw = buf.getvalue()
+    if content_encoding == 'br':
+        return brotli.compress(raw, quality=9)
+    if content_encoding == 'gzip':
+        return gzip.compress(raw, compresslevel=9)
+    return raw
+
+
+def negotiate_format(requested, accept):
+    if requested:
+        if requested not in FORMATS:
+            raise RenderError(f"Unknown format '{requested}'. Choose from: {', '.join(FORMATS)}")
+        return requested
+    return 'webp' if 'image/webp' in (accept or '') else 'png'
+
+
+def _pack(entry):
+    header = f"{entry.mimetype}\n{entry.content_encoding or ''}\n".encode('ascii')
+    return header + entry.body
+
+
+def _unpack(data):
+    mimetype, content_encoding, body = data.split(b'\n', 2)
+    return Entry(body, mimetype.decode('ascii'), content_encoding.decode('ascii') or None)
+
+
+def resolve_tier(tier=None, lod=None):
+    """(tier, lod) for a request; either may be None and is then derived from the other."""
+    if lod is not None and lod not in LOD_TIERS:
+        raise RenderError(f"Unknown level of detail '{lod}'. Choose from: {', '.join(LOD_TIERS)}")
+    if tier is None:
+        tier = LOD_TIERS[lod] if lod else 'screen'
+    if tier not in DPI_TIERS:
+        raise RenderError(f"Unknown tier '{tier}'. Choose from: {', '.join(DPI_TIERS)}")
+    return tier, lod or TIER_LOD[tier]
+
+
+def render(preset, raw_params, tier=None, fmt=None, accept='', accept_encoding='',
+           is_cancelled=None, speculative=False, lod=None):
+    """
+    Renders and encodes a preset, or serves it from the render or shared cache. Returns a
+    dict with body, format, mimetype, content_encoding, tier, lod, cached, and the
+    render/encode timings in seconds. tier and lod default to each other (see resolve_tier),
+    then to screen. is_cancelled is checked between stages, and while waiting on another
+    worker's render of the same plan (RenderCancelled); speculative renders fill the caches
+    without touching request metrics.
+    """
+    tier, lod = resolve_tier(tier, lod)
+    fmt = negotiate_format(fmt, accept)
+    params = preset_params(preset, raw_params)
+    content_encoding = svg_encoding(accept_encoding) if fmt == 'svg' else None
+    key = (preset, resolved_params(preset, params), tier, lod, fmt, content_encoding)
+
+    entry = cache.get(key, speculative=speculative)
+    if entry is not None:
+        return {
+            'body': entry.body,
+            'format': fmt,
+            'mimetype': entry.mimetype,
+            'content_encoding': entry.content_encoding,
+            'tier': tier,
+            'lod': lod,
+            'cached': True,
+            'render_seconds': 0.0,
+            'encode_seconds': 0.0,
+        }
+
+    def check():
+        if is_cancelled is not None and is_cancelled():
+            raise RenderCancelled(preset)
+
+    timings = {'render': 0.0, 'encode': 0.0}
+
+    def produce():
+        start = time.perf_counter()
+        fig = pool.acquire()
+        try:
+            render_figure(preset, params, fig, lod)
+            check()
+            if fmt != 'svg':
+                draw_raster(fig, DPI_TIERS[tier])
+                check()
+            built = time.perf_counter()
+            if fmt == 'svg':
+                body = encode_svg(fig, content_encoding)
+            else:
+                body = encode_raster(fig, fmt)
+        finally:
+            pool.release(fig)
+        timings['render'], timings['encode'] = built - start, time.perf_counter() - built
+        return Entry(body, FORMATS[fmt], content_encoding)
+
+    entry, shared_hit = shared.fill('render', repr(key), produce, _pack, _unpack,
+                                    ttl=RENDER_TTL, lease=RENDER_LEASE, wait_check=check)
+    entry.speculative = speculative
+    cache.put(key, entry)
+    if not speculative and not shared_hit:
+        metrics.observe_stage('render', timings['render'])
+        metrics.observe_stage('encode', timings['encode'])
+        RENDER_BYTES.observe(len(entry.body), preset=preset, format=fmt, tier=tier)
+    return {
+        'body': entry.body,
+        'format': fmt,
+        'mimetype': entry.mimetype,
+        'content_encoding': entry.content_encoding,
+        'tier': tier,
+        'lod': lod,
+        'cached': shared_hit,
+        'render_seconds': timings['render'],
+        'encode_seconds': timings['encode'],
+    }
@@ -0,0 +1,85 @@
+"""
+In-process LRU cache of encoded renders, bounded by total bytes.
+
+Keys are built by services.render from the preset, its fully resolved parameters, the DPI
+tier, level of detail, format and content encoding, so equivalent requests share an entry.
+Entries filled by the speculative renderer are flagged until a real request hits them; those
+first hits are counted as speculation hits, and flagged entries evicted without ever being
+hit as waste.
+"""
+import collections
+import os
+import threading
+
+from services import metrics
+
+MAX_BYTES = int(float(os.getenv('ARCHIBOT_RENDER_CACHE_MB', '64')) * 1024 * 1024)
+
+CACHE_REQUESTS = metrics.registry.counter('archibot_render_cache_requests_total', 'Render cache lookups by real requests.', ('result',))
+CACHE_BYTES = metrics.registry.gauge('archibot_render_cache_bytes', 'Encoded bytes held by the render cache.')
+SPECULATION_HITS = metrics.registry.counter('archibot_speculation_hits_total', 'Speculative renders later requested for real.')
+SPECULATION_WASTED = metrics.registry.counter('archibot_speculation_wasted_total', 'Speculative renders evicted without a hit.')
+
+
+class Entry:
+    __slots__ = ('body', 'mimetype', 'content_encoding', 'speculative')
+
+    def __init__(self, body, mimetype, content_encoding, speculative=False):
+        self.body = body
+        self.mimetype = mimetype
+        self.content_encoding = content_encoding
+        self.speculative = speculative
+
+
+class RenderCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, speculative=False):
+        """Looks up an entry; speculative lookups leave counters and recency alone."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if speculative:
+                return entry
+            if entry is None:
+                CACHE_REQUESTS.inc(result='miss')
+                return None
+            self._entries.move_to_end(key)
+            CACHE_REQUESTS.inc(result='hit')
+            if entry.speculative:
+                entry.speculative = False
+                SPECULATION_HITS.inc()
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                if evicted.speculative:
+                    SPECULATION_WASTED.inc()
+            CACHE_BYTES.set(self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            CACHE_BYTES.set(0)
+
+
+cache = RenderCache()
@@ -0,0 +1,192 @@
+"""
+Latency-aware routing of prompts to models.
+
+Each prompt is classified locally into a tier from its length, its intent and whether the
+answer needs a structured plan:
+    light      greetings and short questions ("How wide should a kitchen aisle be?")
+    plan       layout requests that name a room or dimensions, and very long prompts
+    standard   everything else
+
+A tier lists candidate models in order of preference and a latency target
+(ARCHIBOT_MODEL_TIERS, ARCHIBOT_TIER_TARGETS); the standard tier is required, and tiers left
+out of the config use its models. Every model keeps an EWMA of its generation time and of
+its error rate; its expected latency is the former plus the latter times FAILURE_SECONDS,
+what a failed call costs the user. The error rate also halves every
+ERROR_HALF_LIFE seconds without calls, so a model passed over after failures is tried again.
+The router takes the first candidate expected within the tier's target, else the fastest
+one, skipping models whose circuit breaker is open; a model with no history counts as on
+target, so it gets measured, and every PROBE_EVERY-th decision of a tier goes to its least
+recently measured model, so one slow cold call does not shut a model out for good. When a
+whole tier is unavailable it falls back along FALLBACK. A caller can pin a model (cassette
+replay does, so recordings are found whatever the live latencies say).
+
+A decision is a few precompiled regex searches and a loop over two or three candidates, a
+few microseconds.
+
+Per-tier request share is archibot_router_requests_total by tier over its sum; per-tier
+latency is archibot_router_latency_seconds.
+"""
+import os
+import re
+import threading
+import time
+
+from services import breaker, metrics
+
+LIGHT, STANDARD, PLAN = 'light', 'standard', 'plan'
+
+DEFAULT_TIERS = 'light=gemini-2.5-flash-lite,gemini-2.5-flash;standard=gemini-2.5-flash,gemini-2.5-flash-lite;plan=gemini-2.5-pro,gemini-2.5-flash'
+DEFAULT_TARGETS = 'light=3;standard=10;plan=30' # seconds
+FALLBACK = {LIGHT: STANDARD, STANDARD: LIGHT, PLAN: STANDARD}
+
+SHORT_PROMPT = 160 # characters; shorter questions without plan intent go to the light tier
+LONG_PROMPT = 2000 # characters; longer prompts go to the plan tier
+EWMA_WEIGHT = 0.2
+FAILURE_SECONDS = 30.0 # expected latency added at a 100% error rate
+ERROR_HALF_LIFE = 60.0 # seconds
+PROBE_EVERY = 50 # decisions per tier
+
+GREETING = re.compile(r"^\s*(hi|hello|hey|thanks|thank you|ok(ay)?|good (morning|afternoon|evening))\b", re.I)
+PLAN_INTENT = re.compile(r"\b(floor ?plans?|layouts?|lay out|arrange|arrangement|place|placement|design|"
+                         r"fit|position|step[- ]by[- ]step|json)\b", re.I)
+PLAN_SUBJECT = re.compile(r"\d\s*(m|cm|mm|ft|feet|meters?|metres?|x)\b|\d\s*x\s*\d|"
+                          r"\b(kitchen|bedroom|bathroom|living room|room|apartment|house|studio)\b", re.I)
+
+ROUTED = metrics.registry.counter(
+    'archibot_router_requests_total', 'Prompts routed, by tier and chosen model.', ('tier', 'model'))
+TIER_LATENCY = metrics.registry.histogram(
+    'archibot_router_latency_seconds', 'Generation time of routed prompts, by tier.', ('tier',))
+EXPECTED_LATENCY = metrics.registry.gauge(
+    'archibot_router_expected_latency_seconds', 'Error-weighted EWMA generation time per model.', ('model',))
+ERROR_RATE = metrics.registry.gauge(
+    'archibot_router_error_rate', 'EWMA error rate per model.', ('model',))
+
+
+def _parse(spec, convert):
+    table = {}
+    for item in spec.split(';'):
+        if item.strip():
+            name, _, value = item.partition('=')
+            table[name.strip()] = convert(value.strip())
+    return table
+
+
+def classify(prompt):
+    """The tier a prompt should be answered by; pure string checks, no model call."""
+    length = len(prompt)
+    if length > LONG_PROMPT:
+        return PLAN
+    if PLAN_INTENT.search(prompt) and PLAN_SUBJECT.search(prompt):
+        return PLAN
+    if length <= SHORT_PROMPT or GREETING.match(prompt):
+        return LIGHT
+    return STANDARD
+
+
+class ModelStats:
+    __slots__ = ('latency', 'errors', 'updated')
+
+    def __init__(self):
+        self.latency = None # EWMA seconds; None until the first success
+        self.errors = 0.0
+        self.updated = 0.0
+
+    def error_rate(self, now):
+        if not self.errors:
+            return 0.0
+        return self.errors * 0.5 ** ((now - self.updated) / ERROR_HALF_LIFE)
+
+    def expected(self, now):
+        return (self.latency or 0.0) + self.error_rate(now) * FAILURE_SECONDS
+
+
+class Router:
+    def __init__(self, tiers=None, targets=None, make_breaker=breaker.from_env, clock=time.monotonic):
+        self.tiers = tiers or _parse(os.getenv('ARCHIBOT_MODEL_TIERS', DEFAULT_TIERS),
+                                     lambda v: tuple(m.strip() for m in v.split(',') if m.strip()))
+        self.targets = targets or _parse(os.getenv('ARCHIBOT_TIER_TARGETS', DEFAULT_TARGETS), float)
+        for tier, candidates in self.tiers.items():
+            if not candidates:
+                raise ValueError(f"Model tier '{tier}' lists no models")
+        if STANDARD not in self.tiers:
+            raise ValueError(f"Model tiers must include '{STANDARD}', the tier others fall back to; "
+                             f"got {', '.join(self.tiers) or 'none'}")
+        self.clock = clock
+        models = dict.fromkeys(m for candidates in self.tiers.values() for m in candidates)
+        self.stats = {model: ModelStats() for model in models}
+        self.breakers = {model: make_breaker(model) for model in models}
+        self._decisions = dict.fromkeys(self.tiers, 0)
+        self._lock = threading.Lock()
+
+    def candidates(self, tier):
+        """Models of `tier` in the order they should be tried."""
+        now = self.clock()
+        target = self.targets.get(tier, float('inf'))
+        models = self.tiers.get(tier) or self.tiers[STANDARD]
+        expected = {m: self.stats[m].expected(now) for m in models}
+        on_target = [m for m in models if expected[m] <= target]
+        ordered = on_target + sorted((m for m in models if m not in on_target), key=expected.get)
+        with self._lock:
+            count = self._decisions[tier] = self._decisions.get(tier, 0) + 1
+        if count % PROBE_EVERY == 0:
+            stalest = min(models, key=lambda m: self.stats[m].updated)
+            ordered.remove(stalest)
+            ordered.insert(0, stalest)
+        return ordered
+
+    def acquire(self, tier, pinned=None):
+        """
+        Picks a model for `tier` and admits the call through its breaker; returns the model.
+        A known `pinned` model is tried first, whatever its latency.
+        Falls back to the FALLBACK tier when every candidate is open, then raises CircuitOpen.
+        Every admitted call must be followed by success(), failure() or release().
+        """
+        error = None
+        if pinned in self.breakers:
+            try:
+                self.breakers[pinned].acquire()
+            except breaker.CircuitOpen as e:
+                error = e
+            else:
+                ROUTED.inc(tier=tier, model=pinned)
+                return pinned
+        for current in dict.fromkeys((tier, FALLBACK.get(tier, STANDARD))):
+            for model in self.candidates(current):
+                try:
+                    self.breakers[model].acquire()
+                except breaker.CircuitOpen as e:
+                    error = error or e
+                    continue
+                ROUTED.inc(tier=tier, model=model)
+                return model
+        raise error
+
+    def _update(self, model, seconds, failed):
+        stats = self.stats[model]
+        now = self.clock()
+        with self._lock:
+            errors = stats.error_rate(now)
+            stats.errors = errors + EWMA_WEIGHT * (float(failed) - errors)
+            stats.updated = now
+            if seconds is not None and stats.latency is None:
+                stats.latency = seconds
+            elif seconds is not None:
+                stats.latency += EWMA_WEIGHT * (seconds - stats.latency)
+        EXPECTED_LATENCY.set(stats.expected(now), model=model)
+        ERROR_RATE.set(stats.errors, model=model)
+
+    def success(self, model, tier, seconds, ttft=None):
+        # Slowness is judged on the first token: a long answer streaming steadily is healthy.
+        self.breakers[model].success(seconds if ttft is None else ttft)
+        self._update(model, seconds, False)
+        TIER_LATENCY.observe(seconds, tier=tier)
+
+    def failure(self, model):
+        self.breakers[model].failure()
+        self._update(model, None, True)
+
+    def release(self, model):
+        self.breakers[model].release()
+
+
+router = Router()
@@ -0,0 +1,378 @@
+"""
+Cache shared by every server process: model answers and encoded renders.
+
+Stores, picked by ARCHIBOT_SHARED_CACHE:
+    sqlite (default)       a WAL-mode SQLite file on the host (ARCHIBOT_SHARED_CACHE_DB)
+    redis://host:port/db   any server speaking the Redis protocol (RESP); tools/resp_standin.py
+                           serves one locally for tests and benchmarks
+    off                    nothing shared; each process keeps only its in-process caches
+
+Every entry has a TTL. fill() is single-flight across processes: the first caller to miss
+takes a short lease on the key and computes the value; the others poll for it until the
+lease runs out, after which one of them takes over. N workers asking for the same thing pay
+for it once, so adding a worker adds capacity instead of splitting the hit rate N ways.
+A fill whose result is not cached (an error, say) or that raises leaves an UNCACHED marker
+for UNCACHED_TTL seconds: the callers waiting on it, and any arriving meanwhile, then compute
+side by side rather than queueing for the lease one after another. No caller waits longer
+than MAX_WAIT.
+
+The SQLite store is bounded: every SWEEP_INTERVAL seconds a writer deletes expired rows and,
+while the entries exceed ARCHIBOT_SHARED_CACHE_MAX_MB, the oldest ones. Freed pages are reused,
+so the file stays near that size. A Redis server bounds itself (maxmemory).
+
+Store errors are counted and treated as misses; the shared cache never fails a request.
+"""
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+from services import metrics
+
+BACKEND = os.getenv('ARCHIBOT_SHARED_CACHE', 'sqlite')
+DB_PATH = os.getenv('ARCHIBOT_SHARED_CACHE_DB', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archibot_cache.sqlite3'))
+KEY_PREFIX = 'archibot:'
+MAX_BYTES = int(float(os.getenv('ARCHIBOT_SHARED_CACHE_MAX_MB', '256')) * 1024 * 1024)
+POLL_INTERVAL = 0.05 # seconds between checks while another process fills a key
+MAX_WAIT = 30.0 # seconds a caller waits on another's fill before computing itself
+UNCACHED = b'\x00archibot:uncached' # Stored in place of a value the last fill did not cache
+UNCACHED_TTL = 2.0
+SWEEP_INTERVAL = 30.0 # seconds between sweeps of expired and excess SQLite rows
+EVICT_TO = 0.9 # an over-full store is trimmed to this fraction of MAX_BYTES
+SOCKET_TIMEOUT = 2.0
+
+SHARED_REQUESTS = metrics.registry.counter(
+    'archibot_shared_cache_requests_total',
+    'Shared cache lookups by namespace and result (hit, miss, waited, uncached, timeout, error).',
+    ('namespace', 'result'),
+)
+SHARED_EVICTIONS = metrics.registry.counter(
+    'archibot_shared_cache_evictions_total',
+    'SQLite shared cache rows deleted by sweeps, by reason (expired, size).',
+    ('reason',),
+)
+SHARED_FILLS = metrics.registry.counter(
+    'archibot_shared_cache_fills_total',
+    'Values computed to fill the shared cache, by namespace and outcome.',
+    ('namespace', 'outcome'),
+)
+
+
+class StoreError(Exception):
+    pass
+
+
+# --- SQLite ---
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    stored_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    lease_until REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at);
+"""
+SIZE_COLUMNS = ('size INTEGER NOT NULL DEFAULT 0', 'stored_at REAL NOT NULL DEFAULT 0')
+
+
+class SQLiteStore:
+    """Entries and fill leases in one SQLite file, shared by the processes on a host."""
+
+    def __init__(self, path=DB_PATH, clock=time.time, max_bytes=MAX_BYTES):
+        self.path = path
+        self.clock = clock
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._last_sweep = clock()
+        self._sweep_lock = threading.Lock()
+        # Connections are opened per thread on first use, so none is inherited across fork.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(entries)')}
+            if 'size' not in columns: # A file from before the size bound
+                for column in SIZE_COLUMNS:
+                    conn.execute(f'ALTER TABLE entries ADD COLUMN {column}')
+                conn.execute('UPDATE entries SET size = length(value)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_age ON entries (stored_at)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM entries WHERE key = ? AND expires_at > ?', (key, self.clock()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = self.clock()
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO entries (key, value, expires_at, size, stored_at) VALUES (?, ?, ?, ?, ?)',
+                     (key, value, now + ttl, len(value), now))
+        if now - self._last_sweep >= SWEEP_INTERVAL and self._sweep_lock.acquire(blocking=False):
+            try:
+                self._last_sweep = now
+                self.sweep(now)
+            finally:
+                self._sweep_lock.release()
+
+    def sweep(self, now=None):
+        """Deletes expired rows, then the oldest rows while the entries exceed max_bytes."""
+        now = self.clock() if now is None else now
+        conn = self._connect()
+        expired = conn.execute('DELETE FROM entries WHERE expires_at < ?', (now,)).rowcount
+        conn.execute('DELETE FROM leases WHERE lease_until < ?', (now,))
+        SHARED_EVICTIONS.inc(max(0, expired), reason='expired')
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - int(self.max_bytes * EVICT_TO)
+            evicted = conn.execute(
+                """DELETE FROM entries WHERE key IN (
+                       SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY stored_at, key) - size AS before
+                                        FROM entries)
+                       WHERE before < ?)""",
+                (excess,),
+            ).rowcount
+            SHARED_EVICTIONS.inc(evicted, reason='size')
+
+    def lock(self, key, token, lease):
+        """Takes the fill lease on `key` unless another caller holds an unexpired one."""
+        now = self.clock()
+        cursor = self._connect().execute(
+            """INSERT INTO leases (key, token, lease_until) VALUES (?, ?, ?)
+               ON CONFLICT (key) DO UPDATE SET token = excluded.token, lease_until = excluded.lease_until
+               WHERE leases.lease_until < ?""",
+            (key, token, now + lease, now),
+        )
+        return cursor.rowcount == 1
+
+    def unlock(self, key, token):
+        self._connect().execute('DELETE FROM leases WHERE key = ? AND token = ?', (key, token))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM entries')
+        conn.execute('DELETE FROM leases')
+
+
+# --- Redis protocol ---
+
+def _encode_command(args):
+    out = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode('utf-8')
+        elif isinstance(arg, int):
+            arg = str(arg).encode('ascii')
+        out.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(out)
+
+
+def _read_reply(stream):
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError("Connection closed by the cache server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode('utf-8')
+    if kind == b'-':
+        raise StoreError(rest.decode('utf-8'))
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        size = int(rest)
+        if size < 0:
+            return None
+        data = stream.read(size + 2)
+        if len(data) != size + 2:
+            raise ConnectionError("Connection closed by the cache server")
+        return data[:-2]
+    if kind == b'*':
+        count = int(rest)
+        return None if count < 0 else [_read_reply(stream) for _ in range(count)]
+    raise StoreError(f"Unexpected reply from the cache server: {line!r}")
+
+
+class RespStore:
+    """Entries and fill leases on a Redis-protocol server, shared by every host that reaches it."""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip('/') or 0)
+        self.password = parsed.password
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=SOCKET_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+            if self.password:
+                self._send(conn, 'AUTH', self.password)
+            if self.db:
+                self._send(conn, 'SELECT', self.db)
+        return conn
+
+    def _send(self, conn, *args):
+        sock, stream = conn
+        sock.sendall(_encode_command(args))
+        return _read_reply(stream)
+
+    def command(self, *args):
+        try:
+            return self._send(self._connect(), *args)
+        except OSError as e:
+            conn, self._local.conn = getattr(self._local, 'conn', None), None
+            if conn is not None:
+                conn[0].close() # Reconnect on the next command
+            raise StoreError(str(e)) from e
+
+    def get(self, key):
+        return self.command('GET', key)
+
+    def set(self, key, value, ttl):
+        self.command('SET', key, value, 'PX', max(1, int(ttl * 1000)))
+
+    def lock(self, key, token, lease):
+        return self.command('SET', f"{key}:lease", token, 'NX', 'PX', max(1, int(lease * 1000))) == 'OK'
+
+    def unlock(self, key, token):
+        # Compare-then-delete is not atomic without a script; a lease that expires in between
+        # and is retaken loses at most one redundant fill.
+        if self.command('GET', f"{key}:lease") == token.encode('utf-8'):
+            self.command('DEL', f"{key}:lease")
+
+    def clear(self):
+        cursor = '0'
+        while True:
+            cursor, keys = self.command('SCAN', cursor, 'MATCH', f"{KEY_PREFIX}*", 'COUNT', 500)
+            if keys:
+                self.command('DEL', *keys)
+            cursor = cursor.decode('ascii')
+            if cursor == '0':
+                return
+
+
+def open_store(backend=BACKEND):
+    if backend in ('', 'off'):
+        return None
+    if backend == 'sqlite':
+        return SQLiteStore()
+    if backend.startswith(('redis://', 'resp://')):
+        return RespStore(backend)
+    raise ValueError(f"Unknown ARCHIBOT_SHARED_CACHE '{backend}'. Use sqlite, redis://host:port/db or off")
+
+
+# --- Front end ---
+
+class SharedCache:
+    def __init__(self, store):
+        self.store = store
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    @staticmethod
+    def _key(namespace, key):
+        return f"{KEY_PREFIX}{namespace}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    def _safe(self, namespace, method, *args, default=None):
+        try:
+            return method(*args)
+        except (sqlite3.Error, OSError, StoreError):
+            SHARED_REQUESTS.inc(namespace=namespace, result='error')
+            return default
+
+    def get(self, namespace, key):
+        if self.store is None:
+            return None
+        value = self._safe(namespace, self.store.get, self._key(namespace, key))
+        if value == UNCACHED:
+            value = None
+        SHARED_REQUESTS.inc(namespace=namespace, result='hit' if value is not None else 'miss')
+        return value
+
+    def put(self, namespace, key, value, ttl):
+        if self.store is not None and ttl > 0:
+            self._safe(namespace, self.store.set, self._key(namespace, key), value, ttl)
+
+    def fill(self, namespace, key, compute, encode, decode, ttl, lease, wait_check=None, max_wait=MAX_WAIT):
+        """
+        Returns (value, hit). On a miss, computes the value under a lease so that concurrent
+        callers in any process wait for it instead of computing it again.
+        compute() -> value; encode(value) -> bytes, or None to leave it out of the cache;
+        decode(bytes) -> value. wait_check(), if given, is called on every poll while another
+        process fills the key and may raise to abandon the wait. After max_wait seconds of
+        waiting the caller computes the value itself.
+        """
+        if self.store is None or ttl <= 0:
+            return compute(), False
+        full_key = self._key(namespace, key)
+        token = uuid.uuid4().hex
+        waited = False
+        deadline = time.monotonic() + min(lease, max_wait)
+        while True:
+            data = self._safe(namespace, self.store.get, full_key)
+            if data == UNCACHED: # The last fill had nothing to share; don't queue behind each other
+                SHARED_REQUESTS.inc(namespace=namespace, result='uncached')
+                return compute(), False
+            if data is not None:
+                SHARED_REQUESTS.inc(namespace=namespace, result='waited' if waited else 'hit')
+                return decode(data), True
+            if self._safe(namespace, self.store.lock, full_key, token, lease, default=True):
+                break
+            if time.monotonic() >= deadline:
+                SHARED_REQUESTS.inc(namespace=namespace, result='timeout')
+                return compute(), False
+            waited = True
+            if wait_check is not None:
+                wait_check()
+            time.sleep(POLL_INTERVAL)
+
+        SHARED_REQUESTS.inc(namespace=namespace, result='miss')
+        try:
+            value = compute()
+        except BaseException:
+            SHARED_FILLS.inc(namespace=namespace, outcome='failed')
+            self._safe(namespace, self.store.set, full_key, UNCACHED, UNCACHED_TTL)
+            self._safe(namespace, self.store.unlock, full_key, token)
+            raise
+        data = encode(value)
+        self._safe(namespace, self.store.set, full_key, data if data is not None else UNCACHED,
+                   ttl if data is not None else UNCACHED_TTL)
+        SHARED_FILLS.inc(namespace=namespace, outcome='stored' if data is not None else 'skipped')
+        self._safe(namespace, self.store.unlock, full_key, token)
+        return value, False
+
+    def clear(self):
+        if self.store is not None:
+            self.store.clear()
+
+
+shared = SharedCache(open_store())
@@ -0,0 +1,162 @@
+"""
+Speculative pre-rendering of the variants a user is likely to ask for next.
+
+After a real /render, the neighbors of what was just viewed -- the other values of enum
+parameters (bed_type, fixture_layout) and each room dimension stepped by STEP meters -- are
+queued, replacing whatever was queued before, since the latest view predicts best. One
+low-priority thread renders them into the render cache, and only while the process serves
+no real traffic: any request arriving cancels the render in progress at its next stage
+boundary, and the thread waits for the process to go idle again. A stage cannot be
+interrupted, so tiers drawn at more than MAX_DPI (print) are never speculated: one 300 dpi
+draw would hold the CPU well past the request that should have stopped it. Its CPU time is
+held to ARCHIBOT_SPECULATION_CPU of one core over a sliding window.
+
+Hit rate = archibot_speculation_hits_total / archibot_speculation_renders_total{outcome="rendered"}.
+"""
+import collections
+import os
+import threading
+import time
+
+from services import metrics, render
+
+ENABLED = os.getenv('ARCHIBOT_SPECULATION', '1') != '0'
+CPU_BUDGET = float(os.getenv('ARCHIBOT_SPECULATION_CPU', '0.25')) # Fraction of one core
+BUDGET_WINDOW = 10.0 # seconds
+STEP = 0.5 # meters
+MAX_PENDING = 16
+MAX_DPI = render.DPI_TIERS['screen']
+
+SPECULATION_RENDERS = metrics.registry.counter(
+    'archibot_speculation_renders_total', 'Speculative renders by outcome.', ('outcome',))
+SPECULATION_CPU = metrics.registry.counter(
+    'archibot_speculation_cpu_seconds_total', 'CPU time spent on speculative renders.')
+SPECULATION_PENDING = metrics.registry.gauge(
+    'archibot_speculation_pending', 'Predicted variants waiting to be rendered.')
+
+
+def neighbors(preset, params):
+    """Parameter dicts one edit away from `params` (coerced, as from render.preset_params)."""
+    current = dict(render.resolved_params(preset, params))
+    for name, values in render.CHOICES.get(preset, {}).items():
+        for value in values:
+            if value != current.get(name):
+                yield {**params, name: value}
+    for name in render.ROOM_DIMENSIONS.get(preset, ()):
+        low, high = render.param_range(preset, name)
+        for delta in (STEP, -STEP):
+            value = round(current[name] + delta, 2)
+            if low <= value <= high:
+                yield {**params, name: value}
+
+
+class Speculator:
+    def __init__(self, budget=CPU_BUDGET):
+        self.budget = budget
+        self._pending = collections.deque()
+        self._active = 0 # Real requests in flight in this process
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        self._window_start = time.monotonic()
+        self._window_cpu = 0.0
+
+    # --- Real traffic ---
+
+    def enter(self):
+        with self._lock:
+            self._active += 1
+
+    def leave(self):
+        with self._lock:
+            self._active -= 1
+            if not self._active:
+                self._wake.notify()
+
+    def busy(self):
+        return self._active > 0 or self._stop.is_set()
+
+    def observe(self, preset, raw_params, tier, fmt, accept_encoding='', lod=None):
+        """Queues the neighbors of a render a real request just received."""
+        if not ENABLED or self.budget <= 0 or render.DPI_TIERS[tier] > MAX_DPI:
+            return
+        params = render.preset_params(preset, raw_params)
+        tasks = []
+        for variant in neighbors(preset, params):
+            tasks.append((preset, variant, tier, fmt, accept_encoding, lod))
+            if len(tasks) == MAX_PENDING:
+                break
+        with self._lock:
+            self._pending.clear()
+            self._pending.extend(tasks)
+            SPECULATION_PENDING.set(len(self._pending))
+            self._wake.notify()
+        self.start()
+
+    # --- Background thread ---
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='speculator', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _next_task(self):
+        with self._lock:
+            while not self._stop.is_set() and (self._active or not self._pending):
+                self._wake.wait()
+            if self._stop.is_set():
+                return None
+            task = self._pending.popleft()
+            SPECULATION_PENDING.set(len(self._pending))
+            return task
+
+    def _throttle(self, cpu_seconds):
+        """Sleeps long enough to keep speculative CPU within budget over the window."""
+        now = time.monotonic()
+        if now - self._window_start > BUDGET_WINDOW:
+            self._window_start, self._window_cpu = now, 0.0
+        self._window_cpu += cpu_seconds
+        owed = self._window_cpu / self.budget - (now - self._window_start)
+        if owed > 0:
+            self._stop.wait(owed)
+
+    def _run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass # Thread niceness is Linux-only; the budget still applies
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            preset, params, tier, fmt, accept_encoding, lod = task
+            start = time.thread_time()
+            try:
+                result = render.render(preset, params, tier=tier, fmt=fmt, accept_encoding=accept_encoding,
+                                       is_cancelled=self.busy, speculative=True, lod=lod)
+            except render.RenderCancelled:
+                outcome = 'cancelled'
+                with self._lock:
+                    if len(self._pending) < MAX_PENDING:
+                        self._pending.appendleft(task) # Still a good guess; retry when idle
+            except Exception:
+                outcome = 'failed'
+            else:
+                outcome = 'cached' if result['cached'] else 'rendered'
+            spent = time.thread_time() - start
+            SPECULATION_RENDERS.inc(outcome=outcome)
+            SPECULATION_CPU.inc(spent)
+            self._throttle(spent)
+
+
+speculator = Speculator()
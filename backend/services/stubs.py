@@ -0,0 +1,165 @@
+"""
+Local stand-ins for the Gemini backend, used for offline runs and load tests.
+Set ARCHIBOT_BACKEND=stub to have services.gemini use StubClient instead of genai.Client.
+"""
+import itertools
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+STUB_LATENCY = float(os.getenv('ARCHIBOT_STUB_LATENCY', '0.0')) # seconds per generation
+STUB_MIN_CACHE_TOKENS = int(os.getenv('ARCHIBOT_STUB_MIN_CACHE_TOKENS', '1024')) # Gemini's minimum for explicit caches
+STUB_ERROR_RATE = float(os.getenv('ARCHIBOT_STUB_ERROR_RATE', '0.0')) # fraction of generations that fail
+STUB_THINKING_RATE = float(os.getenv('ARCHIBOT_STUB_THINKING_RATE', '0')) # thinking tokens per second; 0 thinks instantly
+STUB_DYNAMIC_THOUGHTS = 2048 # thinking tokens a dynamic budget spends
+
+
+def _per_model(spec):
+    """Parses "model=value,model=value" overrides, e.g. ARCHIBOT_STUB_MODEL_LATENCY=gemini-2.5-pro=3."""
+    table = {}
+    for item in spec.split(','):
+        model, _, value = item.rpartition('=')
+        if model:
+            table[model.strip()] = float(value)
+    return table
+
+STUB_MODEL_LATENCY = _per_model(os.getenv('ARCHIBOT_STUB_MODEL_LATENCY', ''))
+STUB_MODEL_ERROR_RATE = _per_model(os.getenv('ARCHIBOT_STUB_MODEL_ERROR_RATE', ''))
+
+
+class StubError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def _estimate_tokens(text):
+    return max(1, len(text or '') // 4)
+
+
+def _parse_ttl(ttl):
+    return float(str(ttl).rstrip('s')) if ttl else 3600.0
+
+
+class StubCaches:
+    """Simulates client.caches: create/get/delete with TTL expiry and a minimum token count."""
+
+    def __init__(self, clock=time.time, min_tokens=STUB_MIN_CACHE_TOKENS):
+        self.clock = clock
+        self.min_tokens = min_tokens
+        self._entries = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def create(self, *, model, config=None):
+        instruction = getattr(config, 'system_instruction', None) or ''
+        if _estimate_tokens(str(instruction)) < self.min_tokens:
+            raise StubError(400, f"Cached content is too small. min_total_token_count={self.min_tokens}")
+        with self._lock:
+            name = f"cachedContents/stub-{next(self._ids)}"
+            self._entries[name] = SimpleNamespace(
+                name=name,
+                model=model,
+                system_instruction=instruction,
+                display_name=getattr(config, 'display_name', None),
+                expires_at=self.clock() + _parse_ttl(getattr(config, 'ttl', None)),
+            )
+            self.created += 1
+            return self._entries[name]
+
+    def get(self, *, name, config=None):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or self.clock() >= entry.expires_at:
+                self._entries.pop(name, None)
+                raise StubError(404, f"CachedContent not found: {name}")
+            return entry
+
+    def delete(self, *, name, config=None):
+        with self._lock:
+            if self._entries.pop(name, None) is None:
+                raise StubError(404, f"CachedContent not found: {name}")
+
+
+class StubModels:
+    """
+    Simulates client.models.generate_content with a fixed latency and an echo answer.
+    Latency and error rate can be overridden per model, to exercise services.router.
+    The config's thinking budget is spent in full before the first chunk (at
+    ARCHIBOT_STUB_THINKING_RATE), and answers are cut at its max_output_tokens.
+    """
+
+    def __init__(self, caches, latency=STUB_LATENCY, error_rate=STUB_ERROR_RATE,
+                 model_latency=STUB_MODEL_LATENCY, model_error_rate=STUB_MODEL_ERROR_RATE):
+        self.caches = caches
+        self.latency = latency
+        self.error_rate = error_rate
+        self.model_latency = model_latency
+        self.model_error_rate = model_error_rate
+
+    def _response(self, model, contents, config):
+        error_rate = self.model_error_rate.get(model, self.error_rate)
+        if error_rate and random.random() < error_rate:
+            raise StubError(503, "The model is overloaded. Please try again later.")
+        cached = getattr(config, 'cached_content', None) if config else None
+        grounded = bool(getattr(config, 'system_instruction', None)) if config else False
+        if cached:
+            self.caches.get(name=cached)
+            grounded = True
+        text = f"[stub {model}{' grounded' if grounded else ''}] {contents}"
+        finish_reason = 'STOP'
+        max_tokens = getattr(config, 'max_output_tokens', None) if config else None
+        if max_tokens and _estimate_tokens(text) > max_tokens:
+            text, finish_reason = text[:max_tokens * 4], 'MAX_TOKENS'
+        budget = getattr(getattr(config, 'thinking_config', None), 'thinking_budget', None) if config else None
+        thoughts = STUB_DYNAMIC_THOUGHTS if budget == -1 else budget or 0
+        return SimpleNamespace(
+            text=text,
+            candidates=[SimpleNamespace(finish_reason=finish_reason)],
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=_estimate_tokens(str(contents)),
+                candidates_token_count=_estimate_tokens(text),
+                cached_content_token_count=0,
+                thoughts_token_count=thoughts,
+            ),
+        )
+
+    def _think(self, response):
+        thoughts = response.usage_metadata.thoughts_token_count
+        if thoughts and STUB_THINKING_RATE:
+            time.sleep(thoughts / STUB_THINKING_RATE)
+
+    def generate_content(self, *, model, contents, config=None):
+        response = self._response(model, contents, config)
+        self._think(response)
+        latency = self.model_latency.get(model, self.latency)
+        if latency:
+            time.sleep(latency)
+        return response
+
+    def generate_content_stream(self, *, model, contents, config=None, chunks=4):
+        """Yields the answer in `chunks` pieces spread over the configured latency."""
+        response = self._response(model, contents, config)
+        self._think(response)
+        latency = self.model_latency.get(model, self.latency)
+        words = response.text.split(' ')
+        step = max(1, -(-len(words) // chunks))
+        pieces = [' '.join(words[i:i + step]) for i in range(0, len(words), step)]
+        for n, piece in enumerate(pieces):
+            if latency:
+                time.sleep(latency / len(pieces))
+            last = n == len(pieces) - 1
+            yield SimpleNamespace(
+                text=piece + ('' if last else ' '),
+                candidates=response.candidates if last else None,
+                usage_metadata=response.usage_metadata if last else None,
+            )
+
+
+class StubClient:
+    def __init__(self, latency=STUB_LATENCY, clock=time.time):
+        self.caches = StubCaches(clock=clock)
+        self.models = StubModels(self.caches, latency=latency)
@@ -0,0 +1,18 @@
+"""
+Test setup: the stub model backend, scratch databases, and no background speculation.
+The environment is set before any services module is imported, since they read it on import.
+"""
+import os
+import sys
+import tempfile
+
+SCRATCH = tempfile.mkdtemp(prefix='archibot-tests-')
+
+os.environ.setdefault('ARCHIBOT_BACKEND', 'stub')
+os.environ.setdefault('ARCHIBOT_SHARED_CACHE', 'off')
+os.environ.setdefault('ARCHIBOT_SPECULATION', '0')
+os.environ.setdefault('ARCHIBOT_JOBS_DB', os.path.join(SCRATCH, 'jobs.sqlite3'))
+os.environ.setdefault('ARCHIBOT_SHARED_CACHE_DB', os.path.join(SCRATCH, 'cache.sqlite3'))
+os.environ.setdefault('ARCHIBOT_CASSETTE', os.path.join(SCRATCH, 'cassette.sqlite3'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
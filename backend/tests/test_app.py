@@ -0,0 +1,60 @@
+import os
+import socket
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def high_fd_pair():
+    """A socket pair numbered past select()'s FD_SETSIZE of 1024."""
+    resource = pytest.importorskip('resource')
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and hard < 2048:
+        pytest.skip("not enough file descriptors")
+    resource.setrlimit(resource.RLIMIT_NOFILE, (2048, hard))
+    padding = [os.open(os.devnull, os.O_RDONLY) for _ in range(1100)]
+    pair = socket.socketpair()
+    yield pair
+    for sock in pair:
+        sock.close()
+    for fd in padding:
+        os.close(fd)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+
+def test_disconnect_check_handles_high_descriptors(high_fd_pair):
+    server, client = high_fd_pair
+    environ = {'gunicorn.socket': server}
+    assert server.fileno() >= 1024
+    assert not app.client_disconnected(environ)
+    client.send(b'x') # Pipelined bytes are not a disconnect
+    assert not app.client_disconnected(environ)
+    server.recv(1)
+    client.close()
+    assert app.client_disconnected(environ)
+
+
+def test_detached_socket_is_not_a_disconnect():
+    server, client = socket.socketpair()
+    server.close()
+    assert not app.client_disconnected({'gunicorn.socket': server})
+    client.close()
+
+
+@pytest.mark.parametrize('body, error', [
+    ([1, 2], 'body must be a JSON object'),
+    ('"predict"', 'body must be a JSON object'),
+    ({'kind': 'predict', 'priority': 10 ** 30}, 'priority must be between'),
+    ({'kind': 'predict', 'priority': 'high'}, 'priority must be an integer'),
+    ({'kind': 'predict', 'payload': ['hi']}, 'payload must be a JSON object'),
+])
+def test_submit_job_rejects_malformed_bodies(body, error):
+    client = app.app.test_client()
+    if isinstance(body, str):
+        response = client.post('/jobs', data=body, content_type='application/json')
+    else:
+        response = client.post('/jobs', json=body)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
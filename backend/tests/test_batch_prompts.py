@@ -0,0 +1,84 @@
+import json
+import types
+
+from tools import batch_prompts
+
+
+def write_prompts(path, prompts):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, prompt in enumerate(prompts):
+            f.write(json.dumps({'id': i, 'prompt': prompt}) + '\n')
+
+
+def run(tmp_path, answer, concurrency=4):
+    args = types.SimpleNamespace(input=str(tmp_path / 'in.jsonl'), output=str(tmp_path / 'out.jsonl'),
+                                 concurrency=concurrency, field='prompt')
+    return batch_prompts.run(args, answer)
+
+
+def answered(tmp_path):
+    with open(tmp_path / 'out.jsonl', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_second_run_answers_only_new_lines(tmp_path):
+    write_prompts(tmp_path / 'in.jsonl', ['a', 'b', 'c'])
+    asked = []
+    def answer(prompt):
+        asked.append(prompt)
+        return prompt.upper()
+    assert run(tmp_path, answer)['answered'] == 3
+
+    write_prompts(tmp_path / 'in.jsonl', ['a', 'b', 'c', 'd', 'e'])
+    asked.clear()
+    stats = run(tmp_path, answer)
+    assert sorted(asked) == ['d', 'e']
+    assert stats['answered'] == 2 and stats['skipped'] == 0 # Resumed past the watermark, not re-skipped
+    assert sorted(r['response'] for r in answered(tmp_path)) == ['A', 'B', 'C', 'D', 'E']
+
+
+def test_resume_skips_answered_lines_past_the_watermark(tmp_path):
+    write_prompts(tmp_path / 'in.jsonl', ['a', 'b', 'c'])
+    progress = batch_prompts.Progress(str(tmp_path / 'out.jsonl') + '.progress.sqlite3')
+    progress.mark_answered(batch_prompts.prompt_hash('b')) # Answered before a crash, never checkpointed
+    asked = []
+    def answer(prompt):
+        asked.append(prompt)
+        return prompt
+    stats = run(tmp_path, answer)
+    assert sorted(asked) == ['a', 'c'] and stats['skipped'] == 1
+
+
+def test_duplicates_are_asked_once(tmp_path):
+    write_prompts(tmp_path / 'in.jsonl', ['same'] * 5 + ['other'])
+    asked = []
+    def answer(prompt):
+        asked.append(prompt)
+        return 'ok'
+    stats = run(tmp_path, answer)
+    assert sorted(asked) == ['other', 'same']
+    assert stats['answered'] == 2 and stats['skipped'] == 4
+
+
+def test_failed_duplicate_is_retried_by_the_next_repeat(tmp_path):
+    write_prompts(tmp_path / 'in.jsonl', ['flaky', 'flaky', 'flaky'])
+    calls = []
+    def answer(prompt):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise RuntimeError("quota")
+        return 'ok'
+    stats = run(tmp_path, answer, concurrency=1)
+    assert len(calls) == 2
+    assert stats == {'answered': 1, 'skipped': 1, 'errors': 1, 'invalid': 0}
+
+
+def test_watermark_waits_for_the_oldest_line():
+    watermark = batch_prompts.Watermark(0)
+    for end in (10, 20, 30):
+        watermark.add(end)
+    watermark.finish(20)
+    watermark.finish(30)
+    assert watermark.value == 0 and len(watermark) == 3
+    watermark.finish(10)
+    assert watermark.value == 30 and len(watermark) == 0
@@ -0,0 +1,55 @@
+import json
+import threading
+import time
+
+from services import design_session
+from services.gemini import GenerationCancelled
+
+
+class Connection:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(json.loads(data))
+
+
+def test_diff_carries_the_shell_once():
+    session = design_session.Session(Connection())
+    session.open('kitchen', {})
+    first = session.connection.sent[-1]
+    assert first['shell']['walls']['thickness'] == 0.15
+    assert len(first['shell']['windows']) == 1
+    session.set({'kitchen_width': 5.0})
+    assert session.connection.sent[-1]['shell']['room'][2] == 5.0
+    session.update()
+    assert 'shell' not in session.connection.sent[-1]
+
+
+def test_asks_share_one_thread_and_only_the_latest_waits(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    answered = []
+    def answer(prompt, is_cancelled, on_text, profile):
+        answered.append(prompt)
+        if prompt == 'first':
+            started.set()
+            release.wait(5)
+        if is_cancelled():
+            raise GenerationCancelled()
+        return f"re: {prompt}"
+    monkeypatch.setattr(design_session, 'get_gemini_response', answer)
+    session = design_session.Session(Connection())
+    before = threading.active_count()
+    session.ask('first')
+    assert started.wait(5)
+    for i in range(20):
+        session.ask(f"ask {i}")
+    assert threading.active_count() == before + 1
+    release.set()
+    for _ in range(100):
+        if not session._asking:
+            break
+        time.sleep(0.05)
+    assert answered == ['first', 'ask 19']
+    done = [m for m in session.connection.sent if m['type'] == 'text_done']
+    assert [m['ask'] for m in done] == [21] # The superseded answer was cancelled
@@ -0,0 +1,50 @@
+import gc
+import itertools
+
+import pytest
+
+from services import render
+from services.figure_pool import FigurePool, current_rss, pool
+from services.render_cache import cache
+
+MB = 1024 * 1024
+WARMUP = 40
+RENDERS = 240
+MAX_GROWTH_MB = 24.0
+
+
+def test_pool_reuses_figures():
+    small = FigurePool(size=2)
+    figures = [small.acquire() for _ in range(3)]
+    for fig in figures:
+        small.release(fig)
+    assert small.created == 3
+    again = [small.acquire() for _ in range(2)]
+    assert small.created == 3 and all(fig in figures for fig in again)
+    assert all(not fig.axes for fig in again)
+
+
+def test_shrink_drops_idle_figures():
+    small = FigurePool(size=2, rss_ceiling_mb=0)
+    small.release(small.acquire())
+    small.check_memory() # Any RSS is over a zero ceiling
+    small.acquire()
+    assert small.created == 2
+
+
+@pytest.mark.skipif(current_rss() is None, reason="RSS is not readable (/proc/self/statm)")
+def test_rss_stays_flat_across_renders():
+    """A bounded version of tools/soak_render.py: repeated uncached renders must not leak."""
+    presets = itertools.cycle(render.PRESETS)
+    created = None
+    baseline = None
+    for n in range(1, RENDERS + 1):
+        cache.clear() # Every iteration must actually draw
+        render.render(next(presets), {}, tier='thumbnail', fmt='png')
+        if n == WARMUP:
+            gc.collect()
+            baseline, created = current_rss(), pool.created
+    gc.collect()
+    growth = (current_rss() - baseline) / MB
+    assert growth < MAX_GROWTH_MB, f"RSS grew {growth:.1f} MB over {RENDERS - WARMUP} renders"
+    assert pool.created == created # Steady state draws on pooled figures only
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from services import jobs
+from services.jobs import JobQueue, WorkerPool
+
+
+class Clock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_queue(tmp_path):
+    clock = Clock()
+    return JobQueue(str(tmp_path / 'jobs.sqlite3'), clock=clock), clock
+
+
+def test_claims_by_priority_then_age(tmp_path):
+    queue, clock = make_queue(tmp_path)
+    low = queue.submit('render', {}, priority=0)
+    clock.now += 1
+    high = queue.submit('render', {}, priority=5)
+    assert queue.claim()['id'] == high
+    assert queue.claim()['id'] == low
+    assert queue.claim() is None
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    queue, clock = make_queue(tmp_path)
+    job_id = queue.submit('predict', {'user_input': 'hi'})
+    assert queue.claim()['attempts'] == 1
+    clock.now += jobs.LEASE_SECONDS - 1
+    assert queue.claim() is None # Still leased
+    clock.now += 2
+    job = queue.claim()
+    assert job['id'] == job_id and job['attempts'] == 2
+
+
+def test_renewed_lease_is_not_taken(tmp_path):
+    queue, clock = make_queue(tmp_path)
+    job_id = queue.submit('predict', {})
+    queue.claim()
+    clock.now += jobs.LEASE_SECONDS - 1
+    queue.renew([job_id])
+    clock.now += 2
+    assert queue.claim() is None
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    queue, clock = make_queue(tmp_path)
+    job_id = queue.submit('predict', {})
+    for _ in range(jobs.MAX_ATTEMPTS):
+        assert queue.claim()['id'] == job_id
+        clock.now += jobs.LEASE_SECONDS + 1
+    assert queue.claim() is None
+    job = queue.get(job_id)
+    assert job['status'] == 'failed' and 'repeated worker failures' in job['error']
+
+
+def test_release_requeues_without_counting_the_attempt(tmp_path):
+    queue, _ = make_queue(tmp_path)
+    job_id = queue.submit('predict', {})
+    queue.claim()
+    queue.release(job_id)
+    job = queue.get(job_id)
+    assert job['status'] == 'queued' and job['attempts'] == 0
+    assert queue.claim()['id'] == job_id
+
+
+def test_stopped_pool_requeues_unfinished_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    started, finish = threading.Event(), threading.Event()
+    def slow(payload):
+        started.set()
+        finish.wait(5)
+        return b'late', 'text/plain'
+    first = WorkerPool(queue, {'slow': slow}, size=1)
+    first.start()
+    job_id = queue.submit('slow', {})
+    assert started.wait(5)
+    assert first.stop(timeout=0.1) == [job_id]
+    assert queue.get(job_id)['status'] == 'queued'
+
+    second = WorkerPool(queue, {'slow': lambda payload: (b'done', 'text/plain')}, size=1)
+    second.start()
+    try:
+        assert queue.wait(job_id, 5)['result'] == b'done'
+    finally:
+        second.stop()
+    finish.set() # The first pool's late result is dropped
+    time.sleep(0.1)
+    assert queue.get(job_id)['result'] == b'done'
+
+
+def test_job_failed_marks_the_job_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    def refuse(payload):
+        raise jobs.JobFailed("model unavailable")
+    workers = WorkerPool(queue, {'predict': refuse}, size=1)
+    workers.start()
+    try:
+        job = queue.wait(queue.submit('predict', {}), 5)
+    finally:
+        workers.stop()
+    assert job['status'] == 'failed' and job['error'] == "model unavailable"
@@ -0,0 +1,75 @@
+from services import prompt_catalog
+from services.prompt_catalog import CatalogPrompt
+from services.stubs import StubCaches, StubClient
+
+
+class Clock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make(min_tokens=0, ttl_seconds=600):
+    clock = Clock()
+    client = StubClient(clock=clock)
+    client.caches = StubCaches(clock=clock, min_tokens=min_tokens)
+    return CatalogPrompt(ttl_seconds=ttl_seconds, clock=clock), client, clock
+
+
+def test_creates_once_and_reuses_the_handle():
+    catalog, client, clock = make()
+    name = catalog.cache_handle(client, 'gemini-2.5-flash')
+    assert name and client.caches.created == 1
+    clock.now += 300
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') == name
+    assert client.caches.created == 1
+    config = catalog.generate_config(client, 'gemini-2.5-flash')
+    assert config.cached_content == name and not config.system_instruction
+
+
+def test_handles_are_per_model():
+    catalog, client, _ = make()
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') != catalog.cache_handle(client, 'gemini-2.5-pro')
+    assert client.caches.created == 2
+
+
+def test_recreates_before_expiry():
+    catalog, client, clock = make(ttl_seconds=600)
+    first = catalog.cache_handle(client, 'gemini-2.5-flash')
+    clock.now += 600 - prompt_catalog.CACHE_REFRESH_MARGIN
+    second = catalog.cache_handle(client, 'gemini-2.5-flash')
+    assert second != first and client.caches.created == 2
+
+
+def test_invalidate_forces_a_new_handle():
+    catalog, client, _ = make()
+    first = catalog.cache_handle(client, 'gemini-2.5-flash')
+    catalog.invalidate('gemini-2.5-flash')
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') != first
+
+
+def test_too_small_is_refused_for_good():
+    catalog, client, clock = make(min_tokens=10 ** 6)
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') is None
+    calls = []
+    create = client.caches.create
+    client.caches.create = lambda **kw: calls.append(kw) or create(**kw)
+    clock.now += prompt_catalog.CACHE_RETRY_AFTER * 10
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') is None
+    assert calls == []
+    config = catalog.generate_config(client, 'gemini-2.5-flash')
+    assert config.system_instruction and not config.cached_content
+
+
+def test_other_refusals_back_off_then_retry():
+    catalog, client, clock = make()
+    def unavailable(**kw):
+        raise RuntimeError("503 service unavailable")
+    create, client.caches.create = client.caches.create, unavailable
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') is None
+    client.caches.create = create
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') is None # Still backing off
+    clock.now += prompt_catalog.CACHE_RETRY_AFTER + 1
+    assert catalog.cache_handle(client, 'gemini-2.5-flash') is not None
@@ -0,0 +1,37 @@
+import pytest
+
+from services import breaker
+from services.router import Router
+
+
+def make_router():
+    return Router(tiers={'standard': ('m',)}, targets={'standard': 5.0},
+                  make_breaker=lambda name: breaker.CircuitBreaker(name, min_calls=2, slow_seconds=10.0))
+
+
+def test_long_streams_with_a_quick_first_token_are_healthy():
+    router = make_router()
+    for _ in range(5):
+        router.success('m', 'standard', 60.0, ttft=0.5)
+    assert router.breakers['m'].state == breaker.CLOSED
+
+
+def test_slow_first_tokens_open_the_breaker():
+    router = make_router()
+    for _ in range(2):
+        router.success('m', 'standard', 15.0, ttft=12.0)
+    assert router.breakers['m'].state == breaker.OPEN
+
+
+def test_tier_map_needs_a_standard_tier():
+    with pytest.raises(ValueError, match="must include 'standard'"):
+        Router(tiers={'light': ('m',)})
+
+
+def test_empty_tier_is_rejected():
+    with pytest.raises(ValueError, match="'plan' lists no models"):
+        Router(tiers={'standard': ('m',), 'plan': ()})
+
+
+def test_missing_tiers_use_the_standard_models():
+    assert make_router().candidates('plan') == ['m']
@@ -0,0 +1,22 @@
+import pytest
+
+from services import speculation
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    monkeypatch.setattr(speculation, 'ENABLED', True)
+    def queued(tier):
+        speculator = speculation.Speculator(budget=1.0)
+        speculator.start = lambda: None # Queue only; nothing renders
+        speculator.observe('kitchen', {}, tier, 'png')
+        return len(speculator._pending)
+    return queued
+
+
+def test_screen_renders_queue_their_neighbors(queued):
+    assert queued('screen') > 0
+
+
+def test_print_renders_are_not_speculated(queued):
+    assert queued('print') == 0
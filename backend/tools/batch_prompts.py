@@ -0,0 +1,222 @@
+"""
+Resumable bulk-prompt runner: python tools/batch_prompts.py prompts.jsonl answers.jsonl
+
+Streams a JSONL file of prompts through services.gemini with bounded concurrency and
+appends one JSON line per answer to the output as soon as it arrives. Progress (the input
+byte offset below which every line is finished) and the content hashes of answered prompts
+are kept in an SQLite sidecar next to the output, so a crashed run resumes where it left off
+and prompts already answered are skipped. A prompt counts as answered only once it succeeds:
+repeats of a prompt still in flight wait for it, and if it fails the next repeat is tried.
+Reading pauses while MAX_OUT_OF_ORDER lines wait behind an unfinished one, so memory use does
+not depend on input size.
+
+Each input line is an object; the prompt is taken from --field, else from "prompt",
+"user_input" or "body". An "id" or "request_id" field is copied to the output.
+"""
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROMPT_FIELDS = ('prompt', 'user_input', 'body')
+CHECKPOINT_EVERY = 2.0 # seconds between checkpoint commits
+MAX_OUT_OF_ORDER = 10_000 # lines read past the oldest unfinished one
+REPORT_EVERY = 10.0
+
+
+class Progress:
+    """SQLite sidecar holding the resume offset and the hashes of answered prompts."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS answered (hash TEXT PRIMARY KEY)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS checkpoint (id INTEGER PRIMARY KEY CHECK (id = 1), offset INTEGER)')
+        self.conn.commit()
+
+    def offset(self):
+        row = self.conn.execute('SELECT offset FROM checkpoint WHERE id = 1').fetchone()
+        return row[0] if row else 0
+
+    def is_answered(self, digest):
+        return self.conn.execute('SELECT 1 FROM answered WHERE hash = ?', (digest,)).fetchone() is not None
+
+    def mark_answered(self, digest):
+        self.conn.execute('INSERT OR IGNORE INTO answered (hash) VALUES (?)', (digest,))
+        self.conn.commit()
+
+    def commit(self, offset):
+        self.conn.execute('INSERT OR REPLACE INTO checkpoint (id, offset) VALUES (1, ?)', (offset,))
+        self.conn.commit()
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def extract_prompt(record, field):
+    for key in ((field,) if field else ()) + PROMPT_FIELDS:
+        value = record.get(key)
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
+
+def read_lines(path, start_offset):
+    """Yields (line_end_offset, text) from start_offset onward."""
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for raw in f:
+            offset += len(raw)
+            yield offset, raw.decode('utf-8')
+
+
+class Watermark:
+    """Tracks the highest input offset below which every line has finished."""
+
+    def __init__(self, start):
+        self.value = start
+        self._pending = {} # line end offset -> finished?
+        self._order = collections.deque()
+
+    def __len__(self):
+        return len(self._order)
+
+    def add(self, end_offset):
+        self._pending[end_offset] = False
+        self._order.append(end_offset)
+
+    def finish(self, end_offset):
+        self._pending[end_offset] = True
+        while self._order and self._pending[self._order[0]]:
+            self.value = self._order.popleft()
+            del self._pending[self.value]
+
+
+def run(args, answer=None):
+    if answer is None:
+        from services.gemini import get_gemini_response as answer
+
+    progress = Progress(args.output + '.progress.sqlite3')
+    watermark = Watermark(progress.offset())
+    stats = {'answered': 0, 'skipped': 0, 'errors': 0, 'invalid': 0}
+    started = last_commit = last_report = time.monotonic()
+    waiting = {} # hash in flight -> [(end_offset, meta)] of later lines with the same prompt
+
+    def report(final=False):
+        elapsed = time.monotonic() - started
+        rate = stats['answered'] / elapsed if elapsed else 0.0
+        print(f"{'done' if final else 'progress'}: answered={stats['answered']} skipped={stats['skipped']} "
+              f"errors={stats['errors']} invalid={stats['invalid']} {rate:.2f} prompts/s", file=sys.stderr)
+
+    def call(prompt):
+        start = time.perf_counter()
+        response = answer(prompt)
+        return response, time.perf_counter() - start
+
+    with open(args.output, 'a', encoding='utf-8') as out, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        running = {}
+
+        def submit(prompt, end_offset, meta, digest):
+            running[pool.submit(call, prompt)] = (end_offset, meta, digest, prompt)
+
+        def drain(block):
+            nonlocal last_commit
+            if not running:
+                return
+            done, _ = concurrent.futures.wait(
+                running, timeout=None if block else 0, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                end_offset, record, digest, prompt = running.pop(future)
+                try:
+                    response, seconds = future.result()
+                except Exception as e:
+                    response, seconds = f"Error: {e}", 0.0
+                failed = response.startswith('Error:')
+                out.write(json.dumps({**record, 'hash': digest, 'response': response,
+                                      'seconds': round(seconds, 3), 'error': failed}) + '\n')
+                if failed:
+                    stats['errors'] += 1
+                else:
+                    stats['answered'] += 1
+                    out.flush() # Written before it is recorded, so a crash can only repeat it
+                    progress.mark_answered(digest)
+                watermark.finish(end_offset)
+                repeats = waiting.pop(digest)
+                if failed and repeats: # Not answered yet: the next repeat gets its own try
+                    (next_offset, next_meta), waiting[digest] = repeats[0], repeats[1:]
+                    submit(prompt, next_offset, next_meta, digest)
+                    continue
+                for repeat_offset, _ in repeats:
+                    stats['skipped'] += 1
+                    watermark.finish(repeat_offset)
+            now = time.monotonic()
+            if now - last_commit >= CHECKPOINT_EVERY:
+                out.flush()
+                os.fsync(out.fileno())
+                progress.commit(watermark.value)
+                last_commit = now
+
+        for end_offset, line in read_lines(args.input, watermark.value):
+            while len(watermark) >= MAX_OUT_OF_ORDER and running:
+                drain(block=True) # The oldest unfinished line is in flight; wait for it
+            watermark.add(end_offset)
+            try:
+                record = json.loads(line) if line.strip() else None
+            except json.JSONDecodeError:
+                record = None
+            prompt = extract_prompt(record, args.field) if isinstance(record, dict) else None
+            if prompt is None:
+                if line.strip():
+                    stats['invalid'] += 1
+                watermark.finish(end_offset)
+                continue
+            digest = prompt_hash(prompt)
+            meta = {k: record[k] for k in ('id', 'request_id') if k in record}
+            if digest in waiting: # Same prompt in flight; settled when it finishes
+                waiting[digest].append((end_offset, meta))
+                continue
+            if progress.is_answered(digest):
+                stats['skipped'] += 1
+                watermark.finish(end_offset)
+                continue
+            waiting[digest] = []
+            submit(prompt, end_offset, meta, digest)
+            while len(running) >= args.concurrency:
+                drain(block=True)
+            drain(block=False)
+            if time.monotonic() - last_report >= REPORT_EVERY:
+                report()
+                last_report = time.monotonic()
+
+        while running:
+            drain(block=True)
+        out.flush()
+        os.fsync(out.fileno())
+        progress.commit(watermark.value)
+
+    report(final=True)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the model, resumably.")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--field', default=None, help="JSON field holding the prompt")
+    args = parser.parse_args(argv)
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
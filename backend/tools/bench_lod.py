@@ -0,0 +1,77 @@
+"""
+Level-of-detail benchmark: python tools/bench_lod.py --repeat 20
+
+Renders every preset at each tier through services.render, with the render cache cleared so
+every run draws, and prints the median render+encode time and encoded size per preset and
+tier, plus each tier's cost as a fraction of the full-detail screen render. --lod overrides
+the level of detail the tiers pick, e.g. to time a full-detail thumbnail for comparison.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['ARCHIBOT_SHARED_CACHE'] = 'off' # Every render must actually draw
+
+from services import render
+from services.render_cache import cache
+
+BASELINE = ('screen', 'full')
+
+
+def bench(preset, configs, fmt, repeat):
+    """
+    Median wall seconds and encoded size of `repeat` uncached renders per (tier, lod). The
+    configurations take turns, so drift over the run does not favor any of them.
+    """
+    times = {config: [] for config in configs}
+    sizes = {}
+    for _ in range(repeat):
+        for tier, lod in configs:
+            cache.clear()
+            start = time.perf_counter()
+            result = render.render(preset, {}, tier=tier, fmt=fmt, lod=lod)
+            times[tier, lod].append(time.perf_counter() - start)
+            sizes[tier, lod] = len(result['body'])
+    return {config: (statistics.median(times[config]), sizes[config]) for config in configs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time preset renders per tier and level of detail.")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3, help="untimed renders per preset first")
+    parser.add_argument('--format', default='png', choices=render.FORMATS)
+    parser.add_argument('--tier', action='append', choices=render.DPI_TIERS,
+                        help="tiers to time (default: all)")
+    parser.add_argument('--lod', choices=render.LOD_TIERS, help="override the tier's level of detail")
+    parser.add_argument('--preset', action='append', choices=render.PRESETS)
+    args = parser.parse_args(argv)
+
+    tiers = args.tier or list(render.DPI_TIERS)
+    presets = args.preset or list(render.PRESETS)
+    configs = [render.resolve_tier(tier, args.lod) for tier in tiers]
+    print(f"{'preset':<12} {'tier':<10} {'lod':<7} {'median ms':>10} {'bytes':>9} {'vs full':>8}")
+    fractions = {config: [] for config in configs}
+    for preset in presets:
+        for _ in range(args.warmup):
+            cache.clear()
+            render.render(preset, {}, fmt=args.format)
+        results = bench(preset, list(dict.fromkeys([BASELINE, *configs])), args.format, args.repeat)
+        baseline = results[BASELINE][0]
+        for tier, lod in configs:
+            seconds, size = results[tier, lod]
+            fractions[tier, lod].append(seconds / baseline)
+            print(f"{preset:<12} {tier:<10} {lod:<7} {seconds * 1000:>10.1f} {size:>9} "
+                  f"{seconds / baseline:>7.0%}", flush=True)
+    cache.clear()
+
+    print()
+    for tier, lod in configs:
+        print(f"{tier:<10} {lod:<7} median cost vs full-detail screen: {statistics.median(fractions[tier, lod]):.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Shared cache benchmark: python tools/bench_shared_cache.py --workers 1 2 4
+
+Runs the same skewed stream of render requests (a few popular plans, a long tail of
+variants) through 1, 2, 4... worker processes, each with its own in-process render cache as
+under gunicorn, once per shared cache backend: off, sqlite (a scratch file) and redis (the
+tools/resp_standin.py server). Prints throughput and hit rate per run. Without sharing, every
+worker draws each plan itself and the hit rate falls as workers are added; with it, the
+hit rate holds and the extra workers only add capacity.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'tools'))
+
+
+def workload(total, variants, seed):
+    """`total` (preset, params) requests over `variants` plans, with Zipf-like popularity."""
+    from services import render, speculation
+    plans = []
+    for preset in render.PRESETS:
+        plans.append((preset, {}))
+        plans.extend((preset, params) for params in speculation.neighbors(preset, {}))
+    while len(plans) < variants: # Widen the tail with bigger rooms
+        preset, params = plans[len(plans) % len(render.PRESETS)]
+        name = render.ROOM_DIMENSIONS[preset][0]
+        plans.append((preset, {**params, name: 3.0 + len(plans) * 0.1}))
+    plans = plans[:variants]
+    weights = [1 / (rank + 1) for rank in range(len(plans))]
+    return random.Random(seed).choices(plans, weights, k=total)
+
+
+def _worker(requests, tier, results):
+    from services import render
+    hits = 0
+    start = time.perf_counter()
+    for preset, params in requests:
+        if render.render(preset, params, tier=tier, fmt='png')['cached']:
+            hits += 1
+    results.put((len(requests), hits, time.perf_counter() - start))
+
+
+def run(backend, workers, requests, tier):
+    os.environ['ARCHIBOT_SHARED_CACHE'] = backend # Read by the spawned workers on import
+    os.environ['ARCHIBOT_SPECULATION'] = '0'
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(requests[n::workers], tier, results))
+                 for n in range(workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    done = [results.get() for _ in processes]
+    wall = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    total = sum(d[0] for d in done)
+    hits = sum(d[1] for d in done)
+    busy = max(d[2] for d in done)
+    return total / busy, hits / total, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare render hit rate and throughput across shared cache backends.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--variants', type=int, default=60)
+    parser.add_argument('--tier', default='thumbnail')
+    parser.add_argument('--backend', action='append', choices=('off', 'sqlite', 'redis'))
+    args = parser.parse_args(argv)
+
+    import resp_standin
+    from services import shared_cache
+
+    requests = workload(args.requests, args.variants, seed=1)
+    print(f"{len(requests)} requests over {len(set(map(repr, requests)))} distinct plans, tier={args.tier}")
+    print(f"{'backend':<8} {'workers':>7} {'renders/s':>10} {'hit rate':>9} {'wall s':>7}")
+    with tempfile.TemporaryDirectory() as scratch:
+        db_path = os.environ['ARCHIBOT_SHARED_CACHE_DB'] = os.path.join(scratch, 'cache.sqlite3')
+        standin = resp_standin.start()
+        url = f"redis://127.0.0.1:{standin.server_address[1]}/0"
+        backends = {'off': 'off', 'sqlite': 'sqlite', 'redis': url}
+        stores = {'off': None, 'sqlite': shared_cache.SQLiteStore(db_path), 'redis': shared_cache.RespStore(url)}
+        for name in args.backend or backends:
+            for workers in args.workers:
+                if stores[name] is not None:
+                    stores[name].clear() # Every run starts cold
+                rate, hit_rate, wall = run(backends[name], workers, requests, args.tier)
+                print(f"{name:<8} {workers:>7} {rate:>10.1f} {hit_rate:>8.0%} {wall:>7.1f}", flush=True)
+        standin.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
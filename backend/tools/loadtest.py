@@ -0,0 +1,145 @@
+"""
+Load test against the stub backend: python tools/loadtest.py --workers 2 --threads 16
+
+Starts serve.py with ARCHIBOT_BACKEND=stub on a free port, drives /predict (and optionally
+another path) with a fixed number of concurrent clients, then sends SIGTERM while requests
+are in flight and checks that every one of them completed.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/metrics')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+def _request(port, path, timeout):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    if path == '/predict':
+        body = json.dumps({'user_input': 'How wide should a kitchen aisle be?'})
+        conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+    else:
+        conn.request('GET', path)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+def run_load(port, path, concurrency, duration, timeout):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client():
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                ok = _request(port, path, timeout) == 200
+            except OSError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return latencies, errors[0], wall
+
+
+def check_drain(server, port, concurrency, timeout):
+    """Sends SIGTERM with requests in flight; returns (completed, failed)."""
+    results = []
+
+    def client():
+        try:
+            results.append(_request(port, '/predict', timeout) == 200)
+        except OSError:
+            results.append(False)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    time.sleep(0.3) # let them reach the workers
+    server.send_signal(signal.SIGTERM)
+    for t in threads:
+        t.join()
+    server.wait(timeout=timeout)
+    return results.count(True), results.count(False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--latency', type=float, default=1.0, help="simulated generation time (s)")
+    parser.add_argument('--path', default='/predict')
+    args = parser.parse_args(argv)
+
+    port = _free_port()
+    env = dict(os.environ, ARCHIBOT_BACKEND='stub', ARCHIBOT_STUB_LATENCY=str(args.latency),
+               ARCHIBOT_ANSWER_TTL='0') # Every request must reach the (stub) model
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(args.workers), '--threads', str(args.threads)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(port)
+        timeout = args.latency * 10 + 30
+        latencies, errors, wall = run_load(port, args.path, args.concurrency, args.duration, timeout)
+        completed, failed = check_drain(server, port, min(args.concurrency, args.workers * args.threads), timeout)
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float('nan')
+    print(f"workers={args.workers} threads={args.threads} concurrency={args.concurrency} path={args.path}")
+    print(f"requests={len(latencies)} errors={errors} throughput={len(latencies) / wall:.1f} req/s")
+    print(f"latency p50={pct(0.5) * 1000:.0f}ms p95={pct(0.95) * 1000:.0f}ms "
+          f"p99={pct(0.99) * 1000:.0f}ms mean={statistics.fmean(latencies) * 1000 if latencies else 0:.0f}ms")
+    print(f"drain on SIGTERM: {completed} completed, {failed} dropped")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Replays a recorded request trace against a server: python tools/replay_trace.py --speed 4
+
+Run the server with ARCHIBOT_CASSETTE_MODE=replay (and ARCHIBOT_REPLAY_SPEED to scale the
+recorded upstream timings) so every generation comes from the cassette. This tool then
+re-sends the trace recorded with ARCHIBOT_CASSETTE_MODE=record, keeping the original
+inter-arrival gaps divided by --speed (0 sends everything at once), and reports throughput
+and latency percentiles. Repeated runs see identical content and timing.
+"""
+import argparse
+import concurrent.futures
+import http.client
+import json
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cassette import CASSETTE_PATH, CassetteStore
+
+
+def send(url, route, payload, timeout):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    start = time.perf_counter()
+    conn.request('POST', route, body=json.dumps(payload), headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded request trace.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--cassette', default=CASSETTE_PATH)
+    parser.add_argument('--speed', type=float, default=1.0, help="arrival-rate multiplier; 0 = all at once")
+    parser.add_argument('--max-concurrency', type=int, default=256)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args(argv)
+
+    trace = list(CassetteStore(args.cassette).trace())
+    if not trace:
+        print("Trace is empty; record one with ARCHIBOT_CASSETTE_MODE=record.", file=sys.stderr)
+        return 1
+
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_concurrency) as pool:
+        futures = []
+        for offset, route, payload in trace:
+            if args.speed > 0:
+                delay = start + offset / args.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(pool.submit(send, args.url, route, payload, args.timeout))
+        for future in futures:
+            try:
+                status, seconds = future.result()
+            except OSError:
+                failures += 1
+                continue
+            if status == 200:
+                latencies.append(seconds)
+            else:
+                failures += 1
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float('nan')
+    print(f"requests={len(trace)} ok={len(latencies)} failed={failures} speed={args.speed}x wall={wall:.2f}s")
+    print(f"throughput={len(latencies) / wall:.1f} req/s p50={pct(0.5):.0f}ms p95={pct(0.95):.0f}ms p99={pct(0.99):.0f}ms")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
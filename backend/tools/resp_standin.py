@@ -0,0 +1,138 @@
+"""
+Local stand-in for a Redis server: python tools/resp_standin.py --port 6390
+
+Speaks enough of the Redis protocol (RESP) for services.shared_cache -- PING, AUTH, SELECT,
+GET, SET with NX/XX/EX/PX, DEL, EXISTS, SCAN with MATCH and FLUSHDB -- from one in-memory
+dict with lazy expiry, so tests and benchmarks can run the redis:// backend without a
+Redis install. Point the app at it with ARCHIBOT_SHARED_CACHE=redis://127.0.0.1:6390/0.
+"""
+import argparse
+import fnmatch
+import socketserver
+import sys
+import threading
+import time
+
+
+class Store:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._data = {} # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= self.clock():
+            del self._data[key]
+            return None
+        return item
+
+    def execute(self, args):
+        command = args[0].upper()
+        with self._lock:
+            if command == b'PING':
+                return 'PONG'
+            if command in (b'AUTH', b'SELECT'):
+                return 'OK'
+            if command == b'GET':
+                item = self._live(args[1])
+                return None if item is None else item[0]
+            if command == b'SET':
+                return self._set(args[1], args[2], [a.upper() for a in args[3:]], args[3:])
+            if command == b'DEL':
+                return sum(self._data.pop(key, None) is not None for key in args[1:])
+            if command == b'EXISTS':
+                return sum(self._live(key) is not None for key in args[1:])
+            if command == b'SCAN':
+                options = {args[i].upper(): args[i + 1] for i in range(2, len(args) - 1, 2)}
+                pattern = options.get(b'MATCH', b'*').decode('utf-8')
+                keys = [k for k in list(self._data) if self._live(k) is not None
+                        and fnmatch.fnmatchcase(k.decode('utf-8', 'replace'), pattern)]
+                return [b'0', keys] # Everything in one pass
+            if command == b'FLUSHDB':
+                self._data.clear()
+                return 'OK'
+        return ValueError(f"ERR unknown command '{command.decode('utf-8', 'replace')}'")
+
+    def _set(self, key, value, flags, raw):
+        expires_at = None
+        for i, flag in enumerate(flags):
+            if flag in (b'EX', b'PX'):
+                amount = int(raw[i + 1])
+                expires_at = self.clock() + (amount if flag == b'EX' else amount / 1000)
+        exists = self._live(key) is not None
+        if (b'NX' in flags and exists) or (b'XX' in flags and not exists):
+            return None
+        self._data[key] = (value, expires_at)
+        return 'OK'
+
+
+def encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, ValueError):
+        return b'-' + str(reply).encode('utf-8') + b'\r\n'
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(encode_reply(r) for r in reply)
+    if isinstance(reply, str): # Simple string
+        return b'+' + reply.encode('utf-8') + b'\r\n'
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+def read_command(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'): # Inline command, e.g. from telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        size = int(stream.readline()[1:])
+        args.append(stream.read(size + 2)[:-2])
+    return args
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            args = read_command(self.rfile)
+            if args is None:
+                return
+            if args:
+                self.wfile.write(encode_reply(self.server.store.execute(args)))
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, Handler)
+        self.store = Store()
+
+
+def start(port=0, host='127.0.0.1'):
+    """Serves on a background thread; returns the server (its port is server.server_address[1])."""
+    server = Server((host, port))
+    threading.Thread(target=server.serve_forever, name='resp-standin', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-memory Redis-protocol server for tests.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args(argv)
+    server = Server((args.host, args.port))
+    print(f"RESP stand-in listening on {args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
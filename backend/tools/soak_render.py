@@ -0,0 +1,68 @@
+"""
+Render soak test: python tools/soak_render.py --renders 10000
+
+Renders the presets in rotation through services.render (the same pooled, pyplot-free path
+the /render route uses) and samples the process RSS every --sample-every renders. Prints the
+RSS series and the growth between the first sample after warm-up and the last one, and exits
+nonzero when that growth exceeds --max-growth-mb, so a leak in the figure lifecycle fails CI.
+"""
+import argparse
+import gc
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['ARCHIBOT_SHARED_CACHE'] = 'off' # Every render must actually draw
+
+from services import render
+from services.figure_pool import current_rss, pool
+from services.render_cache import cache
+
+MB = 1024 * 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render presets repeatedly and check RSS stays flat.")
+    parser.add_argument('--renders', type=int, default=10_000)
+    parser.add_argument('--sample-every', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=200, help="renders before the baseline sample")
+    parser.add_argument('--max-growth-mb', type=float, default=32.0)
+    parser.add_argument('--tier', default='thumbnail', choices=render.DPI_TIERS)
+    parser.add_argument('--format', default='png', choices=render.FORMATS)
+    args = parser.parse_args(argv)
+
+    if current_rss() is None:
+        print("RSS is not readable on this platform (/proc/self/statm).", file=sys.stderr)
+        return 2
+
+    presets = itertools.cycle(render.PRESETS)
+    baseline = None
+    samples = []
+    start = time.perf_counter()
+    for n in range(1, args.renders + 1):
+        cache.clear() # Every iteration must actually draw
+        render.render(next(presets), {}, tier=args.tier, fmt=args.format)
+        if n == args.warmup:
+            gc.collect()
+            baseline = current_rss()
+        if n % args.sample_every == 0 or n == args.renders:
+            rss = current_rss()
+            samples.append((n, rss))
+            print(f"{n:>7} renders  rss={rss / MB:8.1f} MB", flush=True)
+    wall = time.perf_counter() - start
+
+    if baseline is None: # Fewer renders than the warm-up
+        baseline = samples[0][1]
+    growth = (samples[-1][1] - baseline) / MB
+    print(f"renders={args.renders} wall={wall:.1f}s rate={args.renders / wall:.1f}/s "
+          f"figures_created={pool.created} baseline={baseline / MB:.1f} MB growth={growth:+.1f} MB")
+    if growth > args.max_growth_mb:
+        print(f"FAIL: RSS grew {growth:.1f} MB (limit {args.max_growth_mb} MB)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Clearance sweep over room sizes: python tools/sweep_clearance.py bedroom --step 0.25
+
+Builds the preset at every width x height on a grid (and every bed_type / fixture_layout),
+runs services.clearance on each layout, and prints the sizes that fail with their violations,
+followed by a summary with the per-layout analysis time.
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import clearance, render
+
+
+def frange(start, stop, step):
+    count = int(round((stop - start) / step))
+    return [round(start + n * step, 3) for n in range(count + 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep room sizes and report clearance violations.")
+    parser.add_argument('preset', choices=render.PRESETS)
+    parser.add_argument('--min', type=float, default=2.0, help="smallest room side, meters")
+    parser.add_argument('--max', type=float, default=6.0, help="largest room side, meters")
+    parser.add_argument('--step', type=float, default=0.5)
+    parser.add_argument('--resolution', type=float, default=clearance.RESOLUTION)
+    parser.add_argument('--path-width', type=float, default=clearance.PATH_WIDTH)
+    args = parser.parse_args(argv)
+
+    width_name, height_name = render.ROOM_DIMENSIONS[args.preset]
+    sides = frange(args.min, args.max, args.step)
+    choices = render.CHOICES.get(args.preset, {})
+    variants = [dict(zip(choices, values)) for values in itertools.product(*choices.values())] or [{}]
+
+    analysis_seconds = []
+    failing = 0
+    start = time.perf_counter()
+    for variant, width, height in itertools.product(variants, sides, sides):
+        params = {**variant, width_name: width, height_name: height}
+        scene = clearance.scene_for(args.preset, params)
+        report = clearance.analyze(scene, args.resolution, args.path_width)
+        analysis_seconds.append(report['seconds'])
+        if report['violations']:
+            failing += 1
+            label = ' '.join(f"{k}={v}" for k, v in params.items())
+            checks = '; '.join(f"{v['instance']}: {v['detail']}" for v in report['violations'])
+            print(f"{label}  reachable={report['reachable_area']:.2f}m2  {checks}")
+    wall = time.perf_counter() - start
+
+    total = len(analysis_seconds)
+    print(f"layouts={total} failing={failing} wall={wall:.2f}s "
+          f"analysis median={statistics.median(analysis_seconds) * 1000:.2f}ms "
+          f"max={max(analysis_seconds) * 1000:.2f}ms")
+    return 1 if failing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
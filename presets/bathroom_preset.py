@@ -1,7 +1,11 @@
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, Arc, Circle
+from functools import lru_cache
+
+from matplotlib.patches import Rectangle, Arc
 from matplotlib.lines import Line2D
 
+from figures import plan_axes
+from symbols import SYMBOL_CACHE_SIZE, Part, Symbol, add_door, add_window, ellipse, place, rect, segment, set_room, show_details, show_labels
+
 # --- Constants for dimensions and appearance ---
 WALL_THICKNESS = 0.15 # meters
 DOOR_WIDTH_BATH = 0.7
@@ -29,6 +33,7 @@ def draw_door(ax, x, y, door_leaf_length, wall_thickness, orientation='h', swing
     swing_direction: 'in_cw' (inwards, clockwise), 'in_ccw' (inwards, counter-clockwise),
                      'out_cw' (outwards, clockwise), 'out_ccw' (outwards, counter-clockwise)
     """
+    add_door(ax, x, y, door_leaf_length, wall_thickness, orientation, swing_direction)
     # Cut out the door opening (white rectangle)
     if orientation == 'h':
         ax.add_patch(Rectangle((x, y), door_leaf_length, wall_thickness, facecolor=FLOOR_COLOR, edgecolor=FLOOR_COLOR, linewidth=0, zorder=2))
@@ -79,20 +84,41 @@ def draw_door(ax, x, y, door_leaf_length, wall_thickness, orientation='h', swing
 
 def draw_window(ax, x, y, length, thickness, orientation='h'):
     """Draws a window as a thin rectangle over the wall area. x,y is bottom-left of window opening."""
+    add_window(ax, x, y, length, thickness, orientation, WINDOW_COLOR)
     if orientation == 'h': # Horizontal wall (window runs horizontally)
         ax.add_patch(Rectangle((x, y), length, thickness, facecolor=WINDOW_COLOR, edgecolor='black', linewidth=0.5, zorder=2))
         # Center line for glass
-        ax.add_line(Line2D([x, x + length], [y + thickness / 2, y + thickness / 2], color='black', linewidth=1, zorder=3))
+        if show_details(ax):
+            ax.add_line(Line2D([x, x + length], [y + thickness / 2, y + thickness / 2], color='black', linewidth=1, zorder=3))
     else: # Vertical wall (window runs vertically)
         ax.add_patch(Rectangle((x, y), thickness, length, facecolor=WINDOW_COLOR, edgecolor='black', linewidth=0.5, zorder=2))
         # Center line for glass
-        ax.add_line(Line2D([x + thickness / 2, x + thickness / 2], [y, y + length], color='black', linewidth=1, zorder=3))
+        if show_details(ax):
+            ax.add_line(Line2D([x + thickness / 2, x + thickness / 2], [y, y + length], color='black', linewidth=1, zorder=3))
 
 def draw_room_label(ax, x_inner, y_inner, width_inner, height_inner, label):
+    if not show_labels(ax):
+        return
     ax.text(x_inner + width_inner / 2, y_inner + height_inner / 2,
             label, ha='center', va='center', fontsize=14, color='darkslategray', alpha=0.7)
 
 # --- BATHROOM SPECIFIC HELPER FUNCTIONS ---
+# Each fixture is a cached symbol in unit space (see symbols.py); the draw_* helpers place it.
+
+FIXTURE_LABEL = dict(fontsize=7, color='darkslategray', zorder=6)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def toilet_symbol(orientation):
+    tank = {
+        'N': rect(0, 0.6, 1, 0.4),
+        'S': rect(0, 0, 1, 0.4), # Tank at bottom
+        'E': rect(0, 0, 0.4, 1), # Tank at left
+        'W': rect(0.6, 0, 0.4, 1), # Tank at right
+    }[orientation]
+    return Symbol('toilet', [
+        Part('body', [rect(0, 0, 1, 1)], facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4),
+        Part('tank', [tank], facecolor='gray', edgecolor='black', linewidth=0.5, zorder=5),
+    ], **FIXTURE_LABEL)
 
 def draw_toilet(ax, x, y, orientation='N', label="WC"):
     """
@@ -100,42 +126,43 @@ def draw_toilet(ax, x, y, orientation='N', label="WC"):
     orientation: 'N' (north/up), 'S' (south/down), 'E' (east/right), 'W' (west/left) for seat direction.
     """
     width_fixture, length_fixture = 0.4, 0.7 # standard toilet dims (width x depth)
-    
-    if orientation == 'N': # seat facing North (up)
-        ax.add_patch(Rectangle((x, y), width_fixture, length_fixture, facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-        ax.add_patch(Rectangle((x, y + length_fixture * 0.6), width_fixture, length_fixture * 0.4, facecolor='gray', edgecolor='black', linewidth=0.5, zorder=5)) # Tank
-        text_x, text_y = x + width_fixture/2, y + length_fixture/2
-    elif orientation == 'S': # seat facing South (down)
-        ax.add_patch(Rectangle((x, y), width_fixture, length_fixture, facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-        ax.add_patch(Rectangle((x, y), width_fixture, length_fixture * 0.4), facecolor='gray', edgecolor='black', linewidth=0.5, zorder=5) # Tank at bottom
-        text_x, text_y = x + width_fixture/2, y + length_fixture/2
-    elif orientation == 'E': # seat facing East (right)
-        ax.add_patch(Rectangle((x, y), length_fixture, width_fixture, facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-        ax.add_patch(Rectangle((x, y), length_fixture * 0.4, width_fixture, facecolor='gray', edgecolor='black', linewidth=0.5, zorder=5)) # Tank at left
-        text_x, text_y = x + length_fixture/2, y + width_fixture/2
-    elif orientation == 'W': # seat facing West (left)
-        ax.add_patch(Rectangle((x, y), length_fixture, width_fixture, facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-        ax.add_patch(Rectangle((x + length_fixture * 0.6, y), length_fixture * 0.4, width_fixture, facecolor='gray', edgecolor='black', linewidth=0.5, zorder=5)) # Tank at right
-        text_x, text_y = x + length_fixture/2, y + width_fixture/2
-    ax.text(text_x, text_y, label, ha='center', va='center', fontsize=7, color='darkslategray', zorder=6)
+    if orientation in ('N', 'S'):
+        return place(ax, toilet_symbol(orientation), x, y, width_fixture, length_fixture, label=label)
+    return place(ax, toilet_symbol(orientation), x, y, length_fixture, width_fixture, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def vanity_sink_symbol(top_fraction, basin_rx, basin_ry, label_y):
+    return Symbol('vanity_sink', [
+        Part('cabinet', [rect(0, 0, 1, 1)], facecolor=VANITY_COLOR, edgecolor='black', linewidth=0.8, zorder=4),
+        Part('countertop', [rect(0, 1 - top_fraction, 1, top_fraction)], facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.5, zorder=5),
+        Part('basin', [ellipse(0.5, 0.5, basin_rx, basin_ry)], facecolor=SINK_BASIN_COLOR, edgecolor='black', linewidth=0.5, zorder=6),
+    ], label_at=(0.5, label_y), fontsize=7, color='white', weight='bold', zorder=6)
 
 def draw_vanity_sink(ax, x, y, width, depth, label="Vanity"):
     """Draws a vanity unit with an integrated sink. x,y is bottom-left."""
-    # Vanity cabinet
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=VANITY_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-    # Countertop (thin layer on top)
-    ax.add_patch(Rectangle((x, y + depth - 0.05), width, 0.05, facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.5, zorder=5))
-    # Basin (circular or rectangular)
     basin_r = 0.2
-    ax.add_patch(Circle((x + width/2, y + depth/2), basin_r, facecolor=SINK_BASIN_COLOR, edgecolor='black', linewidth=0.5, zorder=6))
-    ax.text(x + width/2, y + depth/2 + 0.3, label, ha='center', va='center', fontsize=7, color='white', weight='bold', zorder=6)
+    symbol = vanity_sink_symbol(round(0.05 / depth, 4), round(basin_r / width, 4), round(basin_r / depth, 4),
+                                round(0.5 + 0.3 / depth, 4))
+    return place(ax, symbol, x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def shower_symbol():
+    return Symbol('shower', [
+        Part('tray', [rect(0, 0, 1, 1)], facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4),
+        Part('drain', [segment(0, 1, 1, 0), segment(0, 0, 1, 1)], fill=False, color='blue', linestyle='--', linewidth=0.8, zorder=5, detail=True), # Cross-lines for drain
+    ], **FIXTURE_LABEL)
 
 def draw_shower(ax, x, y, width, height, label="Shower"):
     """Draws a shower stall. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, height, facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-    ax.add_line(Line2D([x, x + width], [y + height, y], color='blue', linestyle='--', linewidth=0.8, zorder=5)) # Cross-lines for drain
-    ax.add_line(Line2D([x, x + width], [y, y + height], color='blue', linestyle='--', linewidth=0.8, zorder=5))
-    ax.text(x + width/2, y + height/2, label, ha='center', va='center', fontsize=7, color='darkslategray', zorder=6)
+    return place(ax, shower_symbol(), x, y, width, height, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def bathtub_symbol(inset_x, inset_y, faucet_x, faucet_y, faucet_rx, faucet_ry):
+    return Symbol('bathtub', [
+        Part('shell', [rect(0, 0, 1, 1)], facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4),
+        Part('basin', [rect(inset_x, inset_y, 1 - 2 * inset_x, 1 - 2 * inset_y)], facecolor='white', edgecolor='black', linewidth=0.5, zorder=5),
+        Part('faucet', [ellipse(faucet_x, faucet_y, faucet_rx, faucet_ry)], facecolor='gray', edgecolor='black', zorder=6, detail=True),
+    ], **FIXTURE_LABEL)
 
 def draw_bathtub(ax, x, y, width, height, label="Tub", orientation='h'):
     """
@@ -143,17 +170,14 @@ def draw_bathtub(ax, x, y, width, height, label="Tub", orientation='h'):
     orientation: 'h' for horizontal, 'v' for vertical placement.
     """
     if orientation == 'h':
-        ax.add_patch(Rectangle((x, y), width, height, facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-        # Indicate inner tub shape
-        ax.add_patch(Rectangle((x + 0.1, y + 0.1), width - 0.2, height - 0.2, facecolor='white', edgecolor='black', linewidth=0.5, zorder=5))
-        # Faucet/Drain
-        ax.add_patch(Circle((x + 0.2, y + height - 0.15), 0.05, facecolor='gray', edgecolor='black', zorder=6))
-        ax.text(x + width/2, y + height/2, label, ha='center', va='center', fontsize=7, color='darkslategray', zorder=6)
+        w, h = width, height
+        faucet = (0.2 / w, 1 - 0.15 / h) # Faucet/Drain
     else: # Vertical
-        ax.add_patch(Rectangle((x, y), height, width, facecolor=FIXTURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-        ax.add_patch(Rectangle((x + 0.1, y + 0.1), height - 0.2, width - 0.2, facecolor='white', edgecolor='black', linewidth=0.5, zorder=5))
-        ax.add_patch(Circle((x + height - 0.15, y + 0.2), 0.05, facecolor='gray', edgecolor='black', zorder=6))
-        ax.text(x + height/2, y + width/2, label, ha='center', va='center', fontsize=7, color='darkslategray', zorder=6)
+        w, h = height, width
+        faucet = (1 - 0.15 / w, 0.2 / h)
+    symbol = bathtub_symbol(round(0.1 / w, 4), round(0.1 / h, 4), round(faucet[0], 4), round(faucet[1], 4),
+                            round(0.05 / w, 4), round(0.05 / h, 4))
+    return place(ax, symbol, x, y, w, h, label=label)
 
 
 # --- Main Bathroom Preset Generator ---
@@ -161,9 +185,11 @@ def draw_bathtub(ax, x, y, width, height, label="Tub", orientation='h'):
 def generate_bathroom_preset(
     bathroom_width=2.5,  # Inner width of the room
     bathroom_height=3.0, # Inner height of the room
-    fixture_layout="shower" # "shower" or "bathtub"
+    fixture_layout="shower", # "shower" or "bathtub"
+    fig=None,            # Existing Figure to draw into (reused by the render pool)
+    lod=None             # Level of detail: "full", "medium" or "low" (None = full)
 ):
-    fig, ax = plt.subplots(figsize=(8, 7))
+    fig, ax = plan_axes(fig, figsize=(8, 7), lod=lod)
 
     # --- 1. Define Room Boundaries ---
     room_origin_x = 0
@@ -186,6 +212,7 @@ def generate_bathroom_preset(
         bathroom_width, bathroom_height,
         facecolor=FLOOR_COLOR, edgecolor='black', linewidth=0, zorder=1
     ))
+    set_room(ax, inner_room_x, inner_room_y, bathroom_width, bathroom_height, WALL_THICKNESS, WALL_COLOR, FLOOR_COLOR)
     '''
     # --- 3. Door ---
     # Placed on the bottom wall, near right corner (common for small baths)
@@ -258,13 +285,18 @@ def generate_bathroom_preset(
     ax.set_ylim(room_origin_y - 0.5, room_origin_y + outer_height + 0.5)
     ax.set_xticks([])
     ax.set_yticks([])
-    ax.set_title(f"Detailed Bathroom Floor Plan ({bathroom_width:.1f}x{bathroom_height:.1f}m)", fontsize=16)
+    if show_labels(ax):
+        ax.set_title(f"Detailed Bathroom Floor Plan ({bathroom_width:.1f}x{bathroom_height:.1f}m)", fontsize=16)
     ax.grid(False)
 
-    plt.show()
+    return fig
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt # Only for interactive display
 
-# --- Call the function to generate the plot with a shower ---
-generate_bathroom_preset(fixture_layout="shower")
+    # --- Call the function to generate the plot with a shower ---
+    generate_bathroom_preset(fixture_layout="shower", fig=plt.figure())
+    plt.show()
 
-# --- Call the function to generate the plot with a bathtub ---
-# generate_bathroom_preset(fixture_layout="bathtub", bathroom_width=2.5, bathroom_height=3.5)
\ No newline at end of file
+    # --- Call the function to generate the plot with a bathtub ---
+    # generate_bathroom_preset(fixture_layout="bathtub", bathroom_width=2.5, bathroom_height=3.5)
\ No newline at end of file
@@ -1,7 +1,38 @@
-import matplotlib.pyplot as plt
+from functools import lru_cache
+
 from matplotlib.patches import Rectangle, Arc
 from matplotlib.lines import Line2D
 
+from figures import plan_axes
+from symbols import SYMBOL_CACHE_SIZE, Part, Symbol, add_window, place, rect, segment, set_room, show_details, show_labels
+
+# Each fixture is a cached symbol in unit space (see symbols.py); the draw_* helpers place it.
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def bed_symbol(margin_x, margin_y, pillow_width):
+    """
+    Bed in unit space: mattress is the unit square, the headboard sits above it (y > 1).
+    margin_x/margin_y are the 0.05 m pillow margins and pillow_width is one pillow, as fractions of the bed.
+    """
+    # --- Z-orders for layering ---
+    # Headboard (behind mattress)
+    # Mattress/Base
+    # Blanket
+    # Pillows (on top)
+    blanket_length = 0.7 # Covers most of the bed, starting from the foot
+    fold_y = blanket_length - 0.05 # Optional: Add a small fold line on the blanket
+    pillow_length = 0.15
+    pillow_y = 1 - pillow_length - margin_y # Positioned near the headboard, slightly inwards
+    return Symbol('bed', [
+        Part('headboard', [rect(0, 1, 1, 0.08)], facecolor='#8b4513', edgecolor='black', linewidth=0.8, zorder=3),
+        Part('mattress', [rect(0, 0, 1, 1)], facecolor='#d3d3d3', edgecolor='black', linewidth=0.8, zorder=4),
+        Part('blanket', [rect(0, 0, 1, blanket_length)], facecolor='#add8e6', edgecolor='black', linewidth=0.5, zorder=5),
+        Part('fold', [segment(0.2, fold_y, 0.8, fold_y)], fill=False, color='darkblue', linestyle='--', linewidth=0.8, alpha=0.6, zorder=5, detail=True),
+        Part('pillows', [rect(margin_x, pillow_y, pillow_width, pillow_length),
+                         rect(pillow_width + margin_x, pillow_y, pillow_width, pillow_length)],
+             facecolor='#f0f8ff', edgecolor='black', linewidth=0.5, zorder=6, detail=True),
+    ], fontsize=9, color='darkslategray', weight='bold', zorder=7)
+
 def draw_bed(ax, x, y, width, length,
              bed_base_color='#d3d3d3',      # Light grey for mattress/frame
              headboard_color='#8b4513',     # Brown for headboard
@@ -14,58 +45,37 @@ def draw_bed(ax, x, y, width, length,
     'width' is the width of the bed (e.g., across the sleeping person).
     'length' is the length of the bed (e.g., head to toe).
     """
+    pillow_width = (width - 0.1) / 2 # Slightly smaller than half the bed width with a small gap
+    symbol = bed_symbol(round(0.05 / width, 4), round(0.05 / length, 4), round(pillow_width / width, 4))
+    style = {
+        'headboard': {'facecolor': headboard_color},
+        'mattress': {'facecolor': bed_base_color},
+        'blanket': {'facecolor': blanket_color},
+        'pillows': {'facecolor': pillow_color},
+    }
+    return place(ax, symbol, x, y, width, length, style=style, label=bed_label)
 
-    # --- Z-orders for layering ---
-    # Headboard (behind mattress)
-    # Mattress/Base
-    # Blanket
-    # Pillows (on top)
-
-    # 1. Headboard
-    headboard_height = length * 0.08 # Proportionate height
-    # Draw headboard slightly behind the mattress 'length'
-    ax.add_patch(Rectangle(
-        (x, y + length),                 # Positioned at the 'head' end of the bed
-        width, headboard_height,
-        facecolor=headboard_color, edgecolor='black', linewidth=0.8, zorder=3
-    ))
-
-    # 2. Mattress/Bed Base
-    ax.add_patch(Rectangle(
-        (x, y), width, length,
-        facecolor=bed_base_color, edgecolor='black', linewidth=0.8, zorder=4
-    ))
 
-    # 3. Blanket/Duvet
-    # Covers most of the bed, starting from the foot
-    blanket_length = length * 0.7
-    ax.add_patch(Rectangle(
-        (x, y), width, blanket_length,
-        facecolor=blanket_color, edgecolor='black', linewidth=0.5, zorder=5
-    ))
-    # Optional: Add a small fold line on the blanket
-    fold_y = y + blanket_length - (length * 0.05)
-    ax.add_line(Line2D([x + width * 0.2, x + width * 0.8], [fold_y, fold_y],
-                       color='darkblue', linestyle='--', linewidth=0.8, alpha=0.6, zorder=5))
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def nightstand_symbol():
+    return Symbol('nightstand', [
+        Part('body', [rect(0, 0, 1, 1)], facecolor='peru', edgecolor='black', linewidth=0.8, zorder=4),
+    ])
 
+def draw_nightstand(ax, x, y, size, color='peru'):
+    """Draws a square nightstand. x,y is bottom-left."""
+    return place(ax, nightstand_symbol(), x, y, size, size, style={'body': {'facecolor': color}})
 
-    # 4. Pillows (two pillows side-by-side)
-    pillow_width = (width - 0.1) / 2 # Slightly smaller than half the bed width with a small gap
-    pillow_length_actual = length * 0.15 # Actual length of a pillow
-    pillow_y_pos = y + length - pillow_length_actual - 0.05 # Positioned near the headboard, slightly inwards
 
-    ax.add_patch(Rectangle(
-        (x + 0.05, pillow_y_pos), pillow_width, pillow_length_actual,
-        facecolor=pillow_color, edgecolor='black', linewidth=0.5, zorder=6
-    ))
-    ax.add_patch(Rectangle(
-        (x + pillow_width + 0.05, pillow_y_pos), pillow_width, pillow_length_actual,
-        facecolor=pillow_color, edgecolor='black', linewidth=0.5, zorder=6
-    ))
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def wardrobe_symbol():
+    return Symbol('wardrobe', [
+        Part('body', [rect(0, 0, 1, 1)], facecolor='peru', edgecolor='black', linewidth=1, zorder=4),
+    ], rotation=90, fontsize=9, color='white', weight='bold', zorder=5)
 
-    # Optional: Bed label
-    ax.text(x + width / 2, y + length / 2, bed_label,
-            ha='center', va='center', fontsize=9, color='darkslategray', weight='bold', zorder=7)
+def draw_wardrobe(ax, x, y, depth, width, color='peru', label="Wardrobe"):
+    """Draws a wardrobe against a vertical wall. x,y is bottom-left; depth is into the room."""
+    return place(ax, wardrobe_symbol(), x, y, depth, width, style={'body': {'facecolor': color}}, label=label)
 
 
 def generate_bedroom_preset(
@@ -81,14 +91,16 @@ def generate_bedroom_preset(
     furniture_color='peru',
     wall_color='lightgray',
     door_color='white',
-    window_color='lightblue'
+    window_color='lightblue',
+    fig=None,             # Existing Figure to draw into (reused by the render pool)
+    lod=None              # Level of detail: "full", "medium" or "low" (None = full)
 ):
     """
     Generates a Matplotlib plot of a basic bedroom floor plan.
     Includes a more detailed bed.
     """
 
-    fig, ax = plt.subplots(figsize=(10, 8))
+    fig, ax = plan_axes(fig, figsize=(10, 8), lod=lod)
 
     # Define bed dimensions based on type (approximate standard sizes in meters)
     bed_dims = {
@@ -124,6 +136,7 @@ def generate_bedroom_preset(
         room_width, room_height,
         facecolor='white', edgecolor='black', linewidth=0, zorder=1
     ))
+    set_room(ax, inner_room_x, inner_room_y, room_width, room_height, wall_thickness, wall_color, 'white')
 
     # --- 3. Door ---
     '''
@@ -154,17 +167,19 @@ def generate_bedroom_preset(
     # --- 4. Window ---
     window_pos_x = inner_room_x + (room_width - window_width) / 2
     window_pos_y = inner_room_y + room_height
+    add_window(ax, window_pos_x, window_pos_y, window_width, wall_thickness, 'h', window_color)
 
     ax.add_patch(Rectangle(
         (window_pos_x, window_pos_y),
         window_width, wall_thickness,
         facecolor=window_color, edgecolor='black', linewidth=0.5, zorder=2
     ))
-    ax.add_line(Line2D(
-        [window_pos_x, window_pos_x + window_width],
-        [window_pos_y + wall_thickness / 2, window_pos_y + wall_thickness / 2],
-        color='black', linewidth=1, zorder=3
-    ))
+    if show_details(ax):
+        ax.add_line(Line2D(
+            [window_pos_x, window_pos_x + window_width],
+            [window_pos_y + wall_thickness / 2, window_pos_y + wall_thickness / 2],
+            color='black', linewidth=1, zorder=3
+        ))
 
     # --- 5. Furniture ---
     # Bed: Placed against the top wall, centered
@@ -174,31 +189,19 @@ def generate_bedroom_preset(
 
     # Nightstands: Next to the bed
     # Left nightstand
-    ax.add_patch(Rectangle(
-        (bed_x - nightstand_size - 0.1, bed_y + bed_length - nightstand_size),
-        nightstand_size, nightstand_size,
-        facecolor=furniture_color, edgecolor='black', linewidth=0.8, zorder=4
-    ))
+    draw_nightstand(ax, bed_x - nightstand_size - 0.1, bed_y + bed_length - nightstand_size, nightstand_size, furniture_color)
     # Right nightstand
-    ax.add_patch(Rectangle(
-        (bed_x + bed_width + 0.1, bed_y + bed_length - nightstand_size),
-        nightstand_size, nightstand_size,
-        facecolor=furniture_color, edgecolor='black', linewidth=0.8, zorder=4
-    ))
+    draw_nightstand(ax, bed_x + bed_width + 0.1, bed_y + bed_length - nightstand_size, nightstand_size, furniture_color)
 
     # Wardrobe: Placed on the right wall
     wardrobe_x = inner_room_x + room_width - wardrobe_depth
     wardrobe_y = inner_room_y + 0.5
-    ax.add_patch(Rectangle(
-        (wardrobe_x, wardrobe_y), wardrobe_depth, wardrobe_width,
-        facecolor=furniture_color, edgecolor='black', linewidth=1, zorder=4
-    ))
-    ax.text(wardrobe_x + wardrobe_depth / 2, wardrobe_y + wardrobe_width / 2, "Wardrobe",
-            rotation=90, ha='center', va='center', fontsize=9, color='white', weight='bold', zorder=5)
+    draw_wardrobe(ax, wardrobe_x, wardrobe_y, wardrobe_depth, wardrobe_width, furniture_color)
 
     # --- 6. Room Label ---
-    ax.text(inner_room_x + room_width / 2, inner_room_y + room_height / 2,
-            "BEDROOM", ha='center', va='center', fontsize=18, color='darkslategray', alpha=0.6)
+    if show_labels(ax):
+        ax.text(inner_room_x + room_width / 2, inner_room_y + room_height / 2,
+                "BEDROOM", ha='center', va='center', fontsize=18, color='darkslategray', alpha=0.6)
 
     # --- 7. Plot Settings ---
     ax.set_aspect('equal', adjustable='box')
@@ -206,13 +209,18 @@ def generate_bedroom_preset(
     ax.set_ylim(room_origin_y - 0.5, room_origin_y + outer_height + 0.5)
     ax.set_xticks([])
     ax.set_yticks([])
-    ax.set_title(f"Bedroom Floor Plan Preset ({room_width:.1f}x{room_height:.1f}m)", fontsize=16)
+    if show_labels(ax):
+        ax.set_title(f"Bedroom Floor Plan Preset ({room_width:.1f}x{room_height:.1f}m)", fontsize=16)
     ax.grid(False)
 
-    plt.show()
+    return fig
 
-# --- Call the function to generate the plot with a detailed bed ---
-generate_bedroom_preset(bed_type="queen")
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt # Only for interactive display
+
+    # --- Call the function to generate the plot with a detailed bed ---
+    generate_bedroom_preset(bed_type="queen", fig=plt.figure())
+    plt.show()
 
-# --- Example with a different bed type and room size ---
-# generate_bedroom_preset(room_width=3.5, room_height=3.0, bed_type="full", furniture_color='saddlebrown')
\ No newline at end of file
+    # --- Example with a different bed type and room size ---
+    # generate_bedroom_preset(room_width=3.5, room_height=3.0, bed_type="full", furniture_color='saddlebrown')
\ No newline at end of file
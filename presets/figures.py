@@ -0,0 +1,22 @@
+from matplotlib.figure import Figure
+
+from symbols import set_lod
+
+# --- Figure setup shared by the presets ---
+# Presets build on the object-oriented Figure API and never touch pyplot's global figure manager,
+# so a long-running server can render thousands of plans without figures piling up.
+# Pass `fig` to draw into an existing (e.g. pooled) figure; it is cleared and resized first.
+
+def plan_axes(fig=None, figsize=(10, 8), lod=None):
+    """
+    Returns (fig, ax) for a plan of the given size, reusing `fig` when provided.
+    lod: level of detail, 'full' (default), 'medium' or 'low' (see symbols.py).
+    """
+    if fig is None:
+        fig = Figure(figsize=figsize)
+    else:
+        fig.clear()
+        fig.set_size_inches(figsize)
+    ax = fig.subplots()
+    set_lod(ax, lod or 'full')
+    return fig, ax
@@ -1,7 +1,11 @@
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, Arc, Circle
+from functools import lru_cache
+
+from matplotlib.patches import Rectangle, Arc
 from matplotlib.lines import Line2D
 
+from figures import plan_axes
+from symbols import SYMBOL_CACHE_SIZE, Part, Symbol, add_door, add_window, ellipse, place, rect, segment, set_room, show_details, show_labels
+
 # --- Constants for dimensions and appearance ---
 WALL_THICKNESS = 0.15 # meters
 DOOR_WIDTH = 0.8
@@ -19,6 +23,7 @@ SINK_COLOR = 'lightgray'
 CABINET_COLOR = '#a0522d' # Sienna (overhead cabinet wood)
 DOOR_COLOR = 'white'
 WINDOW_COLOR = '#add8e6'
+FURNITURE_COLOR = '#d2b48c' # Tan (island/table top)
 
 # --- Helper Functions (Revised and New) ---
 
@@ -32,6 +37,7 @@ def draw_door(ax, x, y, door_leaf_length, wall_thickness, orientation='h', swing
     swing_direction: 'in_cw' (inwards, clockwise), 'in_ccw' (inwards, counter-clockwise),
                      'out_cw' (outwards, clockwise), 'out_ccw' (outwards, counter-clockwise)
     """
+    add_door(ax, x, y, door_leaf_length, wall_thickness, orientation, swing_direction)
     # Cut out the door opening (white rectangle)
     if orientation == 'h':
         ax.add_patch(Rectangle((x, y), door_leaf_length, wall_thickness, facecolor=FLOOR_COLOR, edgecolor=FLOOR_COLOR, linewidth=0, zorder=2))
@@ -82,114 +88,158 @@ def draw_door(ax, x, y, door_leaf_length, wall_thickness, orientation='h', swing
 
 def draw_window(ax, x, y, length, thickness, orientation='h'):
     """Draws a window as a thin rectangle over the wall area. x,y is bottom-left of window opening."""
+    add_window(ax, x, y, length, thickness, orientation, WINDOW_COLOR)
     if orientation == 'h': # Horizontal wall (window runs horizontally)
         ax.add_patch(Rectangle((x, y), length, thickness, facecolor=WINDOW_COLOR, edgecolor='black', linewidth=0.5, zorder=2))
         # Center line for glass
-        ax.add_line(Line2D([x, x + length], [y + thickness / 2, y + thickness / 2], color='black', linewidth=1, zorder=3))
+        if show_details(ax):
+            ax.add_line(Line2D([x, x + length], [y + thickness / 2, y + thickness / 2], color='black', linewidth=1, zorder=3))
     else: # Vertical wall (window runs vertically)
         ax.add_patch(Rectangle((x, y), thickness, length, facecolor=WINDOW_COLOR, edgecolor='black', linewidth=0.5, zorder=2))
         # Center line for glass
-        ax.add_line(Line2D([x + thickness / 2, x + thickness / 2], [y, y + length], color='black', linewidth=1, zorder=3))
+        if show_details(ax):
+            ax.add_line(Line2D([x + thickness / 2, x + thickness / 2], [y, y + length], color='black', linewidth=1, zorder=3))
 
 def draw_room_label(ax, x_inner, y_inner, width_inner, height_inner, label):
+    if not show_labels(ax):
+        return
     ax.text(x_inner + width_inner / 2, y_inner + height_inner / 2,
             label, ha='center', va='center', fontsize=14, color='darkslategray', alpha=0.7)
 
 # --- KITCHEN SPECIFIC HELPER FUNCTIONS ---
+# Each fixture is a cached symbol in unit space (see symbols.py); the draw_* helpers place it.
+# Symbols are keyed by the few ratios that depend on absolute sizes (e.g. burner radius / width),
+# so every stove of the same size shares one set of compiled paths.
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def counter_symbol(num_units, top_fraction):
+    dividers = [segment(i / num_units, 0, i / num_units, 1) for i in range(1, num_units)]
+    parts = [
+        Part('body', [rect(0, 0, 1, 1)], facecolor=COUNTER_COLOR, edgecolor='black', linewidth=0.8, zorder=4),
+        Part('countertop', [rect(0, 1 - top_fraction, 1, top_fraction)], facecolor=COUNTERTOP_COLOR, edgecolor='black', linewidth=0.5, zorder=5),
+    ]
+    if dividers: # Cabinet doors/drawers
+        parts.append(Part('dividers', dividers, fill=False, color='black', linewidth=0.5, linestyle=':', zorder=5, detail=True))
+    return Symbol('counter', parts)
 
 def draw_kitchen_counter_segment(ax, x, y, width, height, is_vertical=False):
     """
     Draws a segment of kitchen counter with detail for base cabinets.
     x,y is bottom-left. `width` is length along wall, `height` is depth into room (or vice versa).
     """
-    # Base cabinet rectangle
-    ax.add_patch(Rectangle((x, y), width, height, facecolor=COUNTER_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-    # Countertop (thin rectangle on top of base cabinet)
-    if is_vertical: # If counter segment is vertical (along Y-axis)
-        ax.add_patch(Rectangle((x, y + height - 0.05), width, 0.05, facecolor=COUNTERTOP_COLOR, edgecolor='black', linewidth=0.5, zorder=5))
-        # Indicate cabinet doors/drawers with lines
-        num_units = max(1, int(width / 0.6)) # Each unit approx 0.6m
-        for i in range(1, num_units):
-            ax.add_line(Line2D([x + i * (width / num_units), x + i * (width / num_units)], [y, y + height], color='black', linewidth=0.5, linestyle=':', zorder=5))
-    else: # If counter segment is horizontal (along X-axis)
-        ax.add_patch(Rectangle((x, y + height - 0.05), width, 0.05, facecolor=COUNTERTOP_COLOR, edgecolor='black', linewidth=0.5, zorder=5))
-        num_units = max(1, int(width / 0.6))
-        for i in range(1, num_units):
-            ax.add_line(Line2D([x + i * (width / num_units), x + i * (width / num_units)], [y, y + height], color='black', linewidth=0.5, linestyle=':', zorder=5))
+    num_units = max(1, int(width / 0.6)) # Each unit approx 0.6m
+    return place(ax, counter_symbol(num_units, round(0.05 / height, 4)), x, y, width, height)
+
 
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def sink_basin_symbol(inset):
+    return Symbol('sink_basin', [
+        Part('basin', [rect(0, 0, 1, 1)], facecolor=SINK_COLOR, edgecolor='black', linewidth=0.5, zorder=6),
+        Part('drain', [segment(inset, inset, 1 - inset, 1 - inset), segment(inset, 1 - inset, 1 - inset, inset)],
+             fill=False, color='black', linestyle=':', linewidth=0.5, zorder=7, detail=True), # Drain cross
+    ])
 
 def draw_sink_basin(ax, x_center, y_center, size=0.4):
     """Draws a square sink basin centered at (x_center, y_center)."""
-    ax.add_patch(Rectangle((x_center - size/2, y_center - size/2), size, size, facecolor=SINK_COLOR, edgecolor='black', linewidth=0.5, zorder=6))
-    ax.add_line(Line2D([x_center - size/2 + 0.05, x_center + size/2 - 0.05], [y_center - size/2 + 0.05, y_center + size/2 - 0.05], color='black', linestyle=':', linewidth=0.5, zorder=7)) # Drain cross
-    ax.add_line(Line2D([x_center - size/2 + 0.05, x_center + size/2 - 0.05], [y_center + size/2 - 0.05, y_center - size/2 + 0.05], color='black', linestyle=':', linewidth=0.5, zorder=7))
+    return place(ax, sink_basin_symbol(round(0.05 / size, 4)), x_center - size/2, y_center - size/2, size, size)
+
+
+APPLIANCE_LABEL = dict(fontsize=7, color='white', weight='bold', zorder=6)
+
+def appliance_body():
+    return Part('body', [rect(0, 0, 1, 1)], facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.8, zorder=4)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def stove_symbol(burner_rx, burner_ry):
+    burners = [ellipse(cx, cy, burner_rx, burner_ry) for cy in (0.25, 0.75) for cx in (0.25, 0.75)]
+    return Symbol('stove', [
+        appliance_body(),
+        Part('burners', burners, facecolor='black', zorder=5, detail=True),
+        Part('oven_door', [segment(0.1, 0.3, 0.9, 0.3)], fill=False, color='white', linewidth=1.5, zorder=5, detail=True),
+    ], **APPLIANCE_LABEL)
 
 def draw_stove(ax, x, y, width, depth, label="Stove"):
     """Draws a stove/cooktop with oven door line. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-    # Burners (simple circles)
     burner_r = 0.08
-    ax.add_patch(Circle((x + width*0.25, y + depth*0.25), burner_r, facecolor='black', zorder=5))
-    ax.add_patch(Circle((x + width*0.75, y + depth*0.25), burner_r, facecolor='black', zorder=5))
-    ax.add_patch(Circle((x + width*0.25, y + depth*0.75), burner_r, facecolor='black', zorder=5))
-    ax.add_patch(Circle((x + width*0.75, y + depth*0.75), burner_r, facecolor='black', zorder=5))
-    # Oven door line
-    ax.add_line(Line2D([x + width * 0.1, x + width * 0.9], [y + depth * 0.3, y + depth * 0.3], color='white', linewidth=1.5, zorder=5))
-    ax.text(x + width / 2, y + depth / 2, label, ha='center', va='center', fontsize=7, color='white', weight='bold', zorder=6)
+    return place(ax, stove_symbol(round(burner_r / width, 4), round(burner_r / depth, 4)), x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def refrigerator_symbol():
+    return Symbol('refrigerator', [
+        appliance_body(),
+        Part('split', [segment(0, 0.5, 1, 0.5)], fill=False, color='white', linestyle='--', linewidth=1.0, zorder=5, detail=True), # Freezer/Fridge split
+        Part('handles', [segment(0.1, 0.2, 0.1, 0.4), segment(0.1, 0.6, 0.1, 0.8)], fill=False, color='white', linewidth=1.5, zorder=5, detail=True),
+    ], **APPLIANCE_LABEL)
 
 def draw_refrigerator(ax, x, y, width, depth, label="Fridge"):
     """Draws a refrigerator. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-    # Simple lines for doors and handles
-    ax.add_line(Line2D([x, x + width], [y + depth/2, y + depth/2], color='white', linestyle='--', linewidth=1.0, zorder=5)) # Freezer/Fridge split
-    ax.add_line(Line2D([x + width*0.1, x + width*0.1], [y + depth*0.2, y + depth*0.4], color='white', linewidth=1.5, zorder=5)) # Handle
-    ax.add_line(Line2D([x + width*0.1, x + width*0.1], [y + depth*0.6, y + depth*0.8], color='white', linewidth=1.5, zorder=5)) # Handle
-    ax.text(x + width / 2, y + depth / 2, label, ha='center', va='center', fontsize=7, color='white', weight='bold', zorder=6)
+    return place(ax, refrigerator_symbol(), x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def dishwasher_symbol():
+    return Symbol('dishwasher', [
+        appliance_body(),
+        Part('handle', [segment(0.1, 0.15, 0.9, 0.15)], fill=False, color='white', linewidth=1.5, zorder=5, detail=True),
+        Part('controls', [rect(0.1, 0.8, 0.8, 0.15)], facecolor='darkgray', edgecolor='black', linewidth=0.5, zorder=5, detail=True),
+    ], **APPLIANCE_LABEL)
 
 def draw_dishwasher(ax, x, y, width, depth, label="Dishwasher"):
     """Draws a dishwasher. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-    # Door handle line
-    ax.add_line(Line2D([x + width*0.1, x + width*0.9], [y + depth*0.15, y + depth*0.15], color='white', linewidth=1.5, zorder=5))
-    # Control panel (small rectangle on top)
-    ax.add_patch(Rectangle((x + width*0.1, y + depth*0.8), width*0.8, depth*0.15, facecolor='darkgray', edgecolor='black', linewidth=0.5, zorder=5))
-    ax.text(x + width / 2, y + depth / 2, label, ha='center', va='center', fontsize=7, color='white', weight='bold', zorder=6)
+    return place(ax, dishwasher_symbol(), x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def microwave_symbol():
+    return Symbol('microwave', [
+        appliance_body(),
+        Part('door', [segment(0.2, 0.1, 0.2, 0.9)], fill=False, color='white', linewidth=1.0, zorder=5, detail=True), # Door edge
+        Part('controls', [rect(0.7, 0.7, 0.2, 0.2)], facecolor='gray', edgecolor='black', linewidth=0.5, zorder=5, detail=True),
+    ], **{**APPLIANCE_LABEL, 'fontsize': 6})
 
 def draw_microwave(ax, x, y, width, depth, label="Micro."):
     """Draws a small counter-top microwave. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
-    # Door and controls
-    ax.add_line(Line2D([x + width * 0.2, x + width * 0.2], [y + depth * 0.1, y + depth * 0.9], color='white', linewidth=1.0, zorder=5)) # Door edge
-    ax.add_patch(Rectangle((x + width * 0.7, y + depth * 0.7), width * 0.2, depth * 0.2, facecolor='gray', edgecolor='black', linewidth=0.5, zorder=5)) # Control panel
-    ax.text(x + width / 2, y + depth / 2, label, ha='center', va='center', fontsize=6, color='white', weight='bold', zorder=6)
+    return place(ax, microwave_symbol(), x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def exhaust_hood_symbol():
+    return Symbol('exhaust_hood', [
+        Part('body', [rect(0, 0, 1, 1)], facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.8, zorder=4, hatch='///'),
+    ], **{**APPLIANCE_LABEL, 'fontsize': 6, 'zorder': 5})
 
 def draw_exhaust_hood(ax, x, y, width, depth, label="Hood"):
     """Draws an exhaust hood, typically above a stove. x,y is bottom-left of hood base."""
     # This represents the base of the hood, slightly smaller than the stove.
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=APPLIANCE_COLOR, edgecolor='black', linewidth=0.8, zorder=4, hatch='///'))
-    ax.text(x + width / 2, y + depth / 2, label, ha='center', va='center', fontsize=6, color='white', weight='bold', zorder=5)
+    return place(ax, exhaust_hood_symbol(), x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def dining_table_symbol(chairs, chair_rx, chair_ry, gap_x, gap_y):
+    seats = []
+    if chairs >= 2: # Top/Bottom chairs
+        seats += [ellipse(0.5, -chair_ry - gap_y, chair_rx, chair_ry), ellipse(0.5, 1 + chair_ry + gap_y, chair_rx, chair_ry)]
+    if chairs >= 4: # Side chairs
+        seats += [ellipse(-chair_rx - gap_x, 0.5, chair_rx, chair_ry), ellipse(1 + chair_rx + gap_x, 0.5, chair_rx, chair_ry)]
+    parts = [Part('top', [rect(0, 0, 1, 1)], facecolor=FURNITURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4)]
+    if seats:
+        parts.append(Part('chairs', seats, facecolor=FURNITURE_COLOR, edgecolor='black', linewidth=1.0, zorder=5))
+    return Symbol('dining_table', parts, fontsize=8, color='white', weight='bold', zorder=6)
 
 def draw_dining_table(ax, x, y, size_x, size_y, chairs=4, label="Table"):
     """Draws a dining table with chairs. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), size_x, size_y, facecolor=FURNITURE_COLOR, edgecolor='black', linewidth=0.8, zorder=4))
     # Simple chairs as small circles
     chair_r = 0.2
-    if chairs >= 2: # Top/Bottom chairs
-        ax.add_patch(Circle((x + size_x / 2, y - chair_r - 0.1), chair_r, facecolor=FURNITURE_COLOR, edgecolor='black', zorder=5))
-        ax.add_patch(Circle((x + size_x / 2, y + size_y + chair_r + 0.1), chair_r, facecolor=FURNITURE_COLOR, edgecolor='black', zorder=5))
-    if chairs >= 4: # Side chairs
-        ax.add_patch(Circle((x - chair_r - 0.1, y + size_y / 2), chair_r, facecolor=FURNITURE_COLOR, edgecolor='black', zorder=5))
-        ax.add_patch(Circle((x + size_x + chair_r + 0.1, y + size_y / 2), chair_r, facecolor=FURNITURE_COLOR, edgecolor='black', zorder=5))
-    ax.text(x + size_x / 2, y + size_y / 2, label, ha='center', va='center', fontsize=8, color='white', weight='bold', zorder=6)
+    symbol = dining_table_symbol(chairs, round(chair_r / size_x, 4), round(chair_r / size_y, 4),
+                                 round(0.1 / size_x, 4), round(0.1 / size_y, 4))
+    return place(ax, symbol, x, y, size_x, size_y, label=label)
 
 
 # --- Main Kitchen Preset Generator ---
 
 def generate_kitchen_preset(
     kitchen_width=4.5,  # Inner width of the room
-    kitchen_height=3.5  # Inner height of the room
+    kitchen_height=3.5, # Inner height of the room
+    fig=None,           # Existing Figure to draw into (reused by the render pool)
+    lod=None            # Level of detail: "full", "medium" or "low" (None = full)
 ):
-    fig, ax = plt.subplots(figsize=(10, 8))
+    fig, ax = plan_axes(fig, figsize=(10, 8), lod=lod)
 
     # --- 1. Define Room Boundaries ---
     room_origin_x = 0
@@ -214,6 +264,7 @@ def generate_kitchen_preset(
         kitchen_width, kitchen_height,
         facecolor=FLOOR_COLOR, edgecolor='black', linewidth=0, zorder=1
     ))
+    set_room(ax, inner_room_x, inner_room_y, kitchen_width, kitchen_height, WALL_THICKNESS, WALL_COLOR, FLOOR_COLOR)
     '''
     # --- 3. Door ---
     # Placed on the bottom wall, near left corner
@@ -285,7 +336,8 @@ def generate_kitchen_preset(
     # Draw appliances on Counter 2
     draw_dishwasher(ax, dishwasher_x, dishwasher_y, DISHWASHER_W, DISHWASHER_D)
     draw_sink_basin(ax, sink_x + SINK_W/2, sink_y + SINK_D/2)
-    ax.text(sink_x + SINK_W/2, sink_y + SINK_D/2 - 0.4, "Sink", ha='center', va='center', fontsize=7, color='darkslategray', zorder=6)
+    if show_labels(ax):
+        ax.text(sink_x + SINK_W/2, sink_y + SINK_D/2 - 0.4, "Sink", ha='center', va='center', fontsize=7, color='darkslategray', zorder=6)
     draw_stove(ax, stove_x, stove_y, STOVE_W, STOVE_D)
 
     # Exhaust Hood above stove
@@ -322,13 +374,18 @@ def generate_kitchen_preset(
     ax.set_ylim(room_origin_y - 0.5, room_origin_y + outer_height + 0.5)
     ax.set_xticks([])
     ax.set_yticks([])
-    ax.set_title(f"Detailed Kitchen Floor Plan ({kitchen_width:.1f}x{kitchen_height:.1f}m)", fontsize=16)
+    if show_labels(ax):
+        ax.set_title(f"Detailed Kitchen Floor Plan ({kitchen_width:.1f}x{kitchen_height:.1f}m)", fontsize=16)
     ax.grid(False)
 
-    plt.show()
+    return fig
 
-# --- Call the function to generate the plot ---
-generate_kitchen_preset()
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt # Only for interactive display
+
+    # --- Call the function to generate the plot ---
+    generate_kitchen_preset(fig=plt.figure())
+    plt.show()
 
-# --- Example with different dimensions ---
-# generate_kitchen_preset(kitchen_width=3.8, kitchen_height=3.2)
\ No newline at end of file
+    # --- Example with different dimensions ---
+    # generate_kitchen_preset(kitchen_width=3.8, kitchen_height=3.2)
\ No newline at end of file
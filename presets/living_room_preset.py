@@ -1,7 +1,11 @@
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, Arc, Circle
+from functools import lru_cache
+
+from matplotlib.patches import Rectangle, Arc
 from matplotlib.lines import Line2D
 
+from figures import plan_axes
+from symbols import SYMBOL_CACHE_SIZE, Part, Symbol, add_door, add_window, place, rect, segment, set_room, show_details, show_labels
+
 # --- Constants for dimensions and appearance ---
 WALL_THICKNESS = 0.15 # meters
 DOOR_WIDTH = 0.9
@@ -23,6 +27,7 @@ BOOKSHELF_COLOR = '#8b4513' # Same as accent chair for wood consistency
 
 def draw_door(ax, x, y, door_leaf_length, wall_thickness, orientation='h', swing_direction='in_cw'):
     """Draws a door opening with swing. x,y: bottom-left of the opening."""
+    add_door(ax, x, y, door_leaf_length, wall_thickness, orientation, swing_direction)
     if orientation == 'h':
         ax.add_patch(Rectangle((x, y), door_leaf_length, wall_thickness, facecolor=FLOOR_COLOR, edgecolor=FLOOR_COLOR, linewidth=0, zorder=2))
     else: # 'v'
@@ -54,18 +59,34 @@ def draw_door(ax, x, y, door_leaf_length, wall_thickness, orientation='h', swing
 
 def draw_window(ax, x, y, length, thickness, orientation='h'):
     """Draws a window as a thin rectangle over the wall area. x,y is bottom-left of window opening."""
+    add_window(ax, x, y, length, thickness, orientation, WINDOW_COLOR)
     if orientation == 'h':
         ax.add_patch(Rectangle((x, y), length, thickness, facecolor=WINDOW_COLOR, edgecolor='black', linewidth=0.5, zorder=2))
-        ax.add_line(Line2D([x, x + length], [y + thickness / 2, y + thickness / 2], color='black', linewidth=1, zorder=3))
+        if show_details(ax):
+            ax.add_line(Line2D([x, x + length], [y + thickness / 2, y + thickness / 2], color='black', linewidth=1, zorder=3))
     else:
         ax.add_patch(Rectangle((x, y), thickness, length, facecolor=WINDOW_COLOR, edgecolor='black', linewidth=0.5, zorder=2))
-        ax.add_line(Line2D([x + thickness / 2, x + thickness / 2], [y, y + length], color='black', linewidth=1, zorder=3))
+        if show_details(ax):
+            ax.add_line(Line2D([x + thickness / 2, x + thickness / 2], [y, y + length], color='black', linewidth=1, zorder=3))
 
 def draw_room_label(ax, x_inner, y_inner, width_inner, height_inner, label):
+    if not show_labels(ax):
+        return
     ax.text(x_inner + width_inner / 2, y_inner + height_inner / 2,
             label, ha='center', va='center', fontsize=16, color='darkslategray', alpha=0.7)
 
 # --- LIVING ROOM SPECIFIC HELPER FUNCTIONS ---
+# Each fixture is a cached symbol in unit space (see symbols.py); the draw_* helpers place it.
+
+FURNITURE_LABEL = dict(fontsize=8, color='white', weight='bold', zorder=7)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def sofa_symbol(num_cushions, cushion_width, gap):
+    cushions = [rect(gap + i * (cushion_width + gap), 0.1, cushion_width, 0.8) for i in range(num_cushions)]
+    return Symbol('sofa', [
+        Part('frame', [rect(0, 0, 1, 1)], facecolor=SOFA_COLOR, edgecolor='black', linewidth=0.8, zorder=5),
+        Part('cushions', cushions, facecolor=SOFA_COLOR, edgecolor='darkblue', linewidth=0.5, zorder=6, alpha=0.8, detail=True),
+    ], **{**FURNITURE_LABEL, 'fontsize': 9})
 
 def draw_sofa(ax, x, y, width, height, label="Sofa"):
     """
@@ -73,73 +94,84 @@ def draw_sofa(ax, x, y, width, height, label="Sofa"):
     width: length of the sofa along the wall.
     height: depth of the sofa into the room.
     """
-    ax.add_patch(Rectangle((x, y), width, height, facecolor=SOFA_COLOR, edgecolor='black', linewidth=0.8, zorder=5))
     # Cushions
     num_cushions = max(1, int(width / 0.7)) # Roughly one cushion per 0.7m
     cushion_width = (width - 0.1 * (num_cushions + 1)) / num_cushions # Distribute with small gaps
-    cushion_depth = height * 0.8 # Cushions are slightly less deep than sofa
-    cushion_offset_y = height * 0.1 # Small offset from back
-    for i in range(num_cushions):
-        ax.add_patch(Rectangle(
-            (x + 0.05 + i * (cushion_width + 0.05), y + cushion_offset_y),
-            cushion_width, cushion_depth, facecolor=SOFA_COLOR, edgecolor='darkblue', linewidth=0.5, zorder=6, alpha=0.8
-        ))
-    ax.text(x + width / 2, y + height / 2, label, ha='center', va='center', fontsize=9, color='white', weight='bold', zorder=7)
+    symbol = sofa_symbol(num_cushions, round(cushion_width / width, 4), round(0.05 / width, 4))
+    return place(ax, symbol, x, y, width, height, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def armchair_symbol():
+    return Symbol('armchair', [
+        Part('seat', [rect(0, 0, 1, 1)], facecolor=ACCENT_CHAIR_COLOR, edgecolor='black', linewidth=0.8, zorder=5),
+        Part('armrests', [rect(0, 0, 0.15, 1), rect(0.85, 0, 0.15, 1)], facecolor=ACCENT_CHAIR_COLOR, edgecolor='black', linewidth=0.5, zorder=6, detail=True),
+    ], **FURNITURE_LABEL)
 
 def draw_armchair(ax, x, y, size_x, size_y, label="Armchair"):
     """Draws an armchair. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), size_x, size_y, facecolor=ACCENT_CHAIR_COLOR, edgecolor='black', linewidth=0.8, zorder=5))
-    # Simple armrests
-    ax.add_patch(Rectangle((x, y), size_x*0.15, size_y, facecolor=ACCENT_CHAIR_COLOR, edgecolor='black', linewidth=0.5, zorder=6))
-    ax.add_patch(Rectangle((x + size_x*0.85, y), size_x*0.15, size_y, facecolor=ACCENT_CHAIR_COLOR, edgecolor='black', linewidth=0.5, zorder=6))
-    ax.text(x + size_x / 2, y + size_y / 2, label, ha='center', va='center', fontsize=8, color='white', weight='bold', zorder=7)
+    return place(ax, armchair_symbol(), x, y, size_x, size_y, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def coffee_table_symbol():
+    return Symbol('coffee_table', [
+        Part('top', [rect(0, 0, 1, 1)], facecolor=TABLE_COLOR, edgecolor='black', linewidth=1, zorder=5),
+    ], fontsize=8, color='black', weight='bold', zorder=6)
 
 def draw_coffee_table(ax, x, y, width, depth, label="Coffee Table"):
     """Draws a coffee table. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=TABLE_COLOR, edgecolor='black', linewidth=1, zorder=5))
-    ax.text(x + width / 2, y + depth / 2, label, ha='center', va='center', fontsize=8, color='black', weight='bold', zorder=6)
+    return place(ax, coffee_table_symbol(), x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def tv_stand_symbol(screen_y):
+    return Symbol('tv_stand', [
+        Part('stand', [rect(0, 0, 1, 1)], facecolor=TABLE_COLOR, edgecolor='black', linewidth=1, zorder=5),
+        # TV Screen (on top of stand), positioned at back of stand
+        Part('screen', [rect(0.15, screen_y, 0.7, 0.5)], facecolor=TV_COLOR, edgecolor='gray', linewidth=1, zorder=6),
+    ], label_at=(0.5, 0.8), **{**FURNITURE_LABEL, 'fontsize': 9})
 
 def draw_tv_stand(ax, x, y, width, depth, label="TV"):
     """Draws a TV stand with a TV screen. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, depth, facecolor=TABLE_COLOR, edgecolor='black', linewidth=1, zorder=5))
-    # TV Screen (on top of stand)
-    tv_screen_w = width * 0.7
-    tv_screen_h = depth * 0.5 # Proportionate height on floor plan
-    ax.add_patch(Rectangle(
-        (x + (width - tv_screen_w)/2, y + depth - tv_screen_h - 0.05), # Positioned at back of stand
-        tv_screen_w, tv_screen_h, facecolor=TV_COLOR, edgecolor='gray', linewidth=1, zorder=6
-    ))
-    ax.text(x + width / 2, y + depth * 0.8, label, ha='center', va='center', fontsize=9, color='white', weight='bold', zorder=7)
+    return place(ax, tv_stand_symbol(round(0.5 - 0.05 / depth, 4)), x, y, width, depth, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def area_rug_symbol():
+    return Symbol('area_rug', [
+        Part('rug', [rect(0, 0, 1, 1)], facecolor=RUG_COLOR, edgecolor='darkgray', linewidth=0.5, linestyle='--', zorder=4),
+    ], fontsize=10, color='darkslategray', alpha=0.6, zorder=5)
 
 def draw_area_rug(ax, x, y, width, height, color=RUG_COLOR, label="Rug"):
     """Draws an area rug. x,y is bottom-left."""
-    ax.add_patch(Rectangle((x, y), width, height, facecolor=color, edgecolor='darkgray', linewidth=0.5, linestyle='--', zorder=4))
-    ax.text(x + width/2, y + height/2, label, ha='center', va='center', fontsize=10, color='darkslategray', alpha=0.6, zorder=5)
+    return place(ax, area_rug_symbol(), x, y, width, height, style={'rug': {'facecolor': color}}, label=label)
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def bookshelf_symbol(num_shelves, orientation):
+    if orientation == 'v': # Shelves (horizontal lines)
+        shelves = [segment(0, i / num_shelves, 1, i / num_shelves) for i in range(1, num_shelves)]
+    else:
+        shelves = [segment(i / num_shelves, 0, i / num_shelves, 1) for i in range(1, num_shelves)]
+    return Symbol('bookshelf', [
+        Part('case', [rect(0, 0, 1, 1)], facecolor=BOOKSHELF_COLOR, edgecolor='black', linewidth=0.8, zorder=5),
+        Part('shelves', shelves, fill=False, color='black', linewidth=0.5, linestyle='-', zorder=6, detail=True),
+    ], rotation=90 if orientation == 'v' else 0, **FURNITURE_LABEL)
 
 def draw_bookshelf(ax, x, y, width, depth, label="Bookshelf", orientation='v'):
     """Draws a bookshelf. x,y is bottom-left."""
+    num_shelves = max(2, int(width / 0.8)) # At least 2, roughly every 0.8m
     if orientation == 'v': # Along a vertical wall, depth into room
-        ax.add_patch(Rectangle((x, y), depth, width, facecolor=BOOKSHELF_COLOR, edgecolor='black', linewidth=0.8, zorder=5))
-        # Shelves (horizontal lines)
-        num_shelves = max(2, int(width / 0.8)) # At least 2, roughly every 0.8m
-        for i in range(1, num_shelves):
-            ax.add_line(Line2D([x, x + depth], [y + i * (width / num_shelves), y + i * (width / num_shelves)], color='black', linewidth=0.5, linestyle='-', zorder=6))
-        ax.text(x + depth/2, y + width/2, label, rotation=90, ha='center', va='center', fontsize=8, color='white', weight='bold', zorder=7)
-    else: # Along a horizontal wall, depth into room
-        ax.add_patch(Rectangle((x, y), width, depth, facecolor=BOOKSHELF_COLOR, edgecolor='black', linewidth=0.8, zorder=5))
-        num_shelves = max(2, int(width / 0.8))
-        for i in range(1, num_shelves):
-            ax.add_line(Line2D([x + i * (width / num_shelves), x + i * (width / num_shelves)], [y, y + depth], color='black', linewidth=0.5, linestyle='-', zorder=6))
-        ax.text(x + width/2, y + depth/2, label, ha='center', va='center', fontsize=8, color='white', weight='bold', zorder=7)
+        return place(ax, bookshelf_symbol(num_shelves, 'v'), x, y, depth, width, label=label)
+    # Along a horizontal wall, depth into room
+    return place(ax, bookshelf_symbol(num_shelves, 'h'), x, y, width, depth, label=label)
 
 
 # --- Main Living Room Preset Generator ---
 
 def generate_living_room_preset(
     room_width=5.5,  # Inner width of the room (e.g., along TV wall)
-    room_height=4.5  # Inner height of the room (e.g., along sofa wall)
+    room_height=4.5, # Inner height of the room (e.g., along sofa wall)
+    fig=None,        # Existing Figure to draw into (reused by the render pool)
+    lod=None         # Level of detail: "full", "medium" or "low" (None = full)
 ):
-    fig, ax = plt.subplots(figsize=(10, 8))
+    fig, ax = plan_axes(fig, figsize=(10, 8), lod=lod)
 
     # --- 1. Define Room Boundaries ---
     room_origin_x = 0
@@ -162,6 +194,7 @@ def generate_living_room_preset(
         room_width, room_height,
         facecolor=FLOOR_COLOR, edgecolor='black', linewidth=0, zorder=1
     ))
+    set_room(ax, inner_room_x, inner_room_y, room_width, room_height, WALL_THICKNESS, WALL_COLOR, FLOOR_COLOR)
     '''
     # --- 3. Door ---
     # Placed on the bottom wall, near the right corner
@@ -236,13 +269,18 @@ def generate_living_room_preset(
     ax.set_ylim(room_origin_y - 0.5, room_origin_y + outer_height + 0.5)
     ax.set_xticks([])
     ax.set_yticks([])
-    ax.set_title(f"Detailed Living Room Floor Plan ({room_width:.1f}x{room_height:.1f}m)", fontsize=16)
+    if show_labels(ax):
+        ax.set_title(f"Detailed Living Room Floor Plan ({room_width:.1f}x{room_height:.1f}m)", fontsize=16)
     ax.grid(False)
 
-    plt.show()
+    return fig
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt # Only for interactive display
 
-# --- Call the function to generate the plot ---
-generate_living_room_preset()
+    # --- Call the function to generate the plot ---
+    generate_living_room_preset(fig=plt.figure())
+    plt.show()
 
-# --- Example with different dimensions ---
-# generate_living_room_preset(room_width=6.0, room_height=5.0)
\ No newline at end of file
+    # --- Example with different dimensions ---
+    # generate_living_room_preset(room_width=6.0, room_height=5.0)
\ No newline at end of file
@@ -0,0 +1,195 @@
+from matplotlib.path import Path
+from matplotlib.patches import PathPatch
+from matplotlib.transforms import Affine2D, Bbox
+
+# --- Fixture symbols ---
+# A Symbol is a fixture drawn once in unit space: (0,0) is the bottom-left and (1,1) the top-right
+# of its bounding box (parts such as chairs or a headboard may reach outside it).
+# Each part's sub-shapes are merged into one compound Path, so a stove's four burners are a single
+# artist. Symbols are built by lru_cached functions in the presets and shared by every placement;
+# placing one (see place()) only adds an affine transform and optional style overrides. Their
+# keys include ratios derived from user-chosen sizes, so each cache holds at most
+# SYMBOL_CACHE_SIZE symbols; a long-running server would otherwise keep one per size ever asked.
+#
+# Level of detail: a plan is drawn at 'full', 'medium' or 'low' detail (set by plan_axes). Below
+# full, parts marked detail=True (burners, cabinet dividers, fold lines...) and hatching are
+# skipped; at low, labels and titles go too. Presets ask show_details()/show_labels() for the
+# decorations they draw outside symbols.
+
+LOD_LEVELS = ('full', 'medium', 'low')
+SYMBOL_CACHE_SIZE = 32 # per symbol builder; a render uses a handful
+
+def rect(x, y, w, h):
+    """Closed rectangle path, x,y is bottom-left."""
+    return Path([(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x, y)],
+                [Path.MOVETO, Path.LINETO, Path.LINETO, Path.LINETO, Path.CLOSEPOLY])
+
+def ellipse(cx, cy, rx, ry):
+    """Ellipse path; a circle of radius r on a w x h fixture is ellipse(cx, cy, r/w, r/h)."""
+    return Path.unit_circle().transformed(Affine2D().scale(rx, ry).translate(cx, cy))
+
+def segment(x0, y0, x1, y1):
+    return Path([(x0, y0), (x1, y1)], [Path.MOVETO, Path.LINETO])
+
+
+class Part:
+    """
+    One styled layer of a symbol. fill=False draws the paths as strokes only; detail=True marks
+    decoration that is dropped below full level of detail.
+    """
+    __slots__ = ('role', 'path', 'fill', 'detail', 'style')
+
+    def __init__(self, role, shapes, fill=True, detail=False, **style):
+        self.role = role
+        self.path = Path.make_compound_path(*shapes) if len(shapes) > 1 else shapes[0]
+        self.fill = fill
+        self.detail = detail
+        self.style = style
+
+
+class Symbol:
+    def __init__(self, name, parts, label_at=(0.5, 0.5), **label_style):
+        self.name = name
+        self.parts = parts
+        self.label_at = label_at
+        self.label_style = label_style
+        self.extent = Bbox.union([part.path.get_extents() for part in parts]) # unit space
+
+
+class Instance:
+    """A placed symbol: unit square mapped onto (x, y, width, height) plus style overrides."""
+    __slots__ = ('id', 'symbol', 'x', 'y', 'width', 'height', 'style', 'label')
+
+    def __init__(self, id, symbol, x, y, width, height, style, label):
+        self.id = id
+        self.symbol = symbol
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.style = style
+        self.label = label
+
+    def transform(self):
+        return Affine2D().scale(self.width, self.height).translate(self.x, self.y)
+
+    def bounds(self):
+        """(x0, y0, x1, y1) of everything the symbol draws, in plan coordinates."""
+        e = self.symbol.extent
+        return (self.x + e.x0 * self.width, self.y + e.y0 * self.height,
+                self.x + e.x1 * self.width, self.y + e.y1 * self.height)
+
+
+# (orientation, swing_direction) -> hinge offset as multiples of (leaf, wall thickness) from the
+# opening's bottom-left corner, and the start angle of the quarter circle the leaf sweeps.
+DOOR_SWINGS = {
+    ('h', 'in_cw'): ((0, 0), (0, 1), 0),
+    ('h', 'in_ccw'): ((1, 0), (0, 1), 90),
+    ('h', 'out_cw'): ((0, 0), (0, 0), 270),
+    ('h', 'out_ccw'): ((1, 0), (0, 0), 180),
+    ('v', 'in_cw'): ((0, 1), (1, 0), 180),
+    ('v', 'in_ccw'): ((0, 0), (1, 0), 270),
+    ('v', 'out_cw'): ((0, 1), (0, 0), 90),
+    ('v', 'out_ccw'): ((0, 0), (0, 0), 0),
+}
+
+
+class Door:
+    """A door opening in a wall and the quarter circle its leaf sweeps."""
+    __slots__ = ('x', 'y', 'leaf', 'wall_thickness', 'orientation', 'hinge', 'theta1')
+
+    def __init__(self, x, y, leaf, wall_thickness, orientation, swing_direction):
+        (lx, ly), (tx, ty), theta1 = DOOR_SWINGS[(orientation, swing_direction)]
+        self.x = x
+        self.y = y
+        self.leaf = leaf
+        self.wall_thickness = wall_thickness
+        self.orientation = orientation
+        self.hinge = (x + lx * leaf + tx * wall_thickness, y + ly * leaf + ty * wall_thickness)
+        self.theta1 = theta1
+
+    def opening(self):
+        """(x0, y0, x1, y1) of the gap in the wall."""
+        if self.orientation == 'h':
+            return (self.x, self.y, self.x + self.leaf, self.y + self.wall_thickness)
+        return (self.x, self.y, self.x + self.wall_thickness, self.y + self.leaf)
+
+
+class Scene:
+    """What a preset placed on an Axes: the room and its walls, doors, windows and fixture instances."""
+
+    def __init__(self):
+        self.room = None # (x, y, width, height) of the floor inside the walls
+        self.walls = None # {'thickness', 'color', 'floor'} of the shell around the room
+        self.lod = 'full'
+        self.instances = []
+        self.doors = []
+        self.windows = []
+        self._counts = {}
+
+    def next_id(self, name):
+        n = self._counts.get(name, 0)
+        self._counts[name] = n + 1
+        return f"{name}-{n}"
+
+
+def scene(ax):
+    if not hasattr(ax, 'archibot_scene'):
+        ax.archibot_scene = Scene()
+    return ax.archibot_scene
+
+def set_lod(ax, lod):
+    if lod not in LOD_LEVELS:
+        raise ValueError(f"Unknown level of detail '{lod}'. Choose from: {', '.join(LOD_LEVELS)}")
+    scene(ax).lod = lod
+
+def show_details(ax):
+    return scene(ax).lod == 'full'
+
+def show_labels(ax):
+    return scene(ax).lod != 'low'
+
+def set_room(ax, x, y, width, height, wall_thickness=None, wall_color=None, floor_color=None):
+    scene(ax).room = (x, y, width, height)
+    if wall_thickness is not None:
+        scene(ax).walls = {'thickness': wall_thickness, 'color': wall_color, 'floor': floor_color}
+
+def add_window(ax, x, y, length, thickness, orientation='h', color=None):
+    """Records a window drawn by a preset's draw_window (same arguments) for the scene."""
+    window = {'x': x, 'y': y, 'length': length, 'thickness': thickness, 'orientation': orientation, 'color': color}
+    scene(ax).windows.append(window)
+    return window
+
+def add_door(ax, x, y, leaf, wall_thickness, orientation='h', swing_direction='in_cw'):
+    """Records a door drawn by a preset's draw_door (same arguments) for layout analysis."""
+    door = Door(x, y, leaf, wall_thickness, orientation, swing_direction)
+    scene(ax).doors.append(door)
+    return door
+
+
+def place(ax, symbol, x, y, width, height, style=None, label=None, **label_overrides):
+    """
+    Draws `symbol` scaled onto the box (x, y, width, height) and records the instance.
+    style: {part role: {matplotlib kwargs}} overrides, e.g. {'body': {'facecolor': 'peru'}}.
+    """
+    current = scene(ax)
+    instance = Instance(current.next_id(symbol.name), symbol, x, y, width, height, style, label)
+    current.instances.append(instance)
+
+    detailed = current.lod == 'full'
+    transform = instance.transform() + ax.transData
+    for part in symbol.parts:
+        if part.detail and not detailed:
+            continue
+        kwargs = part.style
+        if style and part.role in style:
+            kwargs = {**kwargs, **style[part.role]}
+        if not detailed and 'hatch' in kwargs:
+            kwargs = {k: v for k, v in kwargs.items() if k != 'hatch'}
+        ax.add_patch(PathPatch(part.path, fill=part.fill, transform=transform, **kwargs))
+
+    if label is not None and current.lod != 'low':
+        lx, ly = symbol.label_at
+        ax.text(x + width * lx, y + height * ly, label, ha='center', va='center',
+                **{**symbol.label_style, **label_overrides})
+    return instance